@@ -2,15 +2,24 @@ import os
 import docker
 from typing import Dict, List, Optional
 from celery import Celery
+from celery.signals import worker_process_init, worker_process_shutdown
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 
 
 from schemas import TaskStatusEnum
-from crud import update_task_status_sync
+from crud import update_task_status_sync, log_usage_batch_sync
 from config import settings
+from db.engine_profile import engine_options, apply_sqlite_pragmas
 
-from utils import release_gpu
+from utils import release_gpu, compute_container_name
+from utils.logging_utils import TaskLogSpool
+from utils.docker_utils import get_docker_client, close_docker_client
+from utils.image_cache import ensure_image, prepull_top_images
+from utils.workspace_index import build_workspace_index
+from utils.task_events import publish_task_event
+from utils.usage_meter import DockerStatsSource, UsageMeter, UsageWriter
+from utils.rate_limit import touch_task_slot
 
 # --------------------
 # Celery setup
@@ -21,21 +30,52 @@ celery = Celery(
     backend=os.getenv("CELERY_RESULT_BACKEND", "redis://localhost:6379/0"),
 )
 
+# Periodically warm the local image cache with the most requested images
+celery.conf.beat_schedule = {
+    "prepull-popular-images": {
+        "task": "prepull_popular_images",
+        "schedule": settings.IMAGE_PREPULL_INTERVAL_SECONDS,
+    },
+}
+
+# --------------------
+# Long-lived Docker client, one per worker process
+# --------------------
+@worker_process_init.connect
+def _init_docker_client(**kwargs):
+    try:
+        get_docker_client()
+    except Exception as e:
+        print(f"[DOCKER] Could not connect at worker start: {e}")
+
+@worker_process_shutdown.connect
+def _close_docker_client(**kwargs):
+    usage_writer.close()
+    close_docker_client()
+
 # --------------------
 # Synchronous DB session for Celery
 # --------------------
-engine = create_engine(settings.SYNC_DATABASE_URL)  # use sync DB URL
+engine = create_engine(settings.SYNC_DATABASE_URL, **engine_options(settings.SYNC_DATABASE_URL))  # use sync DB URL
+apply_sqlite_pragmas(engine)
 SessionLocal = sessionmaker(bind=engine, autocommit=False, autoflush=False)
 
-def _set_status(task_id: int, status: str, logs: Optional[str] = None):
+def _set_status(task_id: int, status: str, logs: Optional[str] = None, log_size: Optional[int] = None):
     try:
         with SessionLocal() as session:
-            update_task_status_sync(session, task_id, status, logs)
+            update_task_status_sync(session, task_id, status, logs, log_size)
             session.commit()
             print(task_id, status)
     except Exception as e:
         print(f"[DB ERROR] Failed to update status for task {task_id}: {e}")
 
+def _write_usage(records):
+    with SessionLocal() as session:
+        log_usage_batch_sync(session, records)
+
+# Usage records from every task in this process, inserted in batches
+usage_writer = UsageWriter(_write_usage)
+
 # --------------------
 # Worker Task
 ## --------------------
@@ -51,11 +91,13 @@ def run_container_task(
     cpu_cores: int = 2,
     gpu: bool = False,
     env: Optional[Dict[str, str]] = None,
+    user_id: Optional[int] = None,
 ):
-    client = docker.from_env()
+    client = get_docker_client()
     container_id = None
     env = env or {}
-    logs_accumulated = []
+    spool = None
+    meter = None
 
     try:
         os.makedirs(workspace, exist_ok=True)
@@ -66,6 +108,13 @@ def run_container_task(
         container_env["TASK_OUTPUT_DIR"] = "/workspaces"
         runtime_command = command + (args or []) if command else None
 
+        # Pull explicitly (deduplicated) so pull time shows up as its own phase
+        ensure_image(
+            client, image,
+            on_pull_start=lambda: _set_status(task_id, TaskStatusEnum.pulling, logs=f"Pulling image {image}..."),
+        )
+        _set_status(task_id, TaskStatusEnum.running)
+
         host_config = client.api.create_host_config(
             binds=binds,
             nano_cpus=cpu_cores * 1_000_000_000,
@@ -76,6 +125,7 @@ def run_container_task(
 
         container = client.api.create_container(
             image=image,
+            name=compute_container_name(task_id),
             command=runtime_command,
             working_dir=container_workdir,
             host_config=host_config,
@@ -85,25 +135,57 @@ def run_container_task(
         container_id = container["Id"]
         client.api.start(container_id)
 
-        # Capture logs
-        for log in client.api.logs(container_id, stream=True, follow=True):
-            decoded = log.decode(errors="ignore").rstrip()
-            logs_accumulated.append(decoded)
-            print(decoded)  # still print for realtime debugging
+        # One Docker stats stream per container for metering; each usage
+        # record also refreshes the task's concurrent-task slot
+        if user_id is not None:
+            def record_usage(record):
+                usage_writer.add(record)
+                touch_task_slot(user_id, task_id)
+
+            meter = UsageMeter(
+                task_id, user_id, container_id, DockerStatsSource(client), record_usage, gpu=gpu
+            ).start()
+
+        # Stream logs to <workspace>/container.log, keeping only a bounded tail in memory;
+        # each flush pushes the new output to the owner's event stream
+        spool = TaskLogSpool(
+            workspace,
+            tail_bytes=settings.TASK_LOG_TAIL_BYTES,
+            flush_interval=settings.TASK_LOG_FLUSH_INTERVAL_SECONDS,
+            on_flush=lambda data, offset: publish_task_event(
+                user_id, task_id, "log",
+                offset=offset, data=data.decode(errors="ignore"), log_size=offset + len(data),
+            ),
+        )
+        for chunk in client.api.logs(container_id, stream=True, follow=True):
+            spool.write(chunk)
+        spool.close()
 
         # Wait for exit
         exit_code = client.api.wait(container_id)["StatusCode"]
-        final_logs = "\n".join(logs_accumulated)
+
+        # Index the finished workspace so file browsing never walks it
+        try:
+            build_workspace_index(workspace)
+        except Exception as e:
+            print(f"[WARN] Could not index workspace of task {task_id}: {e}")
+
         _set_status(
             task_id,
             TaskStatusEnum.completed if exit_code == 0 else TaskStatusEnum.failed,
-            logs=final_logs
+            logs=spool.tail(),
+            log_size=spool.size,
         )
 
     except Exception as e:
         print(f"[ERROR] Task {task_id} failed: {e}")
         _set_status(task_id, TaskStatusEnum.failed, logs=f"Worker error: {e}")
     finally:
+        if spool:
+            spool.close()
+        if meter:
+            meter.stop()
+            usage_writer.flush()
         if gpu:
             release_gpu(task_id)
         if container_id:
@@ -111,3 +193,11 @@ def run_container_task(
                 client.api.remove_container(container_id, force=True)
             except Exception:
                 pass
+
+
+@celery.task(name="prepull_popular_images")
+def prepull_popular_images():
+    pulled = prepull_top_images(get_docker_client(), settings.IMAGE_PREPULL_TOP_N)
+    if pulled:
+        print(f"[IMAGES] Pre-pulled: {', '.join(pulled)}")
+    return pulled
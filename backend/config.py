@@ -1,3 +1,4 @@
+from typing import Dict
 from pydantic_settings import BaseSettings
 
 class Settings(BaseSettings):
@@ -8,6 +9,120 @@ class Settings(BaseSettings):
     SYNC_DATABASE_URL: str = "sqlite:///./test.db"
     NGROK_AUTH_TOKEN: str = ""
 
+    # Database engines, API and worker (db/engine_profile.py)
+    DB_ECHO: bool = False
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 20
+    DB_POOL_TIMEOUT_SECONDS: float = 30.0
+    DB_POOL_RECYCLE_SECONDS: int = 1800
+    DB_POOL_PRE_PING: bool = True
+    DB_STATEMENT_CACHE_SIZE: int = 500
+    SQLITE_JOURNAL_MODE: str = "WAL"
+    SQLITE_SYNCHRONOUS: str = "NORMAL"
+    SQLITE_BUSY_TIMEOUT_MS: int = 10000
+    SQLITE_MMAP_SIZE: int = 256 * 1024 * 1024
+
+    # Authenticated principal cache (middleware/auth.py)
+    PRINCIPAL_CACHE_TTL_SECONDS: float = 60.0
+    PRINCIPAL_CACHE_MAX_SIZE: int = 10_000
+
+    # Static deployment access logs (utils/logging_utils.py)
+    ACCESS_LOG_QUEUE_SIZE: int = 10_000
+    ACCESS_LOG_BATCH_SIZE: int = 500
+    ACCESS_LOG_FLUSH_INTERVAL_SECONDS: float = 1.0
+    ACCESS_LOG_MAX_BYTES: int = 10 * 1024 * 1024
+    ACCESS_LOG_BACKUP_COUNT: int = 3
+    ACCESS_LOG_MAX_OPEN_FILES: int = 256
+
+    # Compute task container logs (celery_workers/compute_worker.py)
+    TASK_LOG_TAIL_BYTES: int = 16 * 1024
+    TASK_LOG_FLUSH_INTERVAL_SECONDS: float = 1.0
+    TASK_LOG_INDEX_STRIDE: int = 1000
+    TASK_LOG_INDEX_CACHE_SIZE: int = 128
+    TASK_LOG_MAX_WINDOW_BYTES: int = 1024 * 1024
+
+    # Task log chunks (crud/task_log_crud.py)
+    TASK_LOG_CHUNK_BYTES: int = 64 * 1024
+    TASK_LOG_COMPRESS_MIN_BYTES: int = 512
+    TASK_LOG_SUMMARY_CHARS: int = 1024
+    TASK_LOG_MAX_CHUNKS_PER_READ: int = 200
+
+    # Live log fan-out (services/log_hub.py)
+    LOG_HUB_REPLAY_LINES: int = 200
+    LOG_HUB_QUEUE_SIZE: int = 1000
+
+    # Rate limits and quotas (middleware/rate_limiter.py, utils/rate_limit.py)
+    RATE_LIMIT_ENABLED: bool = True
+    RATE_LIMIT_ROLES: Dict[str, Dict[str, int]] = {
+        "user": {"requests_per_second": 20, "submissions": 20, "submission_window_seconds": 3600, "concurrent_tasks": 2, "max_gpu_priority": 0},
+        "admin": {"requests_per_second": 100, "submissions": 200, "submission_window_seconds": 3600, "concurrent_tasks": 10, "max_gpu_priority": 10},
+    }  # max_gpu_priority caps ResourceSpec.priority in the shared GPU queue
+    RATE_LIMIT_USER_OVERRIDES: Dict[str, Dict[str, int]] = {}  # user id -> any of the keys above
+    RATE_LIMIT_SLOT_TTL_SECONDS: int = 24 * 3600   # slots not refreshed for this long are considered leaked
+    RATE_LIMIT_SLOT_RETRY_SECONDS: int = 30
+
+    # Task event push (utils/task_events.py, services/task_event_hub.py)
+    TASK_EVENTS_QUEUE_SIZE: int = 500
+    TASK_EVENTS_MAX_LOG_BYTES: int = 16 * 1024
+    TASK_EVENTS_HEARTBEAT_SECONDS: float = 25.0
+
+    # Resource telemetry (services/status_service.py)
+    TELEMETRY_INTERVAL_SECONDS: float = 10.0
+    TELEMETRY_HISTORY_SIZE: int = 360
+    TELEMETRY_GPU_SOURCE: str = "auto"  # auto | nvidia | none
+
+    # Usage metering (utils/usage_meter.py, celery_workers/compute_worker.py)
+    USAGE_RECORD_INTERVAL_SECONDS: float = 60.0
+    USAGE_BATCH_SIZE: int = 100
+    USAGE_FLUSH_INTERVAL_SECONDS: float = 10.0
+
+    # Shared Docker client (utils/docker_utils.py)
+    DOCKER_MAX_POOL_SIZE: int = 32
+    DOCKER_TIMEOUT_SECONDS: int = 120
+    DOCKER_HEALTHCHECK_INTERVAL_SECONDS: float = 30.0
+    DOCKER_EXECUTOR_WORKERS: int = 16
+    MAX_CONCURRENT_BUILDS: int = 2
+
+    # Static hosting (services/static_site_service.py)
+    STATIC_HOSTING_MODE: str = "shared"  # shared (single API worker only, see SiteRegistry) | container
+    STATIC_SITES_BASE_URL: str = "http://localhost:8000"
+    STATIC_SITES_DOMAIN: str = ""  # e.g. "sites.example.com" enables <key>.<domain> routing
+    STATIC_SITES_SCHEME: str = "https"
+
+    # Upload ingestion limits (services/ingest_service.py)
+    UPLOAD_MAX_TOTAL_BYTES: int = 1024 * 1024 * 1024
+    UPLOAD_MAX_FILES: int = 50_000
+    UPLOAD_MAX_COMPRESSION_RATIO: float = 100.0
+    UPLOAD_CHUNK_BYTES: int = 1024 * 1024
+
+    # Content-addressed static file store (services/blob_store.py)
+    BLOB_STORE_DIR: str = "workspaces/.blobs"
+    BLOB_INLINE_MAX_BYTES: int = 1024 * 1024
+
+    # GitHub deploy build cache (services/build_cache.py)
+    BUILD_CACHE_DIR: str = "workspaces/.build-cache"
+
+    # Deploy-time precompression (services/precompress_service.py)
+    PRECOMPRESS_MIN_BYTES: int = 1024
+    PRECOMPRESS_MAX_RATIO: float = 0.9   # keep a sibling only if it is at most 90% of the original
+    PRECOMPRESS_WORKERS: int = 0         # 0 = one per CPU core
+    PRECOMPRESS_BROTLI: bool = True      # needs the optional `brotli` package
+
+    # Task list pagination (routers/status_router.py)
+    TASK_PAGE_SIZE: int = 50
+    TASK_MAX_PAGE_SIZE: int = 500
+
+    # Workspace metadata index (utils/workspace_index.py)
+    WORKSPACE_INDEX_DIR: str = "workspaces/.index"
+    WORKSPACE_INDEX_MAX_AGE_SECONDS: float = 5.0   # refresh on read when older than this
+    WORKSPACE_INDEX_PAGE_SIZE: int = 200
+    WORKSPACE_INDEX_MAX_PAGE_SIZE: int = 5000
+
+    # Compute image warm cache (utils/image_cache.py)
+    IMAGE_PREPULL_TOP_N: int = 5
+    IMAGE_PREPULL_INTERVAL_SECONDS: float = 600.0
+    IMAGE_PULL_TIMEOUT_SECONDS: int = 1800
+
     class Config:
         env_file = ".env"
 
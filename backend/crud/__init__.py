@@ -1,17 +1,21 @@
 from .user_crud import (
-    create_user, get_user_by_id, get_user_by_email,
+    create_user, get_user_by_id, get_principal_by_id, get_user_by_email,
     get_all_users, update_user_role, delete_user
 )
 
 from .usage_crud import (
-    log_usage, get_usage_for_user, get_total_usage
+    log_usage, log_usage_batch_sync, get_usage_for_user, get_total_usage
 )
 
 from .task_crud import (
-    create_task, get_task, get_tasks_for_user,
+    create_task, get_task, get_tasks_for_user, get_tasks_by_status, query_tasks, query_task_page,
     update_task_status, delete_task, update_task_status_sync
 )
 
+from .task_log_crud import (
+    append_task_log, append_task_log_sync, read_task_log
+)
+
 from .page_crud import (
     create_page, get_page, get_pages_for_user,
     update_page_status, delete_page
@@ -1,20 +1,55 @@
+import asyncio
+from datetime import datetime
+from typing import List, Optional
+from sqlalchemy import tuple_
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, defer, noload
 from sqlalchemy.future import select
 from models.task_model import Task
 from schemas.task_schema import TaskCreate, TaskStatusEnum
+from crud.task_log_crud import append_task_log, append_task_log_sync, log_summary
+from utils.task_events import publish_task_event
+from utils.rate_limit import release_task_slot, release_task_slot_sync
+
+FINAL_STATUSES = (TaskStatusEnum.completed, TaskStatusEnum.failed, TaskStatusEnum.deleted)
+
+
+def _status_event(db_task: Task) -> dict:
+    return dict(
+        user_id=db_task.user_id,
+        task_id=db_task.id,
+        event="status",
+        task_type=db_task.task_type,
+        status=db_task.status,
+        summary=db_task.logs,
+        log_seq=db_task.log_seq,
+        log_size=db_task.log_size,
+    )
+
+
+def _publish_status(db_task: Task) -> None:
+    publish_task_event(**_status_event(db_task))
+
+
+async def _publish_status_async(db_task: Task) -> None:
+    # Read the row on the loop, send through the sync Redis client off it
+    await asyncio.to_thread(publish_task_event, **_status_event(db_task))
 
 
 async def create_task(db: AsyncSession, task: TaskCreate):
     db_task = Task(
         task_type=task.task_type,
         status=task.status,
-        logs=task.logs,
+        logs=log_summary(task.logs) if task.logs else None,
         user_id=task.user_id,
     )
     db.add(db_task)
+    if task.logs:
+        await db.flush()
+        await append_task_log(db, db_task.id, task.logs)
     await db.commit()
     await db.refresh(db_task)
+    await _publish_status_async(db_task)
     return db_task
 
 
@@ -28,25 +63,91 @@ async def get_tasks_for_user(db: AsyncSession, user_id: int):
     return result.scalars().all()
 
 
-async def update_task_status(db: AsyncSession, task_id: int, status: str, logs: str = None):
+async def query_tasks(
+    db: AsyncSession,
+    user_id: int,
+    task_type: Optional[str] = None,
+    statuses: Optional[List[str]] = None,
+    created_after: Optional[datetime] = None,
+    created_before: Optional[datetime] = None,
+    after_id: Optional[int] = None,
+    limit: int = 50,
+    include_logs: bool = False,
+):
+    """
+    One page of a user's tasks, newest first, filtered in SQL.
+    Keyset pagination: pass the id of the last task of the previous page
+    as `after_id`. `Task.logs` is deferred unless `include_logs`, and the
+    owning user is never loaded.
+    """
+    query = select(Task).options(noload(Task.user)).filter(Task.user_id == user_id)
+    if not include_logs:
+        query = query.options(defer(Task.logs))
+    if task_type is not None:
+        query = query.filter(Task.task_type == task_type)
+    if statuses:
+        query = query.filter(Task.status.in_(statuses))
+    if created_after is not None:
+        query = query.filter(Task.created_at >= created_after)
+    if created_before is not None:
+        query = query.filter(Task.created_at < created_before)
+    if after_id is not None:
+        # Compare against the stored created_at of the cursor row, so the
+        # cursor never depends on how the database formats timestamps
+        cursor_created = select(Task.created_at).filter(Task.id == after_id).scalar_subquery()
+        query = query.filter(tuple_(Task.created_at, Task.id) < tuple_(cursor_created, after_id))
+
+    query = query.order_by(Task.created_at.desc(), Task.id.desc()).limit(limit)
+    result = await db.execute(query)
+    return result.scalars().all()
+
+
+async def query_task_page(db: AsyncSession, user_id: int, after_id: Optional[int] = None, limit: int = 50, **filters):
+    """
+    `query_tasks` plus the cursor for the next page: returns (tasks, next_cursor),
+    with next_cursor None on the last page.
+    """
+    tasks = await query_tasks(db, user_id, after_id=after_id, limit=limit + 1, **filters)
+    items = tasks[:limit]
+    return items, (items[-1].id if len(tasks) > limit else None)
+
+
+async def get_tasks_by_status(db: AsyncSession, task_type: str, status: str):
+    result = await db.execute(select(Task).filter(Task.task_type == task_type, Task.status == status))
+    return result.scalars().all()
+
+
+async def update_task_status(db: AsyncSession, task_id: int, status: str, logs: str = None, log_size: int = None):
     result = await db.execute(select(Task).filter(Task.id == task_id))
     db_task = result.scalars().first()
     if db_task:
         db_task.status = status
         if logs is not None:
-            db_task.logs = logs
+            await append_task_log(db, task_id, logs)
+            db_task.logs = log_summary(logs)
+        if log_size is not None:
+            db_task.log_size = log_size
         await db.commit()
         await db.refresh(db_task)
+        await _publish_status_async(db_task)
+        if status in FINAL_STATUSES:
+            await release_task_slot(db_task.user_id, task_id)
     return db_task
 
-def update_task_status_sync(db: Session, task_id: int, status: str, logs: str = None):
+def update_task_status_sync(db: Session, task_id: int, status: str, logs: str = None, log_size: int = None):
     db_task = db.query(Task).filter(Task.id == task_id).first()
     if db_task:
         db_task.status = status
         if logs is not None:
-            db_task.logs = logs
+            append_task_log_sync(db, task_id, logs)
+            db_task.logs = log_summary(logs)
+        if log_size is not None:
+            db_task.log_size = log_size
         db.commit()
         db.refresh(db_task)
+        _publish_status(db_task)
+        if status in FINAL_STATUSES:
+            release_task_slot_sync(db_task.user_id, task_id)
     return db_task
 
 
@@ -0,0 +1,101 @@
+import zlib
+from typing import List, Optional
+from sqlalchemy import update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from sqlalchemy.future import select
+from models.task_model import Task
+from models.task_log_model import TaskLogChunk
+from config import settings
+
+
+# --------------------
+# Encoding
+# --------------------
+def _split(data: bytes, size: int) -> List[bytes]:
+    """Split into pieces of at most `size` bytes without cutting a UTF-8 character."""
+    pieces = []
+    while len(data) > size:
+        cut = size
+        while cut > 0 and (data[cut] & 0xC0) == 0x80:
+            cut -= 1
+        cut = cut or size
+        pieces.append(data[:cut])
+        data = data[cut:]
+    if data:
+        pieces.append(data)
+    return pieces
+
+
+def _encode(task_id: int, start_seq: int, pieces: List[bytes]) -> List[TaskLogChunk]:
+    chunks = []
+    for offset, raw in enumerate(pieces):
+        codec, data = "raw", raw
+        if len(raw) >= settings.TASK_LOG_COMPRESS_MIN_BYTES:
+            packed = zlib.compress(raw, 6)
+            if len(packed) < len(raw):
+                codec, data = "zlib", packed
+        chunks.append(TaskLogChunk(task_id=task_id, seq=start_seq + offset, codec=codec, size=len(raw), data=data))
+    return chunks
+
+
+def _decode(chunk: TaskLogChunk) -> str:
+    data = zlib.decompress(chunk.data) if chunk.codec == "zlib" else chunk.data
+    return data.decode("utf-8", errors="replace")
+
+
+def log_summary(text: str) -> str:
+    """What stays on the task row: the end of the latest message."""
+    limit = settings.TASK_LOG_SUMMARY_CHARS
+    return text if len(text) <= limit else "..." + text[-(limit - 3):]
+
+
+def _reserve(task_id: int, count: int):
+    # Atomic counter bump, so concurrent appenders never reuse a seq
+    return (
+        update(Task)
+        .where(Task.id == task_id)
+        .values(log_seq=Task.log_seq + count)
+        .returning(Task.log_seq)
+    )
+
+
+# --------------------
+# Writes (no commit: callers commit together with the status change)
+# --------------------
+async def append_task_log(db: AsyncSession, task_id: int, text: str) -> int:
+    """Append `text` as one or more chunks. Returns the number of chunks written."""
+    pieces = _split(text.encode("utf-8"), settings.TASK_LOG_CHUNK_BYTES)
+    if not pieces:
+        return 0
+    end = (await db.execute(_reserve(task_id, len(pieces)))).scalar_one_or_none()
+    if end is None:
+        return 0
+    db.add_all(_encode(task_id, end - len(pieces), pieces))
+    return len(pieces)
+
+
+def append_task_log_sync(db: Session, task_id: int, text: str) -> int:
+    pieces = _split(text.encode("utf-8"), settings.TASK_LOG_CHUNK_BYTES)
+    if not pieces:
+        return 0
+    end = db.execute(_reserve(task_id, len(pieces))).scalar_one_or_none()
+    if end is None:
+        return 0
+    db.add_all(_encode(task_id, end - len(pieces), pieces))
+    return len(pieces)
+
+
+# --------------------
+# Reads
+# --------------------
+async def read_task_log(db: AsyncSession, task_id: int, start_seq: int = 0, limit: Optional[int] = None):
+    """Decoded chunks with seq >= `start_seq`, in order: [(seq, text, created_at)]."""
+    limit = min(limit or settings.TASK_LOG_MAX_CHUNKS_PER_READ, settings.TASK_LOG_MAX_CHUNKS_PER_READ)
+    result = await db.execute(
+        select(TaskLogChunk)
+        .filter(TaskLogChunk.task_id == task_id, TaskLogChunk.seq >= start_seq)
+        .order_by(TaskLogChunk.seq)
+        .limit(limit)
+    )
+    return [(c.seq, _decode(c), c.created_at) for c in result.scalars().all()]
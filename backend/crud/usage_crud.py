@@ -1,35 +1,104 @@
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import List
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
 from sqlalchemy.future import select
-from sqlalchemy import func
-from models.usage_model import Usage
+from sqlalchemy import func, insert
+from sqlalchemy.dialects import postgresql, sqlite
+from models.usage_model import Usage, UsageHourly
 from schemas.usage_schema import UsageCreate
 
 
-async def log_usage(db: AsyncSession, usage: UsageCreate):
-    db_usage = Usage(
-        user_id=usage.user_id,
-        task_id=usage.task_id,
-        cpu_seconds=usage.cpu_seconds,
-        gpu_seconds=usage.gpu_seconds,
-        memory_mb=usage.memory_mb,
+# --------------------
+# Hourly rollups
+# --------------------
+def _hour_of(usage: UsageCreate) -> datetime:
+    start = usage.period_start or datetime.now(timezone.utc)
+    if start.tzinfo is None:
+        start = start.replace(tzinfo=timezone.utc)
+    return start.astimezone(timezone.utc).replace(minute=0, second=0, microsecond=0)
+
+
+def _rollup_rows(usages: List[UsageCreate]) -> List[dict]:
+    rollups = defaultdict(lambda: {
+        "cpu_seconds": 0.0, "gpu_seconds": 0.0, "memory_mb": 0,
+        "memory_mb_seconds": 0.0, "period_seconds": 0.0, "peak_memory_mb": 0, "records": 0,
+    })
+    for u in usages:
+        row = rollups[(u.user_id, _hour_of(u))]
+        row["cpu_seconds"] += u.cpu_seconds
+        row["gpu_seconds"] += u.gpu_seconds
+        row["memory_mb"] += u.memory_mb
+        row["memory_mb_seconds"] += u.memory_mb * u.period_seconds
+        row["period_seconds"] += u.period_seconds
+        row["peak_memory_mb"] = max(row["peak_memory_mb"], u.peak_memory_mb)
+        row["records"] += 1
+    return [{"user_id": user_id, "hour": hour, **row} for (user_id, hour), row in rollups.items()]
+
+
+def _upsert_rollups(dialect: str):
+    """INSERT ... ON CONFLICT (user_id, hour) DO UPDATE, adding to the existing row."""
+    dialect_insert = postgresql.insert if dialect == "postgresql" else sqlite.insert
+    greatest = func.greatest if dialect == "postgresql" else func.max
+    stmt = dialect_insert(UsageHourly)
+    return stmt.on_conflict_do_update(
+        index_elements=[UsageHourly.user_id, UsageHourly.hour],
+        set_={
+            "cpu_seconds": UsageHourly.cpu_seconds + stmt.excluded.cpu_seconds,
+            "gpu_seconds": UsageHourly.gpu_seconds + stmt.excluded.gpu_seconds,
+            "memory_mb": UsageHourly.memory_mb + stmt.excluded.memory_mb,
+            "memory_mb_seconds": UsageHourly.memory_mb_seconds + stmt.excluded.memory_mb_seconds,
+            "period_seconds": UsageHourly.period_seconds + stmt.excluded.period_seconds,
+            "peak_memory_mb": greatest(UsageHourly.peak_memory_mb, stmt.excluded.peak_memory_mb),
+            "records": UsageHourly.records + stmt.excluded.records,
+        },
     )
+
+
+# --------------------
+# Writes
+# --------------------
+async def log_usage(db: AsyncSession, usage: UsageCreate):
+    db_usage = Usage(**usage.model_dump())
     db.add(db_usage)
+    await db.execute(_upsert_rollups(db.bind.dialect.name), _rollup_rows([usage]))
     await db.commit()
     await db.refresh(db_usage)
     return db_usage
 
 
+def log_usage_batch_sync(db: Session, usages: List[UsageCreate]) -> int:
+    """Insert many usage records and fold them into the hourly rollups in one transaction."""
+    if not usages:
+        return 0
+    db.execute(insert(Usage), [u.model_dump() for u in usages])
+    db.execute(_upsert_rollups(db.get_bind().dialect.name), _rollup_rows(usages))
+    db.commit()
+    return len(usages)
+
+
+# --------------------
+# Reads
+# --------------------
 async def get_usage_for_user(db: AsyncSession, user_id: int):
     result = await db.execute(select(Usage).filter(Usage.user_id == user_id))
     return result.scalars().all()
 
 
 async def get_total_usage(db: AsyncSession, user_id: int):
+    # Served from the hourly rollups (primary key prefix), not a scan of usage.
+    # Memory is integrated over metered time: MB-hours, and the average MB
+    # while containers were running.
+    memory_mb_seconds = func.coalesce(func.sum(UsageHourly.memory_mb_seconds), 0)
+    metered_seconds = func.sum(UsageHourly.period_seconds)
     result = await db.execute(
         select(
-            func.sum(Usage.cpu_seconds).label("total_cpu_seconds"),
-            func.sum(Usage.gpu_seconds).label("total_gpu_seconds"),
-            func.sum(Usage.memory_mb).label("total_memory_mb"),
-        ).filter(Usage.user_id == user_id)
+            func.coalesce(func.sum(UsageHourly.cpu_seconds), 0).label("total_cpu_seconds"),
+            func.coalesce(func.sum(UsageHourly.gpu_seconds), 0).label("total_gpu_seconds"),
+            (memory_mb_seconds / 3600.0).label("memory_mb_hours"),
+            func.coalesce(memory_mb_seconds / func.nullif(metered_seconds, 0), 0).label("average_memory_mb"),
+            func.coalesce(func.max(UsageHourly.peak_memory_mb), 0).label("peak_memory_mb"),
+        ).filter(UsageHourly.user_id == user_id)
     )
-    return result.first()  
+    return result.first()
@@ -3,6 +3,7 @@ from sqlalchemy.future import select
 from models.user_model import User
 from schemas.user_schema import UserCreate
 from utils.security_utils import get_password_hash
+from utils.cache_utils import Principal, principal_cache
 
 
 async def create_user(db: AsyncSession, user: UserCreate):
@@ -24,6 +25,35 @@ async def get_user_by_id(db: AsyncSession, user_id: int):
     return result.scalars().first()
 
 
+async def get_principal_by_id(db: AsyncSession, user_id: int):
+    """
+    Load the slim auth projection of a user, served from the principal cache
+    when possible. Only plain columns are selected so the `tasks`/`pages`
+    selectin relationships are never loaded.
+    """
+    principal = principal_cache.get(user_id)
+    if principal is not None:
+        return principal
+
+    result = await db.execute(
+        select(User.id, User.username, User.email, User.role, User.created_at)
+        .filter(User.id == user_id)
+    )
+    row = result.first()
+    if row is None:
+        return None
+
+    principal = Principal(
+        id=row.id,
+        username=row.username,
+        email=row.email,
+        role=row.role,
+        created_at=row.created_at,
+    )
+    principal_cache.set(principal)
+    return principal
+
+
 async def get_user_by_email(db: AsyncSession, email: str):
     print(f"get_user_by_email called with email: {email}")
     result = await db.execute(select(User).filter(User.email == email))
@@ -45,6 +75,7 @@ async def update_user_role(db: AsyncSession, user_id: int, new_role: str):
         db_user.role = new_role
         await db.commit()
         await db.refresh(db_user)
+    principal_cache.invalidate(user_id)
     return db_user
 
 
@@ -54,4 +85,5 @@ async def delete_user(db: AsyncSession, user_id: int):
     if db_user:
         await db.delete(db_user)
         await db.commit()
+    principal_cache.invalidate(user_id)
     return db_user
@@ -1,11 +1,13 @@
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.orm import sessionmaker, declarative_base
 from config import Settings
+from db.engine_profile import engine_options, apply_sqlite_pragmas
 
 settings = Settings()
 DATABASE_URL = settings.ASYNC_DATABASE_URL
 
-engine = create_async_engine(DATABASE_URL, echo=True, future=True)
+engine = create_async_engine(DATABASE_URL, future=True, **engine_options(DATABASE_URL))
+apply_sqlite_pragmas(engine.sync_engine)
 
 SessionLocal = sessionmaker(
     bind=engine,
@@ -0,0 +1,70 @@
+from sqlalchemy import event
+from sqlalchemy.engine import Engine, make_url
+
+from config import settings
+
+
+def _is_sqlite(url: str) -> bool:
+    return make_url(url).get_backend_name() == "sqlite"
+
+
+def _is_memory_sqlite(url: str) -> bool:
+    database = make_url(url).database
+    return not database or database == ":memory:" or database.startswith("file::memory:")
+
+
+def engine_options(url: str) -> dict:
+    """
+    Keyword arguments for create_engine/create_async_engine built from the
+    DB_* / SQLITE_* settings. The API (async) and the Celery worker (sync)
+    use the same profile so they cooperate on one SQLite file.
+    """
+    options = {
+        "echo": settings.DB_ECHO,
+        # a local SQLite file has no server connection to go stale
+        "pool_pre_ping": settings.DB_POOL_PRE_PING and not _is_sqlite(url),
+        "query_cache_size": settings.DB_STATEMENT_CACHE_SIZE,
+    }
+    connect_args = {}
+
+    if not (_is_sqlite(url) and _is_memory_sqlite(url)):
+        # in-memory SQLite uses a single static connection; no pool to size
+        options.update(
+            pool_size=settings.DB_POOL_SIZE,
+            max_overflow=settings.DB_MAX_OVERFLOW,
+            pool_timeout=settings.DB_POOL_TIMEOUT_SECONDS,
+            pool_recycle=settings.DB_POOL_RECYCLE_SECONDS,
+        )
+
+    if _is_sqlite(url):
+        # Python-level lock wait, on top of busy_timeout below
+        connect_args["timeout"] = settings.SQLITE_BUSY_TIMEOUT_MS / 1000
+    elif make_url(url).get_driver_name() == "asyncpg":
+        connect_args["prepared_statement_cache_size"] = settings.DB_STATEMENT_CACHE_SIZE
+
+    if connect_args:
+        options["connect_args"] = connect_args
+    return options
+
+
+def apply_sqlite_pragmas(engine: Engine) -> None:
+    """
+    Set WAL, synchronous, busy_timeout and mmap_size on every new SQLite
+    connection of `engine` (pass `async_engine.sync_engine` for async ones).
+    WAL lets the API read while the worker writes; busy_timeout makes
+    writers wait for the lock instead of failing with "database is locked".
+    """
+    if engine.dialect.name != "sqlite":
+        return
+
+    @event.listens_for(engine, "connect")
+    def _set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            cursor.execute(f"PRAGMA busy_timeout = {int(settings.SQLITE_BUSY_TIMEOUT_MS)}")
+            if not _is_memory_sqlite(str(engine.url)):
+                cursor.execute(f"PRAGMA journal_mode = {settings.SQLITE_JOURNAL_MODE}")
+            cursor.execute(f"PRAGMA synchronous = {settings.SQLITE_SYNCHRONOUS}")
+            cursor.execute(f"PRAGMA mmap_size = {int(settings.SQLITE_MMAP_SIZE)}")
+        finally:
+            cursor.close()
@@ -0,0 +1,76 @@
+from sqlalchemy import Float, Integer, inspect
+from sqlalchemy.engine import Connection
+from sqlalchemy.sql.elements import TextClause
+
+
+def _literal(value) -> str | None:
+    if isinstance(value, bool):
+        return "1" if value else "0"
+    if isinstance(value, (int, float)):
+        return repr(value)
+    if isinstance(value, str):
+        try:
+            float(value)
+            return value
+        except ValueError:
+            return "'" + value.replace("'", "''") + "'"
+    return None
+
+
+def _default_sql(column) -> str | None:
+    """Constant DEFAULT for a column, or None (function defaults can't be added to existing rows)."""
+    if column.server_default is not None:
+        arg = column.server_default.arg
+        return arg.text if isinstance(arg, TextClause) else _literal(arg)
+    if column.default is not None and column.default.is_scalar:
+        return _literal(column.default.arg)
+    return None
+
+
+def upgrade_schema(conn: Connection) -> None:
+    """
+    Bring tables created by an older version up to the current models.
+    `create_all` only creates missing tables, so this adds missing columns
+    (ALTER TABLE ... ADD COLUMN), creates missing indexes, and widens
+    Integer columns that became Float. Every step checks the live schema
+    first, so it is safe to run on every startup.
+    """
+    from db.db_connection import Base
+
+    inspector = inspect(conn)
+    preparer = conn.dialect.identifier_preparer
+    existing_tables = set(inspector.get_table_names())
+
+    for table in Base.metadata.sorted_tables:
+        if table.name not in existing_tables:
+            continue  # just created by create_all, already current
+        table_name = preparer.format_table(table)
+        live = {c["name"]: c for c in inspector.get_columns(table.name)}
+
+        for column in table.columns:
+            column_name = preparer.format_column(column)
+            if column.name not in live:
+                ddl = f"ALTER TABLE {table_name} ADD COLUMN {column_name} {column.type.compile(dialect=conn.dialect)}"
+                default = _default_sql(column)
+                if default is not None:
+                    ddl += f" DEFAULT {default}"
+                    if not column.nullable:
+                        ddl += " NOT NULL"
+                conn.exec_driver_sql(ddl)
+                print(f"[DB] Added column {table.name}.{column.name}")
+            elif (
+                isinstance(column.type, Float)
+                and isinstance(live[column.name]["type"], Integer)
+                and conn.dialect.name != "sqlite"  # SQLite stores REAL in INTEGER columns as-is
+            ):
+                conn.exec_driver_sql(
+                    f"ALTER TABLE {table_name} ALTER COLUMN {column_name} "
+                    f"TYPE {column.type.compile(dialect=conn.dialect)}"
+                )
+                print(f"[DB] Widened column {table.name}.{column.name} to {column.type}")
+
+        live_indexes = {i["name"] for i in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in live_indexes:
+                index.create(conn, checkfirst=True)
+                print(f"[DB] Created index {index.name}")
@@ -2,4 +2,6 @@ from .auth import JWTMiddleware
 
 from .cors import setup_cors
 
-from .logger import StaticAccessLogger
\ No newline at end of file
+from .logger import StaticAccessLogger
+
+from .rate_limiter import RateLimitMiddleware
\ No newline at end of file
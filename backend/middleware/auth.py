@@ -1,12 +1,14 @@
-from fastapi import Request
-from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.requests import Request
 from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
 from jose import jwt, JWTError
 from sqlalchemy.ext.asyncio import AsyncSession
 from db.db_connection import get_db
-from crud.user_crud import get_user_by_id
+from crud.user_crud import get_principal_by_id
 from config import settings
 
+AUTH_SKIP_PATHS = {"/auth/login", "/auth/register", "/auth/whoami"}
+
 async def get_current_user_from_token(token: str, db: AsyncSession):
     try:
         payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
@@ -16,21 +18,35 @@ async def get_current_user_from_token(token: str, db: AsyncSession):
     except JWTError:
         return None
 
-    user = await get_user_by_id(db, int(user_id))
+    user = await get_principal_by_id(db, int(user_id))
     return user
 
-class JWTMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request: Request, call_next):
+class JWTMiddleware:
+    """
+    Pure ASGI JWT authentication. Sets `request.state.user` for HTTP requests
+    and answers 401 without touching the downstream app on failure.
+    Non-HTTP scopes (websocket, lifespan) are passed through untouched.
+    """
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request = Request(scope)
+
         # Skip auth routes
-        if request.url.path in ["/auth/login", "/auth/register", "/auth/whoami"]:
-            return await call_next(request)
-        
-        if request.method == "OPTIONS":
-            return await call_next(request)
+        if scope["path"] in AUTH_SKIP_PATHS or scope["method"] == "OPTIONS":
+            await self.app(scope, receive, send)
+            return
 
         auth_header = request.headers.get("Authorization")
         if auth_header is None or not auth_header.startswith("Bearer "):
-            return JSONResponse(status_code=401, content={"detail": "Authorization header missing"})
+            response = JSONResponse(status_code=401, content={"detail": "Authorization header missing"})
+            await response(scope, receive, send)
+            return
 
         token = auth_header.split(" ")[1]
 
@@ -38,8 +54,9 @@ class JWTMiddleware(BaseHTTPMiddleware):
         async for db in get_db():
             user = await get_current_user_from_token(token, db)
             if not user:
-                return JSONResponse(status_code=401, content={"detail": "Invalid or expired token"})
+                response = JSONResponse(status_code=401, content={"detail": "Invalid or expired token"})
+                await response(scope, receive, send)
+                return
             request.state.user = user
 
-        response = await call_next(request)
-        return response
+        await self.app(scope, receive, send)
@@ -1,32 +1,61 @@
 # middleware/static_logger.py
-import os
+import re
 from datetime import datetime
-from fastapi import Request
-from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 
-class StaticAccessLogger(BaseHTTPMiddleware):
+from utils.logging_utils import access_log_writer
+
+STATIC_PREFIX = "/static/"
+_TASK_DIR = re.compile(r"task_\d+")
+
+# Responses that never reach the site itself; they are not logged
+UNAUTHORIZED_STATUSES = {401, 403}
+
+
+def workspace_for_static_path(path: str):
+    """
+    Map a /static/<owner>/task_<id>/... request path to the task workspace
+    ("<owner>/task_<id>", relative to the workspaces root) that owns it, or
+    None if the path doesn't have that shape. String work only: the writer
+    checks that the workspace really exists before logging to it.
+    """
+    parts = [seg for seg in path[len(STATIC_PREFIX):].split("/") if seg]
+    if len(parts) < 2 or parts[0] in ("..", ".") or not _TASK_DIR.fullmatch(parts[1]):
+        return None
+    return f"{parts[0]}/{parts[1]}"
+
+
+class StaticAccessLogger:
     """
     Middleware to log all accesses to /static.
     Stores logs in the workspace folder for each deployment.
+    Records are only enqueued here; `access_log_writer` batches them to disk
+    in the background so the request path never touches the filesystem.
     """
-    async def dispatch(self, request: Request, call_next):
-        response = await call_next(request)
-
-        if request.url.path.startswith("status/tasks/static/"):
-            parts = request.url.path.split("/")
-            try:
-                print("yes")
-                task_segment = [seg for seg in parts if seg.startswith("task_")]
-                if task_segment:
-                    task_id = task_segment[0].replace("task_", "")
-                    workspace_path = os.path.abspath(f"./workspaces/task_{task_id}")
-                    os.makedirs(workspace_path, exist_ok=True)
-                    log_file = os.path.join(workspace_path, "access.log")
-                    with open(log_file, "a") as f:
-                        ip = request.client.host
-                        timestamp = datetime.utcnow().isoformat()
-                        f.write(f"{timestamp} {ip}\n")
-            except Exception as e:
-                print("Failed to log static access:", e)
-
-        return response
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or not scope["path"].startswith(STATIC_PREFIX):
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+
+        async def send_wrapper(message: Message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            workspace = workspace_for_static_path(scope["path"])
+            if workspace and status_code not in UNAUTHORIZED_STATUSES:
+                client = scope.get("client")
+                ip = client[0] if client else "-"
+                timestamp = datetime.utcnow().isoformat()
+                access_log_writer.submit(
+                    workspace, f"{timestamp} {ip} {scope['method']} {scope['path']} {status_code}\n"
+                )
@@ -1,54 +1,102 @@
-# middleware/ratelimit.py
-from fastapi import Request
-from fastapi.responses import JSONResponse
-from starlette.middleware.base import BaseHTTPMiddleware
-from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.future import select
-from models.task_model import Task, TaskStatusEnum, TaskEnum
-from datetime import datetime, timedelta
-
-class TaskRateLimitMiddleware(BaseHTTPMiddleware):
-    def __init__(self, app, db_session: AsyncSession):
-        super().__init__(app)
-        self.db_session = db_session
-
-    async def dispatch(self, request: Request, call_next):
-        user = request.state.user  # assuming user is set in auth middleware
-
-        if not user:
-            return await call_next(request)  # skip if no user (or handle auth separately)
-
-        # Only apply limits on task creation routes
-        if request.url.path.startswith("/compute/start") or request.url.path.startswith("/static/github") or request.url.path.startswith("/static"):
-            # Count running or pending tasks today
-            async with self.db_session() as session:
-                now = datetime.now(datetime.UTC)
-                start_of_day = datetime(now.year, now.month, now.day)
-
-                result = await session.execute(
-                    select(Task)
-                    .filter(
-                        Task.user_id == user.id,
-                        Task.created_at >= start_of_day,
-                        Task.status.in_([TaskStatusEnum.pending, TaskStatusEnum.running])
-                    )
-                )
-                tasks_today = result.scalars().all()
+# middleware/rate_limiter.py
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
 
-            compute_count = sum(1 for t in tasks_today if t.task_type == TaskEnum.compute)
-            static_count = sum(1 for t in tasks_today if t.task_type == TaskEnum.staticpage)
+from config import settings
+from utils.rate_limit import limits_for, hit, acquire_task_slot, cancel_task_slot
 
-            # Enforce limits
-            if request.url.path.startswith("/compute") and compute_count >= 2:
-                return JSONResponse(
-                    status_code=429,
-                    content={"detail": "Daily limit of 2 compute tasks reached."}
-                )
-            if request.url.path.startswith("/static") and static_count >= 2:
-                return JSONResponse(
-                    status_code=429,
-                    content={"detail": "Daily limit of 2 static tasks reached."}
+# (method, path) -> whether the task holds a concurrent slot while it runs
+SUBMISSION_ROUTES = {
+    ("POST", "/compute/start"): True,
+    ("POST", "/static_pages/static"): False,
+    ("POST", "/static_pages/github"): False,
+}
+
+
+def _too_many(detail: str, limit: int, retry_after: int) -> JSONResponse:
+    return JSONResponse(
+        status_code=429,
+        content={"detail": detail},
+        headers={
+            "Retry-After": str(retry_after),
+            "X-RateLimit-Limit": str(limit),
+            "X-RateLimit-Remaining": "0",
+        },
+    )
+
+
+class RateLimitMiddleware:
+    """
+    Pure ASGI per-user limits, checked against Redis only (no DB):
+    requests per second, task submissions per sliding window, and
+    unfinished compute tasks (a GPU task waiting for a slice holds its
+    slot too). Must sit inside JWTMiddleware so
+    `request.state.user` is set; unauthenticated scopes pass through.
+    A compute submission reserves a slot and exposes it as
+    `request.state.task_slot`; the service claims it for the new task and
+    an unclaimed reservation is dropped when the request ends.
+    If Redis is unavailable requests are let through.
+    """
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or not settings.RATE_LIMIT_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        request = Request(scope)
+        user = getattr(request.state, "user", None)
+        if user is None:
+            await self.app(scope, receive, send)
+            return
+
+        limits = limits_for(user.id, user.role)
+        holds_slot = SUBMISSION_ROUTES.get((scope["method"], scope["path"]))
+        reservation = None
+        try:
+            decision = await hit("rps", user.id, limits.requests_per_second, 1)
+            if not decision.allowed:
+                response = _too_many("Too many requests", decision.limit, decision.retry_after)
+                await response(scope, receive, send)
+                return
+
+            if holds_slot:
+                reservation = await acquire_task_slot(user.id, limits.concurrent_tasks)
+                if reservation is None:
+                    response = _too_many(
+                        f"Limit of {limits.concurrent_tasks} concurrent tasks reached",
+                        limits.concurrent_tasks,
+                        settings.RATE_LIMIT_SLOT_RETRY_SECONDS,
+                    )
+                    await response(scope, receive, send)
+                    return
+                request.state.task_slot = reservation
+
+            if holds_slot is not None:
+                decision = await hit(
+                    "submissions", user.id, limits.submissions, limits.submission_window_seconds
                 )
+                if not decision.allowed:
+                    if reservation:
+                        await cancel_task_slot(user.id, reservation)
+                    response = _too_many(
+                        f"Limit of {limits.submissions} task submissions per "
+                        f"{limits.submission_window_seconds}s reached",
+                        decision.limit,
+                        decision.retry_after,
+                    )
+                    await response(scope, receive, send)
+                    return
+        except Exception as e:
+            print(f"[RATE LIMIT] Redis unavailable, not limiting: {e}")
 
-        response = await call_next(request)
-        return response
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            if reservation:
+                try:
+                    await cancel_task_slot(user.id, reservation)
+                except Exception as e:
+                    print(f"[RATE LIMIT] Could not drop reservation: {e}")
@@ -0,0 +1,13 @@
+# models/task_log.py
+from sqlalchemy import Column, Integer, String, LargeBinary, ForeignKey, DateTime, func
+from db.db_connection import Base
+
+class TaskLogChunk(Base):
+    __tablename__ = "task_log_chunks"
+
+    task_id = Column(Integer, ForeignKey("tasks.id", ondelete="CASCADE"), primary_key=True)
+    seq = Column(Integer, primary_key=True)  # 0-based, append-only per task
+    codec = Column(String(10), nullable=False, default="raw")  # "raw" or "zlib"
+    size = Column(Integer, nullable=False)  # uncompressed bytes
+    data = Column(LargeBinary, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
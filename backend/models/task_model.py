@@ -1,5 +1,5 @@
 # models/task.py
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, func
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Index, func
 from sqlalchemy.orm import relationship
 from db.db_connection import Base
 
@@ -9,9 +9,16 @@ class Task(Base):
     id = Column(Integer, primary_key=True, index=True)
     task_type = Column(String(50), nullable=False) 
     status = Column(String(20), default="pending")  
-    logs = Column(String, nullable=True)
+    logs = Column(String, nullable=True)  # short summary; full history lives in task_log_chunks
+    log_seq = Column(Integer, nullable=False, default=0, server_default="0")  # next chunk seq
+    log_size = Column(Integer, nullable=True)  # bytes written to container.log
     path = Column(String, nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
     user_id = Column(Integer, ForeignKey("users.id"))
     user = relationship("User", back_populates="tasks", lazy="selectin")
+
+    __table_args__ = (
+        # Serves the per-user task list: filter by type/status, newest first
+        Index("ix_tasks_user_type_status_created", "user_id", "task_type", "status", "created_at"),
+    )
@@ -1,15 +1,39 @@
 # models/usage.py
-from sqlalchemy import Column, Integer, ForeignKey, DateTime, func
+from sqlalchemy import Column, Integer, Float, ForeignKey, DateTime, Index, func
 from db.db_connection import Base
 
 class Usage(Base):
+    """One metering period of one task container."""
     __tablename__ = "usage"
 
     id = Column(Integer, primary_key=True, index=True)
-    cpu_seconds = Column(Integer, default=0)
-    gpu_seconds = Column(Integer, default=0)
-    memory_mb = Column(Integer, default=0)
+    cpu_seconds = Column(Float, default=0)
+    gpu_seconds = Column(Float, default=0)
+    memory_mb = Column(Integer, default=0)  # time-weighted average over the period
+    peak_memory_mb = Column(Integer, default=0)
+    period_start = Column(DateTime(timezone=True), nullable=True)
+    period_seconds = Column(Float, default=0)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
     user_id = Column(Integer, ForeignKey("users.id"))
     task_id = Column(Integer, ForeignKey("tasks.id"))
+
+    __table_args__ = (
+        Index("ix_usage_user_created", "user_id", "created_at"),
+        Index("ix_usage_task", "task_id"),
+    )
+
+
+class UsageHourly(Base):
+    """Per-user hourly rollup of Usage, maintained on insert."""
+    __tablename__ = "usage_hourly"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    hour = Column(DateTime(timezone=True), primary_key=True)
+    cpu_seconds = Column(Float, nullable=False, default=0)
+    gpu_seconds = Column(Float, nullable=False, default=0)
+    memory_mb = Column(Integer, nullable=False, default=0)  # sum of period averages
+    memory_mb_seconds = Column(Float, nullable=False, default=0)
+    period_seconds = Column(Float, nullable=False, default=0)
+    peak_memory_mb = Column(Integer, nullable=False, default=0)
+    records = Column(Integer, nullable=False, default=0)
@@ -1,10 +1,13 @@
 from fastapi import APIRouter, Request, Depends, Query
+from starlette.concurrency import run_in_threadpool
 from sqlalchemy.ext.asyncio import AsyncSession
-from typing import List
+from typing import List, Literal, Optional
 
 from db.db_connection import get_db
-from schemas import TaskResponse, FileNode, ComputeTaskRequest
-from services import start_compute_task, list_user_tasks, list_task_files, download_task_file, get_tree_task_workspace
+from schemas import TaskResponse, TaskSummaryResponse, TaskPage, FileNode, ComputeTaskRequest, WorkspacePage
+from utils.image_cache import image_cache_state
+from config import settings
+from services import start_compute_task, list_user_tasks, list_task_files, download_task_file, download_task_archive, get_tree_task_workspace, query_task_workspace
 router = APIRouter(prefix="/compute", tags=["Compute"])
 
 @router.post("/start", response_model=TaskResponse)
@@ -13,16 +16,29 @@ async def start_compute(
     request: Request,
     db: AsyncSession = Depends(get_db),
 ):
-    task = await start_compute_task(task_request, request.state.user, db)
+    task = await start_compute_task(
+        task_request, request.state.user, db, task_slot=getattr(request.state, "task_slot", None)
+    )
     return TaskResponse.model_validate(task)
 
-@router.get("/tasks", response_model=List[TaskResponse])
-async def list_my_tasks(request: Request, db: AsyncSession = Depends(get_db)):
-    tasks = await list_user_tasks(request.state.user, db)
-    return [TaskResponse.model_validate(t) for t in tasks]
+@router.get("/images")
+async def image_cache(top: int = Query(default=settings.IMAGE_PREPULL_TOP_N, ge=1, le=100)):
+    """Most requested compute images and their warm-cache state."""
+    return await run_in_threadpool(image_cache_state, top)
+
+@router.get("/tasks", response_model=TaskPage)
+async def list_my_tasks(
+    request: Request,
+    db: AsyncSession = Depends(get_db),
+    cursor: Optional[int] = Query(None, description="next_cursor from the previous page"),
+    limit: int = Query(settings.TASK_PAGE_SIZE, ge=1, le=settings.TASK_MAX_PAGE_SIZE),
+):
+    """Page through the authenticated user's tasks, newest first. Log bodies are not included."""
+    tasks, next_cursor = await list_user_tasks(request.state.user, db, cursor=cursor, limit=limit)
+    return TaskPage(items=[TaskSummaryResponse.model_validate(t) for t in tasks], next_cursor=next_cursor)
 
 @router.get("/{task_id}/files", response_model=List[FileNode])
-async def list_task_files(
+async def list_task_files_route(
     task_id: int,
     request: Request,
     db: AsyncSession = Depends(get_db),
@@ -31,14 +47,44 @@ async def list_task_files(
     return await list_task_files(request.state.user, task_id, db, path)
 
 @router.get("/{task_id}/download")
-async def download_task_file(
+async def download_task_file_route(
     task_id: int,
     request: Request,
     db: AsyncSession = Depends(get_db),
     path: str = Query(..., description="Relative path to file inside task workspace"),
 ):
-    return await download_task_file(request.state.user, task_id, db, path)
+    return await download_task_file(request.state.user, task_id, db, path, request.headers)
+
+@router.get("/{task_id}/archive")
+async def download_task_archive_route(
+    task_id: int,
+    request: Request,
+    db: AsyncSession = Depends(get_db),
+    path: str = Query(default="", description="Directory inside the task workspace to zip"),
+):
+    return await download_task_archive(request.state.user, task_id, db, path)
 
 @router.get("/{task_id}/tree", response_model=List[FileNode])
 async def tree_task_workspace(task_id: int, request: Request, db: AsyncSession = Depends(get_db)):
     return await get_tree_task_workspace(request.state.user, task_id, db)
+
+@router.get("/{task_id}/index", response_model=WorkspacePage)
+async def query_task_workspace_index(
+    task_id: int,
+    request: Request,
+    db: AsyncSession = Depends(get_db),
+    path: str = Query(default="", description="Directory inside the task workspace"),
+    depth: Optional[int] = Query(None, ge=1, description="Levels below `path` (1 = direct children)"),
+    glob: Optional[str] = Query(None, description="Glob on the relative path (or name if it has no '/')"),
+    ext: Optional[List[str]] = Query(None, description="File extensions, e.g. ext=pt&ext=json"),
+    kind: Optional[Literal["file", "dir"]] = Query(None),
+    sort: Literal["path", "name", "size", "mtime"] = Query("path"),
+    order: Literal["asc", "desc"] = Query("asc"),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    limit: int = Query(settings.WORKSPACE_INDEX_PAGE_SIZE, ge=1, le=settings.WORKSPACE_INDEX_MAX_PAGE_SIZE),
+):
+    return await query_task_workspace(
+        request.state.user, task_id, db,
+        path=path, depth=depth, glob=glob, extensions=ext, kind=kind,
+        sort=sort, descending=order == "desc", cursor=cursor, limit=limit,
+    )
@@ -1,21 +1,27 @@
 # routers/status_router.py
 import os
 import asyncio
-from typing import List
-from fastapi import APIRouter, Request, Depends, HTTPException, WebSocket, WebSocketDisconnect
+from datetime import datetime
+from typing import List, Optional
+from fastapi import APIRouter, Request, Depends, HTTPException, WebSocket, WebSocketDisconnect, Query
 from fastapi.responses import FileResponse, PlainTextResponse
+from starlette.concurrency import run_in_threadpool
 from sqlalchemy.ext.asyncio import AsyncSession
-import docker
 
 from db.db_connection import get_db
-from crud import get_task, get_tasks_for_user
-from schemas.task_schema import TaskResponse, TaskEnum
+from crud import get_task, query_tasks, query_task_page, read_task_log, get_total_usage
+from schemas.task_schema import (
+    TaskResponse, TaskEnum, TaskStatusEnum, TaskSummaryResponse, TaskPage,
+    TaskLogChunkResponse, TaskLogPage,
+)
+from schemas.usage_schema import UsageTotals
 
-from services import get_resource_status, get_gpu_vram
-import psutil
-import GPUtil
-import asyncio
-from fastapi import WebSocket, WebSocketDisconnect
+from services import resource_sampler, read_byte_window, read_tail_lines, log_hub, task_event_hub
+from middleware.auth import get_current_user_from_token
+from utils import compute_container_name, static_container_name
+from utils.http_utils import parse_range_header, file_download_response
+from utils.workspace_index import WorkspaceIndex
+from config import settings
 
 
 router = APIRouter(
@@ -23,9 +29,6 @@ router = APIRouter(
     tags=["Status & Logs"]
 )
 
-docker_client = docker.from_env()
-
-
 # --------------------
 # Task Status
 # --------------------
@@ -39,56 +42,168 @@ async def task_status(task_id: int, request: Request, db: AsyncSession = Depends
     return task
 
 
-@router.get("/tasks/compute", response_model=List[TaskResponse])
-async def list_compute_tasks(request: Request, db: AsyncSession = Depends(get_db)):
-    """List only compute tasks for the authenticated user."""
+@router.get("/task/{task_id}/log", response_model=TaskLogPage)
+async def task_log_chunks(
+    task_id: int,
+    request: Request,
+    db: AsyncSession = Depends(get_db),
+    from_seq: int = Query(0, ge=0, description="First chunk to return; pass next_seq to continue"),
+    limit: int = Query(settings.TASK_LOG_MAX_CHUNKS_PER_READ, ge=1, le=settings.TASK_LOG_MAX_CHUNKS_PER_READ),
+):
+    """Status/log history of a task, read by chunk sequence number."""
     user = request.state.user
-    tasks = await get_tasks_for_user(db, user.id)
-    return [t for t in tasks if t.task_type == TaskEnum.compute]
+    task = await get_task(db, task_id)
+    if not task or task.user_id != user.id:
+        raise HTTPException(status_code=404, detail="Task not found")
+    chunks = await read_task_log(db, task_id, start_seq=from_seq, limit=limit)
+    return TaskLogPage(
+        task_id=task_id,
+        chunks=[TaskLogChunkResponse(seq=seq, text=text, created_at=created) for seq, text, created in chunks],
+        next_seq=chunks[-1][0] + 1 if chunks else max(from_seq, task.log_seq or 0),
+        total_chunks=task.log_seq or 0,
+    )
 
 
-@router.get("/tasks/static", response_model=List[TaskResponse])
-async def list_static_tasks(request: Request, db: AsyncSession = Depends(get_db)):
-    """List only staticpage tasks for the authenticated user."""
+@router.get("/tasks", response_model=TaskPage)
+async def list_tasks(
+    request: Request,
+    db: AsyncSession = Depends(get_db),
+    task_type: Optional[TaskEnum] = Query(None, alias="type"),
+    status: Optional[List[TaskStatusEnum]] = Query(None, description="Repeat to match several statuses"),
+    created_after: Optional[datetime] = Query(None),
+    created_before: Optional[datetime] = Query(None),
+    cursor: Optional[int] = Query(None, description="next_cursor from the previous page"),
+    limit: int = Query(settings.TASK_PAGE_SIZE, ge=1, le=settings.TASK_MAX_PAGE_SIZE),
+):
+    """Page through the authenticated user's tasks, newest first. Log bodies are not included."""
     user = request.state.user
-    tasks = await get_tasks_for_user(db, user.id)
-    return [t for t in tasks if t.task_type == TaskEnum.staticpage]
+    items, next_cursor = await query_task_page(
+        db, user.id, after_id=cursor, limit=limit,
+        task_type=task_type, statuses=status,
+        created_after=created_after, created_before=created_before,
+    )
+    return TaskPage(items=[TaskSummaryResponse.model_validate(t) for t in items], next_cursor=next_cursor)
+
+
+@router.get("/tasks/compute", response_model=TaskPage)
+async def list_compute_tasks(
+    request: Request,
+    db: AsyncSession = Depends(get_db),
+    cursor: Optional[int] = Query(None, description="next_cursor from the previous page"),
+    limit: int = Query(settings.TASK_PAGE_SIZE, ge=1, le=settings.TASK_MAX_PAGE_SIZE),
+):
+    """Page through the authenticated user's compute tasks, newest first."""
+    user = request.state.user
+    items, next_cursor = await query_task_page(
+        db, user.id, after_id=cursor, limit=limit, task_type=TaskEnum.compute
+    )
+    return TaskPage(items=[TaskSummaryResponse.model_validate(t) for t in items], next_cursor=next_cursor)
+
+
+@router.get("/tasks/static", response_model=TaskPage)
+async def list_static_tasks(
+    request: Request,
+    db: AsyncSession = Depends(get_db),
+    cursor: Optional[int] = Query(None, description="next_cursor from the previous page"),
+    limit: int = Query(settings.TASK_PAGE_SIZE, ge=1, le=settings.TASK_MAX_PAGE_SIZE),
+):
+    """
+    Page through the authenticated user's staticpage tasks, newest first.
+    Each item carries its status line as `summary` (the site URL or the
+    deploy error); log chunks are never loaded.
+    """
+    user = request.state.user
+    items, next_cursor = await query_task_page(
+        db, user.id, after_id=cursor, limit=limit, task_type=TaskEnum.staticpage, include_logs=True
+    )
+    return TaskPage(
+        items=[TaskSummaryResponse.model_validate(t).model_copy(update={"summary": t.logs}) for t in items],
+        next_cursor=next_cursor,
+    )
 
 
 # --------------------
 # Logs (Stored in Workspace)
 @router.get("/logs/{task_id}", response_class=PlainTextResponse)
-async def get_task_log(task_id: int, request: Request):
-    """Return stored logs from the user's workspace as plain text."""
+async def get_task_log(
+    task_id: int,
+    request: Request,
+    tail: Optional[int] = Query(None, ge=1, description="Return only the last N lines"),
+    offset: Optional[int] = Query(None, ge=0, description="Byte offset to start reading from"),
+    limit: Optional[int] = Query(None, ge=1, description="Maximum number of bytes to return"),
+):
+    """
+    Return stored logs from the user's workspace as plain text.
+    Supports `?tail=N`, `?offset=&limit=` byte windows and `Range: bytes=`
+    requests; `X-Log-Size` always carries the current file size so clients
+    can poll incrementally.
+    """
     user = request.state.user
     log_path = os.path.abspath(f"./workspaces/{user.username}/task_{task_id}/container.log")
 
     if not os.path.exists(log_path):
         raise HTTPException(status_code=404, detail="Log file not found")
-    
-    with open(log_path, "r") as f:
-        log_content = f.read()
 
-    return PlainTextResponse(content=log_content)
+    max_window = settings.TASK_LOG_MAX_WINDOW_BYTES
+    range_header = request.headers.get("range")
+
+    if range_header:
+        size = os.path.getsize(log_path)
+        byte_range = parse_range_header(range_header, size)
+        if byte_range is not None:
+            start, end = byte_range
+            # Ranges get the same window cap as ?offset=&limit=; clients follow
+            # the Content-Range to request the rest
+            length = min(end - start + 1, max_window)
+            data, size = await run_in_threadpool(read_byte_window, log_path, start, length)
+            return PlainTextResponse(
+                content=data,
+                status_code=206,
+                headers={
+                    "Content-Range": f"bytes {start}-{start + len(data) - 1}/{size}",
+                    "Accept-Ranges": "bytes",
+                    "X-Log-Size": str(size),
+                },
+            )
+
+    if tail is not None:
+        data, start, size = await run_in_threadpool(read_tail_lines, log_path, tail, max_window)
+    elif offset is not None or limit is not None:
+        start = offset or 0
+        data, size = await run_in_threadpool(read_byte_window, log_path, start, min(limit or max_window, max_window))
+    else:
+        return FileResponse(log_path, media_type="text/plain", headers={"Accept-Ranges": "bytes"})
+
+    return PlainTextResponse(
+        content=data,
+        headers={
+            "Accept-Ranges": "bytes",
+            "X-Log-Size": str(size),
+            "X-Log-Offset": str(start),
+        },
+    )
 
 
 # --------------------
 # List Artifacts
 # --------------------
 @router.get("/artifacts/{task_id}", response_model=List[str])
-async def list_artifacts(task_id: int, request: Request):
+async def list_artifacts(
+    task_id: int,
+    request: Request,
+    depth: Optional[int] = Query(None, ge=1, description="Only list files this many levels deep"),
+    glob: Optional[str] = Query(None, description="Glob on the relative path (or name if it has no '/')"),
+):
     user = request.state.user
     task_workspace = f"./workspaces/{user.username}/task_{task_id}"
     if not os.path.exists(task_workspace):
         raise HTTPException(status_code=404, detail="Task workspace not found")
 
-    artifacts = []
-    for root, dirs, files in os.walk(task_workspace):
-        for file in files:
-            full_path = os.path.join(root, file)
-            relative_path = os.path.relpath(full_path, task_workspace)
-            artifacts.append(relative_path)
-    return artifacts
+    # Served from the workspace index instead of walking the tree per request
+    index = WorkspaceIndex(task_workspace)
+    await run_in_threadpool(index.refresh_if_stale, settings.WORKSPACE_INDEX_MAX_AGE_SECONDS)
+    page = await run_in_threadpool(index.query, depth=depth, glob=glob, kind="file", limit=None)
+    return [entry["path"] for entry in page["entries"]]
 
 # --------------------
 # Artifacts
@@ -100,10 +215,10 @@ async def get_artifact(task_id: int, file_path: str, request: Request):
     task_workspace = f"./workspaces/{user.username}/task_{task_id}"
     full_path = os.path.abspath(os.path.join(task_workspace, file_path))
 
-    if not full_path.startswith(os.path.abspath(task_workspace)) or not os.path.exists(full_path):
+    if not full_path.startswith(os.path.abspath(task_workspace)) or not os.path.isfile(full_path):
         raise HTTPException(status_code=404, detail="File not found")
 
-    return FileResponse(full_path)
+    return file_download_response(full_path, request.headers)
 
 
 # --------------------
@@ -111,61 +226,167 @@ async def get_artifact(task_id: int, file_path: str, request: Request):
 # --------------------
 @router.websocket("/ws/logs/{task_id}")
 async def websocket_logs(websocket: WebSocket, task_id: int):
-    """Stream live logs from a running container."""
+    """
+    Stream live logs from a running container.
+    All viewers of a task share one Docker log stream through `log_hub`;
+    new viewers first receive a replay of the most recent lines.
+    """
     await websocket.accept()
+    queue = None
     try:
         async for db in get_db():
             task = await get_task(db, task_id)
-            if not task:
-                await websocket.send_text("Task not found")
-                await websocket.close()
-                return
-
-            container = None
-            for c in docker_client.containers.list(all=True):
-                if f"user{task.user_id}_task{task_id}" in c.name:
-                    container = c
+        if not task:
+            await websocket.send_text("Task not found")
+            await websocket.close()
+            return
+
+        queue = await log_hub.subscribe(
+            task_id,
+            [compute_container_name(task_id), static_container_name(task.user_id, task_id)],
+        )
+        if queue is None:
+            await websocket.send_text("Container not running")
+            await websocket.close()
+            return
+
+        # Watch for client disconnects while waiting on log lines
+        receiver = asyncio.create_task(websocket.receive())
+        try:
+            while True:
+                getter = asyncio.create_task(queue.get())
+                done, _ = await asyncio.wait({getter, receiver}, return_when=asyncio.FIRST_COMPLETED)
+                if receiver in done:
+                    message = receiver.result()
+                    if message["type"] == "websocket.disconnect":
+                        getter.cancel()
+                        raise WebSocketDisconnect(message.get("code", 1000))
+                    receiver = asyncio.create_task(websocket.receive())
+                line = await getter
+                if line is None:
                     break
+                await websocket.send_text(line)
+        finally:
+            receiver.cancel()
 
-            if not container:
-                await websocket.send_text("Container not running")
-                await websocket.close()
-                return
+        await websocket.close()
+    except WebSocketDisconnect:
+        print(f"User disconnected from logs for task {task_id}")
+    finally:
+        if queue is not None:
+            log_hub.unsubscribe(task_id, queue)
 
-            loop = asyncio.get_event_loop()
+# --------------------
+# WebSocket Task Events (all of a user's tasks)
+# --------------------
+ACTIVE_STATUSES = [TaskStatusEnum.pending, TaskStatusEnum.queued, TaskStatusEnum.pulling, TaskStatusEnum.running]
 
-            def stream_logs():
-                for line in container.logs(stream=True):
-                    asyncio.run_coroutine_threadsafe(
-                        websocket.send_text(line.decode().strip()), loop
-                    )
+@router.websocket("/ws/tasks")
+async def websocket_task_events(websocket: WebSocket, token: str = Query(...)):
+    """
+    One stream per user carrying status changes and log-tail deltas for all
+    of their tasks, pushed from Redis pub/sub. Browsers can't set headers on
+    WebSockets, so the JWT comes as `?token=`. The first message is a
+    snapshot of the user's active tasks; after that the stream is push-only
+    and does not touch the database. A `ping` event is sent when idle.
+    The stream is subscribed before the snapshot is read, so no change is
+    lost in between; events queued meanwhile may repeat what the snapshot
+    already shows, and clients keep the most advanced status per task.
+    """
+    await websocket.accept()
+    async for db in get_db():
+        user = await get_current_user_from_token(token, db)
+    if not user:
+        await websocket.close(code=1008)
+        return
 
-            await loop.run_in_executor(None, stream_logs)
-            await websocket.close()
+    queue = receiver = getter = None
+    try:
+        queue = await task_event_hub.subscribe(user.id)
+        async for db in get_db():
+            active = await query_tasks(db, user.id, statuses=ACTIVE_STATUSES, limit=settings.TASK_MAX_PAGE_SIZE)
+        await websocket.send_json({
+            "event": "snapshot",
+            "tasks": [TaskSummaryResponse.model_validate(t).model_dump(mode="json") for t in active],
+        })
+        # Watch for client disconnects while waiting on events
+        receiver = asyncio.create_task(websocket.receive())
+        while True:
+            if getter is None:
+                getter = asyncio.create_task(queue.get())
+            done, _ = await asyncio.wait(
+                {getter, receiver},
+                timeout=settings.TASK_EVENTS_HEARTBEAT_SECONDS,
+                return_when=asyncio.FIRST_COMPLETED,
+            )
+            if not done:
+                await websocket.send_json({"event": "ping"})
+                continue
+            if receiver in done:
+                message = receiver.result()
+                if message["type"] == "websocket.disconnect":
+                    raise WebSocketDisconnect(message.get("code", 1000))
+                receiver = asyncio.create_task(websocket.receive())
+            if getter in done:
+                await websocket.send_text(getter.result())
+                getter = None
     except WebSocketDisconnect:
-        print(f"User disconnected from logs for task {task_id}")
+        print(f"User {user.id} disconnected from task events")
+    finally:
+        for pending in (receiver, getter):
+            if pending is not None:
+                pending.cancel()
+        if queue is not None:
+            await task_event_hub.unsubscribe(user.id, queue)
+
+# --------------------
+# Usage
+# --------------------
+@router.get("/usage", response_model=UsageTotals)
+async def usage_totals(request: Request, db: AsyncSession = Depends(get_db)):
+    """Metered CPU/GPU/memory totals of the authenticated user's compute tasks."""
+    user = request.state.user
+    totals = await get_total_usage(db, user.id)
+    return UsageTotals(**totals._mapping)
+
+# --------------------
+# Resource Telemetry
+# --------------------
+@router.get("/resources/history")
+async def resource_history(limit: Optional[int] = Query(None, ge=1)):
+    """Recent resource snapshots from the shared sampler, oldest first."""
+    return resource_sampler.get_history(limit)
+
 
 @router.websocket("/ws/resource_status")
 async def resource_status_ws(websocket: WebSocket):
     await websocket.accept()
+    queue = resource_sampler.subscribe()
     try:
         while True:
-            resource_data = get_resource_status()
-            await websocket.send_json(resource_data)
-            await asyncio.sleep(10)  
+            snapshot = await queue.get()
+            await websocket.send_json({
+                "cpu": snapshot["cpu"],
+                "memory": snapshot["memory"],
+                "gpu": snapshot["gpu"],
+            })
     except WebSocketDisconnect:
         print("Resource WebSocket disconnected")
+    finally:
+        resource_sampler.unsubscribe(queue)
 
 @router.websocket("/ws/gpu_vram")
-async def gpu_status_ws(websocket: WebSocket): 
-    await websocket.accept() 
-    try: 
-        while True: 
-            vram = get_gpu_vram() 
-            if vram is not None: 
-                await websocket.send_json({"available_vram": vram}) 
-            else: 
-                await websocket.send_json({"error": "Could not fetch GPU VRAM"}) 
-            await asyncio.sleep(10) # update every 2s 
-    except WebSocketDisconnect: 
-        print("GPU status WebSocket disconnected")
\ No newline at end of file
+async def gpu_status_ws(websocket: WebSocket):
+    await websocket.accept()
+    queue = resource_sampler.subscribe()
+    try:
+        while True:
+            vram = (await queue.get())["available_vram"]
+            if vram is not None:
+                await websocket.send_json({"available_vram": vram})
+            else:
+                await websocket.send_json({"error": "Could not fetch GPU VRAM"})
+    except WebSocketDisconnect:
+        print("GPU status WebSocket disconnected")
+    finally:
+        resource_sampler.unsubscribe(queue)
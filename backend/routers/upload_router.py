@@ -5,7 +5,6 @@ import uuid
 import subprocess
 from fastapi import APIRouter, HTTPException, UploadFile, File, Request, Depends, Form, Body
 from starlette.responses import JSONResponse
-import docker
 
 from utils import _get_free_port
 from db.db_connection import get_db
@@ -14,7 +13,12 @@ from crud import task_crud
 from schemas.task_schema import TaskCreate, TaskEnum, TaskResponse, TaskStatusEnum
 import asyncio 
 import glob
-from services import upload_service, delete_static_task, auto_shutdown_ngrok
+from services import upload_service, delete_static_task, auto_shutdown_ngrok, ArchiveRejected
+from services.blob_store import blob_store
+from services.precompress_service import read_report
+from utils.docker_utils import run_blocking
+from utils.multipart_stream import MultipartStream
+from config import settings
 
 router = APIRouter(
     prefix="/static_pages",
@@ -23,16 +27,34 @@ router = APIRouter(
 
 BASE_DIR = "workspaces"
 
-docker_client = docker.from_env()
-
 # ---------- STATIC HOSTING ----------
-@router.post("/static")
+# The body is parsed by hand (MultipartStream) so the archive is extracted
+# while it uploads; this keeps the form documented in the OpenAPI schema.
+UPLOAD_STATIC_BODY = {
+    "requestBody": {
+        "required": True,
+        "content": {"multipart/form-data": {"schema": {
+            "type": "object",
+            "required": ["file"],
+            "properties": {
+                "file": {"type": "string", "format": "binary"},
+                "isolated": {
+                    "type": "boolean", "default": False,
+                    "description": "Serve from a dedicated nginx container + tunnel",
+                },
+            },
+        }}},
+    }
+}
+
+
+@router.post("/static", openapi_extra=UPLOAD_STATIC_BODY)
 async def upload_static(
     request: Request,
-    file: UploadFile = File(...),
     db: AsyncSession = Depends(get_db)
 ):
     user = request.state.user
+    form = MultipartStream(request)
     user_id = user.id
     try:
         new_task = TaskCreate(
@@ -44,12 +66,23 @@ async def upload_static(
         )
         task_db = await task_crud.create_task(db, new_task)
         task_id = task_db.id 
-        extracted_path = await upload_service.save_and_extract_upload(
-            file, user.id, task_id
-        )
-        public_url = upload_service.serve_static_docker(
-            extracted_path, user.id, task_id
+        ingest = await upload_service.save_and_extract_upload(
+            await form.file("file"), user.id, task_id
         )
+        extracted_path = ingest.root
+        fields = await form.drain()
+        isolated = fields.get("isolated", "false").lower() in ("1", "true", "on", "yes")
+        use_container = isolated or settings.STATIC_HOSTING_MODE == "container"
+        if use_container:
+            public_url = await run_blocking(
+                upload_service.serve_static_docker, extracted_path, user.id, task_id
+            )
+        else:
+            public_url = upload_service.serve_static_shared(extracted_path, user.id, task_id)
+            # Remember the site root so it can be re-registered after a restart
+            task_db.path = extracted_path
+            db.add(task_db)
+            await db.commit()
 
         await task_crud.update_task_status(
             db, task_id,
@@ -57,10 +90,18 @@ async def upload_static(
             logs=f"Serving static site at {public_url}"
         )
 
-        auto_shutdown_ngrok(public_url, task_id, user_id, db, delay_seconds=6000)
+        if use_container:
+            asyncio.create_task(auto_shutdown_ngrok(public_url, task_id, user_id, delay_seconds=6000))
 
         return {"url": public_url, "task_id": task_id}
 
+    except ArchiveRejected as e:
+        await task_crud.update_task_status(db, task_id, TaskStatusEnum.failed, logs=str(e))
+        raise HTTPException(status_code=400, detail=str(e))
+    except HTTPException as e:
+        # malformed or interrupted upload body
+        await task_crud.update_task_status(db, task_id, TaskStatusEnum.failed, logs=str(e.detail))
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -72,6 +113,8 @@ async def deploy_from_github(
     build_command: str = Body(...),
     subdir: str | None = Body(None),
     env_vars: dict | None = Body(None),
+    portable_image: bool = Body(False, description="Also bake the build into a standalone nginx image"),
+    isolated: bool = Body(False, description="Serve from a dedicated nginx container + tunnel"),
     request: Request = None,
     db: AsyncSession = Depends(get_db),
 ):
@@ -84,16 +127,39 @@ async def deploy_from_github(
     )
     task = await task_crud.create_task(db, task_data)
 
-    task_workspace = os.path.abspath(f"./workspaces/{user.username}/task_{task.id}")
+    task_workspace = os.path.abspath(os.path.join(BASE_DIR, str(user.id), f"task_{task.id}"))
     os.makedirs(task_workspace, exist_ok=True)
 
     asyncio.create_task(
         upload_service.deploy_github_task(
-            task.id, user.id, repo_url, build_command, task_workspace, db, subdir, env_vars
+            task.id, user.id, repo_url, build_command, task_workspace, db, subdir, env_vars,
+            portable_image=portable_image, isolated=isolated,
         )
     )
     return task
 
+@router.get("/storage")
+async def storage_report(request: Request):
+    """Dedupe ratio and bytes saved by the shared static file store."""
+    return await run_blocking(blob_store.report)
+
+
+@router.get("/tasks/{task_id}/compression")
+async def compression_report(task_id: int, request: Request, db: AsyncSession = Depends(get_db)):
+    """Bytes saved by precompressing this deployment's assets."""
+    user = request.state.user
+    task = await task_crud.get_task(db, task_id)
+    if not task or task.user_id != user.id:
+        raise HTTPException(status_code=404, detail="Task not found")
+
+    # Older GitHub deployments live under the username
+    for owner in (str(user.id), user.username):
+        report = await run_blocking(read_report, os.path.join(BASE_DIR, owner, f"task_{task_id}"))
+        if report is not None:
+            return {"task_id": task_id, **report}
+    raise HTTPException(status_code=404, detail="No compression report for this task")
+
+
 @router.delete("/tasks/{task_id}")
 async def delete_task_route(task_id: int, request: Request, db: AsyncSession = Depends(get_db)):
     """
@@ -109,5 +175,5 @@ async def delete_task_route(task_id: int, request: Request, db: AsyncSession = D
     if task.user_id != user.id:
         raise HTTPException(status_code=403, detail="Not authorized to delete this task")
 
-    await delete_static_task(task_id, user.username, db)
+    await delete_static_task(task_id, user.id, db)
     return {"message": f"Task {task_id} deleted successfully"}
\ No newline at end of file
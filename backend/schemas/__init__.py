@@ -1,5 +1,9 @@
-from .task_schema import TaskCreate, TaskEnum, TaskResponse, TaskStatusEnum
+from .task_schema import (
+    TaskCreate, TaskEnum, TaskResponse, TaskStatusEnum, TaskSummaryResponse, TaskPage,
+    TaskLogChunkResponse, TaskLogPage
+)
 
-from .compute_schema import ComputeTaskRequest, FileNode, ResourceSpec
+from .compute_schema import ComputeTaskRequest, FileNode, ResourceSpec, WorkspacePage
 
-__all__ = [ "TaskCreate", "TaskEnum", "TaskResponse", "ComputeTaskRequest", "FileNode", "ResourceSpec", "TaskStatusEnum"]
\ No newline at end of file
+__all__ = [ "TaskCreate", "TaskEnum", "TaskResponse", "ComputeTaskRequest", "FileNode", "ResourceSpec", "WorkspacePage", "TaskStatusEnum", "TaskSummaryResponse", "TaskPage",
+    "TaskLogChunkResponse", "TaskLogPage"]
\ No newline at end of file
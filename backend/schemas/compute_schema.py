@@ -5,6 +5,7 @@ class ResourceSpec(BaseModel):
     cpu: int = Field(2, ge=1)
     gpu: bool = Field(False, description="Whether GPU is required")
     gpu_memory: Optional[int] = Field(None, ge=256, description="GPU memory requirement in MB")
+    priority: int = Field(0, ge=0, le=10, description="Requested GPU queue priority, higher runs first; capped per account by max_gpu_priority")
 
 class ComputeTaskRequest(BaseModel):
     image: str
@@ -18,3 +19,12 @@ class FileNode(BaseModel):
     name: str
     is_dir: bool
     size: Optional[int] = None
+    files: Optional[int] = Field(None, description="Files under a directory (aggregate)")
+    mtime: Optional[float] = None
+
+class WorkspacePage(BaseModel):
+    path: str
+    total_size: int
+    total_files: int
+    entries: List[FileNode]
+    next_cursor: Optional[str] = None
@@ -1,6 +1,6 @@
 from pydantic import BaseModel
 from datetime import datetime
-from typing import Optional
+from typing import List, Optional
 from enum import Enum
 
 class TaskEnum(str, Enum):
@@ -9,6 +9,8 @@ class TaskEnum(str, Enum):
 
 class TaskStatusEnum(str, Enum):
     pending = "pending"
+    queued = "queued"
+    pulling = "pulling"
     running = "running"
     completed = "completed"
     deleted = "deleted"
@@ -18,6 +20,7 @@ class TaskBase(BaseModel):
     task_type: TaskEnum
     status: Optional[TaskStatusEnum] = TaskStatusEnum.pending
     logs: Optional[str] = None
+    log_size: Optional[int] = None
     path: Optional[str] = None
 
 
@@ -27,8 +30,42 @@ class TaskCreate(TaskBase):
 
 class TaskResponse(TaskBase):
     id: int
+    log_seq: Optional[int] = None
     created_at: datetime
     user_id: int
 
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+class TaskSummaryResponse(BaseModel):
+    """Task without its log body, for list endpoints."""
+    id: int
+    task_type: TaskEnum
+    status: Optional[TaskStatusEnum] = None
+    log_size: Optional[int] = None
+    log_seq: Optional[int] = None
+    path: Optional[str] = None
+    created_at: datetime
+    user_id: int
+    summary: Optional[str] = None  # latest status line (Task.logs), only where a list shows it
+
+    class Config:
+        from_attributes = True
+
+
+class TaskPage(BaseModel):
+    items: List[TaskSummaryResponse]
+    next_cursor: Optional[int] = None
+
+
+class TaskLogChunkResponse(BaseModel):
+    seq: int
+    text: str
+    created_at: Optional[datetime] = None
+
+
+class TaskLogPage(BaseModel):
+    task_id: int
+    chunks: List[TaskLogChunkResponse]
+    next_seq: int
+    total_chunks: int
@@ -1,10 +1,14 @@
 from pydantic import BaseModel
 from datetime import datetime
+from typing import Optional
 
 class UsageBase(BaseModel):
-    cpu_seconds: int = 0
-    gpu_seconds: int = 0
+    cpu_seconds: float = 0
+    gpu_seconds: float = 0
     memory_mb: int = 0
+    peak_memory_mb: int = 0
+    period_start: Optional[datetime] = None
+    period_seconds: float = 0
 
 class UsageCreate(UsageBase):
     user_id: int
@@ -18,3 +22,10 @@ class UsageResponse(UsageBase):
 
     class Config:
         orm_mode = True
+
+class UsageTotals(BaseModel):
+    total_cpu_seconds: float = 0
+    total_gpu_seconds: float = 0
+    memory_mb_hours: float = 0
+    average_memory_mb: float = 0
+    peak_memory_mb: int = 0
@@ -6,10 +6,16 @@ import uvicorn
 from routers import auth_router, compute_router, status_router, upload_router
 
 # Middleware imports
-from middleware import JWTMiddleware, setup_cors, StaticAccessLogger
+from middleware import JWTMiddleware, setup_cors, StaticAccessLogger, RateLimitMiddleware
 
 # Database imports
 from db.db_connection import engine, Base
+from db.schema_upgrade import upgrade_schema
+
+from utils.logging_utils import access_log_writer
+from services import resource_sampler, restore_shared_sites, SharedStaticSites
+from services.precompress_service import shutdown_pool as shutdown_precompress_pool
+from db.db_connection import SessionLocal
 
 # ===== Server Configuration =====
 app = FastAPI(
@@ -26,12 +32,29 @@ async def startup_event():
     
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(upgrade_schema)
     print("Database initialized successfully!")
 
+    async with SessionLocal() as db:
+        restored = await restore_shared_sites(db)
+    print(f"Restored {restored} shared static site(s)")
+
+    access_log_writer.start()
+    resource_sampler.start()
+
+# ===== Shutdown Event =====
+@app.on_event("shutdown")
+async def shutdown_event():
+    await resource_sampler.stop()
+    await access_log_writer.stop()
+    shutdown_precompress_pool()
+
 # ===== Middleware =====
-setup_cors(app)  
+app.add_middleware(RateLimitMiddleware)  # inside JWT: needs request.state.user
 app.add_middleware(JWTMiddleware) 
 app.add_middleware(StaticAccessLogger)
+app.add_middleware(SharedStaticSites)  # public sites, no auth
+setup_cors(app)  # outermost, so 401/429 responses from the middleware carry CORS headers
 
 # ===== Routers =====
 app.include_router(auth_router.router, tags=["Authentication"])
@@ -1,10 +1,27 @@
-from .compute_service import task_workspace_for, ensure_is_subpath, list_dir, start_compute_task, list_user_tasks, list_task_files, download_task_file, get_tree_task_workspace
+from .compute_service import task_workspace_for, ensure_is_subpath, list_dir, start_compute_task, list_user_tasks, list_task_files, download_task_file, download_task_archive, get_tree_task_workspace, query_task_workspace
 
-from .upload_service import save_and_extract_upload, serve_static_docker, deploy_github_task, delete_static_task, auto_shutdown_ngrok
+from .upload_service import save_and_extract_upload, serve_static_docker, serve_static_shared, restore_shared_sites, deploy_github_task, delete_static_task, auto_shutdown_ngrok
 
-from .status_service import get_resource_status, get_gpu_vram
+from .static_site_service import SharedStaticSites, site_registry
+
+from .status_service import get_resource_status, resource_sampler
+
+from .log_service import read_byte_window, read_tail_lines
+
+from .log_hub import LogHub, log_hub
+
+from .task_event_hub import TaskEventHub, task_event_hub
+
+from .ingest_service import ingest_archive, ArchiveRejected, ArchiveLimits
+
+from .blob_store import BlobStore, blob_store
+
+from .precompress_service import precompress_tree
 
 __all__= [task_workspace_for, ensure_is_subpath, list_dir, start_compute_task, list_user_tasks, 
-          list_task_files, download_task_file, get_tree_task_workspace, save_and_extract_upload, 
-          serve_static_docker, deploy_github_task, delete_static_task, auto_shutdown_ngrok,
-          get_resource_status, get_gpu_vram]
+          list_task_files, download_task_file, download_task_archive, get_tree_task_workspace, query_task_workspace, save_and_extract_upload, 
+          serve_static_docker, serve_static_shared, restore_shared_sites, SharedStaticSites, site_registry,
+          deploy_github_task, delete_static_task, auto_shutdown_ngrok,
+          get_resource_status, resource_sampler, read_byte_window, read_tail_lines,
+          LogHub, log_hub, TaskEventHub, task_event_hub, ingest_archive, ArchiveRejected, ArchiveLimits,
+          BlobStore, blob_store, precompress_tree]
@@ -0,0 +1,140 @@
+import os
+import json
+import errno
+import shutil
+import tempfile
+from typing import Dict, Iterable, Tuple
+
+from config import settings
+from utils.workspace_index import WorkspaceIndex
+
+MANIFEST_NAME = "manifest.json"
+
+
+class BlobStore:
+    """
+    Content-addressed store for static site files, keyed by SHA-256.
+    Each distinct file is stored once under `<root>/<aa>/<digest>` and site
+    trees are hardlinks into it, so a blob's reference count is simply its
+    link count minus one. Blobs are read-only so a shared file can't be
+    changed in place through one site.
+    """
+
+    def __init__(self, root: str):
+        self.root = os.path.abspath(root)
+        self.tmp_dir = os.path.join(self.root, "tmp")
+
+    def path_for(self, digest: str) -> str:
+        return os.path.join(self.root, digest[:2], digest)
+
+    def has(self, digest: str) -> bool:
+        return os.path.exists(self.path_for(digest))
+
+    def new_temp(self):
+        """Writable temp file on the store's filesystem, for spilling large entries."""
+        os.makedirs(self.tmp_dir, exist_ok=True)
+        return tempfile.NamedTemporaryFile(dir=self.tmp_dir, delete=False)
+
+    def put_bytes(self, digest: str, data: bytes) -> bool:
+        """Store `data` under `digest` unless present. Returns True if it was new."""
+        if self.has(digest):
+            return False
+        with self.new_temp() as tmp:
+            tmp.write(data)
+        return self.adopt(tmp.name, digest)
+
+    def adopt(self, tmp_path: str, digest: str) -> bool:
+        """Move a fully written temp file into the store. Returns True if it was new."""
+        blob = self.path_for(digest)
+        if os.path.exists(blob):
+            os.unlink(tmp_path)
+            return False
+        os.makedirs(os.path.dirname(blob), exist_ok=True)
+        os.chmod(tmp_path, 0o444)
+        try:
+            # link() fails rather than overwriting if a concurrent ingest won the race
+            os.link(tmp_path, blob)
+        except FileExistsError:
+            return False
+        finally:
+            os.unlink(tmp_path)
+        return True
+
+    def link(self, digest: str, target: str) -> None:
+        """Materialise blob `digest` at `target` (hardlink, or a copy across filesystems)."""
+        if os.path.lexists(target):
+            os.unlink(target)
+        try:
+            os.link(self.path_for(digest), target)
+        except OSError as e:
+            if e.errno not in (errno.EXDEV, errno.EMLINK, errno.EPERM):
+                raise
+            shutil.copyfile(self.path_for(digest), target)
+
+    def release(self, digests: Iterable[str]) -> int:
+        """
+        Drop blobs no site links to any more. Call after the site trees that
+        referenced `digests` were removed. Returns the number of blobs freed.
+        """
+        freed = 0
+        for digest in set(digests):
+            blob = self.path_for(digest)
+            try:
+                if os.stat(blob).st_nlink <= 1:
+                    os.unlink(blob)
+                    freed += 1
+            except FileNotFoundError:
+                continue
+        return freed
+
+    def report(self) -> dict:
+        """Dedupe ratio and bytes saved, from blob sizes and link counts."""
+        blobs = stored = logical = references = 0
+        for dirpath, _, files in os.walk(self.root):
+            if dirpath == self.tmp_dir:
+                continue
+            for name in files:
+                try:
+                    st = os.stat(os.path.join(dirpath, name))
+                except FileNotFoundError:
+                    continue
+                refs = max(st.st_nlink - 1, 0)
+                blobs += 1
+                references += refs
+                stored += st.st_size
+                logical += st.st_size * refs
+        return {
+            "blobs": blobs,
+            "references": references,
+            "stored_bytes": stored,
+            "logical_bytes": logical,
+            "bytes_saved": max(logical - stored, 0),
+            "dedupe_ratio": round(logical / stored, 3) if stored else 1.0,
+        }
+
+
+# --------------------
+# Per-task manifests (relpath -> (sha256, size)) used to release blobs
+# --------------------
+def write_manifest(task_dir: str, manifest: Dict[str, Tuple[str, int]]) -> None:
+    with open(os.path.join(task_dir, MANIFEST_NAME), "w") as f:
+        json.dump(manifest, f)
+
+
+def read_manifest(task_dir: str) -> Dict[str, Tuple[str, int]]:
+    try:
+        with open(os.path.join(task_dir, MANIFEST_NAME)) as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def remove_task_tree(task_dir: str) -> int:
+    """Delete a task workspace, its metadata index and the blobs only it referenced."""
+    digests = [digest for digest, _ in read_manifest(task_dir).values()]
+    shutil.rmtree(task_dir, ignore_errors=True)
+    WorkspaceIndex(task_dir).delete()
+    return blob_store.release(digests)
+
+
+blob_store = BlobStore(settings.BLOB_STORE_DIR)
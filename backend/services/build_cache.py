@@ -0,0 +1,214 @@
+import os
+import time
+import shutil
+import asyncio
+import hashlib
+from contextlib import contextmanager
+from typing import Dict, Optional, Tuple
+
+from config import settings
+from utils.container_utils import r
+
+BUILD_CACHE_STATS_KEY = "build_cache:stats"   # HASH <kind>_hit / <kind>_miss -> count
+
+LOCKFILES = ("package-lock.json", "npm-shrinkwrap.json")
+
+_mirror_locks: Dict[str, asyncio.Lock] = {}
+_node_version: Optional[str] = None
+
+
+def _cache_path(*parts: str) -> str:
+    return os.path.abspath(os.path.join(settings.BUILD_CACHE_DIR, *parts))
+
+
+async def _run(*cmd: str, cwd: Optional[str] = None, env: Optional[dict] = None) -> Tuple[int, str]:
+    proc = await asyncio.create_subprocess_exec(
+        *cmd,
+        cwd=cwd,
+        env=env,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+    )
+    _, err = await proc.communicate()
+    return proc.returncode, err.decode(errors="replace")
+
+
+# --------------------
+# Hit-rate counters and per-phase timings
+# --------------------
+def record_hit(kind: str, hit: bool) -> None:
+    try:
+        r.hincrby(BUILD_CACHE_STATS_KEY, f"{kind}_{'hit' if hit else 'miss'}", 1)
+    except Exception as e:
+        print(f"[BUILD CACHE] Could not record {kind} stats: {e}")
+
+
+def hit_rates() -> Dict[str, float]:
+    try:
+        raw = {k.decode(): int(v) for k, v in r.hgetall(BUILD_CACHE_STATS_KEY).items()}
+    except Exception:
+        return {}
+    rates = {}
+    for kind in {key.rsplit("_", 1)[0] for key in raw}:
+        hits, misses = raw.get(f"{kind}_hit", 0), raw.get(f"{kind}_miss", 0)
+        rates[kind] = round(hits / (hits + misses), 3) if hits + misses else 0.0
+    return rates
+
+
+class BuildTimings:
+    """Wall-clock time per deploy phase plus which caches were hit."""
+
+    def __init__(self):
+        self.phases: Dict[str, float] = {}
+        self.cache: Dict[str, str] = {}
+
+    @contextmanager
+    def phase(self, name: str):
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.phases[name] = round(time.monotonic() - started, 2)
+
+    def summary(self) -> str:
+        lines = ["Build timings: " + ", ".join(f"{k} {v}s" for k, v in self.phases.items())]
+        if self.cache:
+            lines.append("Cache: " + ", ".join(f"{k} {v}" for k, v in self.cache.items()))
+        rates = hit_rates()
+        if rates:
+            lines.append("Cache hit rates: " + ", ".join(f"{k} {v:.0%}" for k, v in sorted(rates.items())))
+        return "\n".join(lines)
+
+
+# --------------------
+# Source: bare mirror per repo URL + shallow clone
+# --------------------
+def mirror_path(repo_url: str) -> str:
+    digest = hashlib.sha256(repo_url.encode()).hexdigest()[:24]
+    return _cache_path("mirrors", f"{digest}.git")
+
+
+async def clone_from_mirror(repo_url: str, workspace: str) -> bool:
+    """
+    Shallow-clone `repo_url` into `workspace` through a local bare mirror.
+    The first deploy of a repo creates the mirror; later ones only fetch
+    new objects into it. Returns True if the mirror already existed.
+    """
+    mirror = mirror_path(repo_url)
+    lock = _mirror_locks.setdefault(mirror, asyncio.Lock())
+    async with lock:
+        hit = os.path.isdir(mirror)
+        if hit:
+            code, err = await _run("git", "-C", mirror, "remote", "update", "--prune")
+        else:
+            os.makedirs(os.path.dirname(mirror), exist_ok=True)
+            tmp = f"{mirror}.tmp-{os.getpid()}"
+            await asyncio.to_thread(shutil.rmtree, tmp, ignore_errors=True)
+            code, err = await _run("git", "clone", "--mirror", repo_url, tmp)
+            if code == 0:
+                os.replace(tmp, mirror)
+        if code != 0:
+            raise RuntimeError(err)
+
+        # file:// so git honours --depth for a local source
+        code, err = await _run("git", "clone", "--depth", "1", "--no-tags", f"file://{mirror}", workspace)
+        if code != 0:
+            raise RuntimeError(err)
+    await _run("git", "-C", workspace, "remote", "set-url", "origin", repo_url)
+    record_hit("mirror", hit)
+    return hit
+
+
+# --------------------
+# Dependencies: shared npm cache + node_modules snapshots by lockfile hash
+# --------------------
+async def _get_node_version() -> str:
+    global _node_version
+    if _node_version is None:
+        proc = await asyncio.create_subprocess_exec(
+            "node", "--version", stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.DEVNULL
+        )
+        out, _ = await proc.communicate()
+        _node_version = out.decode().strip()
+    return _node_version
+
+
+async def lockfile_key(run_dir: str) -> Optional[str]:
+    """
+    Snapshot key: lockfile + package.json contents, node version and
+    platform. package.json is included so a lockfile that fell out of sync
+    with it never maps to the node_modules installed for another manifest.
+    """
+    for name in LOCKFILES:
+        path = os.path.join(run_dir, name)
+        if os.path.isfile(path):
+            digest = hashlib.sha256()
+            for manifest in (path, os.path.join(run_dir, "package.json")):
+                if os.path.isfile(manifest):
+                    with open(manifest, "rb") as f:
+                        digest.update(f.read())
+                digest.update(b"\0")
+            digest.update((await _get_node_version()).encode())
+            digest.update(os.uname().machine.encode())
+            return digest.hexdigest()
+    return None
+
+
+def _npm_env() -> dict:
+    env = dict(os.environ)
+    env["npm_config_cache"] = _cache_path("npm")
+    return env
+
+
+async def install_dependencies(run_dir: str) -> str:
+    """
+    Install node_modules in `run_dir`. An identical lockfile restores a
+    saved node_modules snapshot instead of running npm at all; otherwise npm
+    runs against the shared package cache and a clean `npm ci` result is
+    snapshotted. The `npm install` fallback (lockfile out of sync) resolves
+    versions the lockfile doesn't pin, so it is never snapshotted.
+    Returns "snapshot", "npm ci" or "npm install".
+    """
+    key = await lockfile_key(run_dir)
+    snapshot = _cache_path("node_modules", key) if key else None
+    target = os.path.join(run_dir, "node_modules")
+
+    if snapshot and os.path.isdir(snapshot) and not os.path.exists(target):
+        # reflink where the filesystem supports it, plain copy otherwise
+        code, err = await _run("cp", "-a", "--reflink=auto", snapshot, target)
+        if code == 0:
+            record_hit("node_modules", True)
+            return "snapshot"
+        await asyncio.to_thread(shutil.rmtree, target, ignore_errors=True)
+
+    flags = ("--prefer-offline", "--no-audit", "--no-fund")
+    how = "npm ci" if key else "npm install"
+    code, err = await _run("npm", "ci" if key else "install", *flags, cwd=run_dir, env=_npm_env())
+    if code != 0 and key:
+        # lockfile out of sync with package.json: fall back like a developer would
+        how = "npm install"
+        code, err = await _run("npm", "install", *flags, cwd=run_dir, env=_npm_env())
+    if code != 0:
+        raise RuntimeError(err)
+    if key:
+        record_hit("node_modules", False)
+
+    if snapshot and how == "npm ci" and os.path.isdir(target):
+        await _save_snapshot(target, snapshot)
+    return how
+
+
+async def _save_snapshot(node_modules: str, snapshot: str) -> None:
+    os.makedirs(os.path.dirname(snapshot), exist_ok=True)
+    tmp = f"{snapshot}.tmp-{os.getpid()}"
+    await asyncio.to_thread(shutil.rmtree, tmp, ignore_errors=True)
+    code, err = await _run("cp", "-a", "--reflink=auto", node_modules, tmp)
+    if code != 0:
+        print(f"[BUILD CACHE] Could not snapshot node_modules: {err}")
+        await asyncio.to_thread(shutil.rmtree, tmp, ignore_errors=True)
+        return
+    try:
+        os.replace(tmp, snapshot)
+    except OSError:
+        # another deploy saved the same snapshot first
+        await asyncio.to_thread(shutil.rmtree, tmp, ignore_errors=True)
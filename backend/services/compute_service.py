@@ -2,18 +2,25 @@
 
 # services/compute_service.py
 import os
+import asyncio
 import pathlib
-from typing import List
+from typing import List, Mapping, Optional
 from fastapi import HTTPException
-from fastapi.responses import FileResponse
+from fastapi.responses import Response, StreamingResponse
 
-from schemas import FileNode, TaskCreate, TaskEnum, ComputeTaskRequest, TaskStatusEnum
-from crud import create_task, update_task_status, get_task, get_tasks_for_user
+from schemas import FileNode, TaskCreate, TaskEnum, ComputeTaskRequest, TaskStatusEnum, WorkspacePage
+from crud import create_task, update_task_status, get_task, query_task_page
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from celery_workers.compute_worker import run_container_task
 
-from utils import try_acquire_gpu, enqueue_gpu_task
+from utils import acquire_or_enqueue_gpu, release_gpu
+from utils.image_cache import record_image_request
+from utils.rate_limit import claim_task_slot, limits_for
+from utils.workspace_index import WorkspaceIndex
+from utils.archive_utils import stream_zip
+from utils.http_utils import file_download_response
+from config import settings
 # --------------------
 # Workspace helpers
 # --------------------
@@ -53,8 +60,11 @@ def list_dir(path: str) -> List[FileNode]:
 async def start_compute_task(
     task_request: ComputeTaskRequest,
     user,
-    db: AsyncSession
+    db: AsyncSession,
+    task_slot: Optional[str] = None,
 ):
+    await asyncio.to_thread(record_image_request, task_request.image)
+
     # Cap CPU cores
     cpu_cores = min(task_request.resources.cpu, 4)
 
@@ -62,10 +72,12 @@ async def start_compute_task(
     task_data = TaskCreate(
         task_type=TaskEnum.compute,
         user_id=user.id,
-        status=TaskStatusEnum.running,
+        status=TaskStatusEnum.pending,
         path=None,
     )
     task = await create_task(db, task_data)
+    # The concurrent-task slot reserved by the rate limiter now belongs to this task
+    await claim_task_slot(user.id, task_slot, task.id)
 
     # Workspace
     workspace = task_workspace_for(user.username, task.id)
@@ -86,6 +98,7 @@ async def start_compute_task(
     gpu_requested = task_request.resources.gpu
     payload = {
         "task_id": task.id,
+        "user_id": user.id,
         "image": task_request.image,
         "command": command,
         "args": args,
@@ -95,21 +108,36 @@ async def start_compute_task(
         "env": env,
     }
 
-   
-    if gpu_requested:
-        if try_acquire_gpu(task.id):
-            run_container_task.delay(**payload)
+    # GPU tasks either get a slice atomically or wait in the GPU queue;
+    # release_gpu() dispatches them in priority/FIFO order. The task is marked
+    # queued first so a dispatch racing this request can't be overwritten.
+    gpu_granted = False
+    try:
+        if gpu_requested:
+            task = await update_task_status(
+                db, task.id, TaskStatusEnum.queued, logs="Waiting for a free GPU slice..."
+            )
+            # The queue is shared, so the account decides how far a task may jump it
+            priority = min(task_request.resources.priority, limits_for(user.id, user.role).max_gpu_priority)
+            gpu_granted = acquire_or_enqueue_gpu(task.id, payload, priority=priority)
+            if gpu_granted:
+                run_container_task.delay(**payload)
         else:
-            enqueue_gpu_task(task.id, {**payload})
-    else:
-        run_container_task.delay(**payload, gpu=False)
+            run_container_task.delay(**payload)
+    except Exception as e:
+        # Never reaches a worker: fail it, which frees the concurrent-task slot
+        print(f"[ERROR] Could not dispatch task {task.id}: {e}")
+        if gpu_granted:
+            await asyncio.to_thread(release_gpu, task.id)
+        await update_task_status(db, task.id, TaskStatusEnum.failed, logs=f"Could not dispatch task: {e}")
+        raise HTTPException(status_code=503, detail="Task queue unavailable")
 
     return task
 
 
-async def list_user_tasks(user, db: AsyncSession):
-    tasks = await get_tasks_for_user(db, user.id)
-    return tasks
+async def list_user_tasks(user, db: AsyncSession, cursor: Optional[int] = None, limit: int = settings.TASK_PAGE_SIZE):
+    """One page of the user's tasks, newest first, without log bodies; returns (tasks, next_cursor)."""
+    return await query_task_page(db, user.id, after_id=cursor, limit=limit)
 
 async def list_task_files(user, task_id: int, db: AsyncSession, path: str = "") -> List[FileNode]:
     task = await get_task(db, task_id)
@@ -123,7 +151,9 @@ async def list_task_files(user, task_id: int, db: AsyncSession, path: str = "")
 
     return list_dir(target_dir)
 
-async def download_task_file(user, task_id: int, db: AsyncSession, path: str) -> FileResponse:
+async def download_task_file(
+    user, task_id: int, db: AsyncSession, path: str, request_headers: Mapping[str, str] = {}
+) -> Response:
     task = await get_task(db, task_id)
     if not task or task.user_id != user.id:
         raise HTTPException(status_code=404, detail="Task not found")
@@ -133,44 +163,69 @@ async def download_task_file(user, task_id: int, db: AsyncSession, path: str) ->
     if not os.path.isfile(abs_path):
         raise HTTPException(status_code=404, detail="File not found")
 
-    return FileResponse(abs_path, filename=os.path.basename(abs_path))
+    return file_download_response(abs_path, request_headers, filename=os.path.basename(abs_path))
 
-async def get_tree_task_workspace(user, task_id: int, db: AsyncSession) -> List[FileNode]:
+async def download_task_archive(user, task_id: int, db: AsyncSession, path: str = "") -> StreamingResponse:
+    """Stream a zip of a workspace directory as it is built (no temp file)."""
+    task = await get_task(db, task_id)
+    if not task or task.user_id != user.id:
+        raise HTTPException(status_code=404, detail="Task not found")
+
+    base = task_workspace_for(user.username, task_id)
+    target_dir = ensure_is_subpath(base, path)
+    if not os.path.isdir(target_dir):
+        raise HTTPException(status_code=404, detail="Directory not found")
+
+    name = os.path.basename(target_dir.rstrip("/")) if path.strip("/") else f"task_{task_id}"
+    return StreamingResponse(
+        stream_zip(target_dir),
+        media_type="application/zip",
+        headers={"Content-Disposition": f'attachment; filename="{name}.zip"'},
+    )
+
+async def _task_workspace_index(user, task_id: int, db: AsyncSession) -> Optional[WorkspaceIndex]:
     task = await get_task(db, task_id)
     if not task or task.user_id != user.id:
         raise HTTPException(status_code=404, detail="Task not found")
 
     base = task_workspace_for(user.username, task_id)
     if not os.path.exists(base):
-        return []
+        return None
+    index = WorkspaceIndex(base)
+    # Built at task completion; while a task runs, re-list only changed dirs
+    await asyncio.to_thread(index.refresh_if_stale, settings.WORKSPACE_INDEX_MAX_AGE_SECONDS)
+    return index
 
-    result: List[FileNode] = []
-    for root, dirs, files in os.walk(base):
-        depth = pathlib.Path(root).relative_to(base).parts
-        if len(depth) > 2:
-            continue
-        for d in dirs:
-            full = os.path.join(root, d)
-            result.append(
-                FileNode(
-                    path=os.path.relpath(full, base),
-                    name=d,
-                    is_dir=True,
-                    size=None,
-                )
-            )
-        for f in files:
-            full = os.path.join(root, f)
-            try:
-                size = os.path.getsize(full)
-            except FileNotFoundError:
-                continue
-            result.append(
-                FileNode(
-                    path=os.path.relpath(full, base),
-                    name=f,
-                    is_dir=False,
-                    size=size,
-                )
-            )
-    return result
+async def query_task_workspace(
+    user,
+    task_id: int,
+    db: AsyncSession,
+    path: str = "",
+    depth: Optional[int] = None,
+    glob: Optional[str] = None,
+    extensions: Optional[List[str]] = None,
+    kind: Optional[str] = None,
+    sort: str = "path",
+    descending: bool = False,
+    cursor: Optional[str] = None,
+    limit: int = settings.WORKSPACE_INDEX_PAGE_SIZE,
+) -> WorkspacePage:
+    index = await _task_workspace_index(user, task_id, db)
+    if index is None:
+        return WorkspacePage(path=path, total_size=0, total_files=0, entries=[])
+    ensure_is_subpath(index.root, path)
+    try:
+        page = await asyncio.to_thread(
+            index.query, path, depth, glob, extensions, kind, sort, descending, cursor,
+            min(limit, settings.WORKSPACE_INDEX_MAX_PAGE_SIZE),
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return WorkspacePage(**page)
+
+async def get_tree_task_workspace(user, task_id: int, db: AsyncSession) -> List[FileNode]:
+    index = await _task_workspace_index(user, task_id, db)
+    if index is None:
+        return []
+    page = await asyncio.to_thread(index.query, depth=3, limit=None)
+    return [FileNode(**entry) for entry in page["entries"]]
@@ -0,0 +1,335 @@
+import os
+import queue
+import shutil
+import stat
+import asyncio
+import hashlib
+import tarfile
+import zipfile
+from dataclasses import dataclass, field
+from typing import BinaryIO, Dict, Optional, Tuple
+
+from config import settings
+
+COPY_CHUNK = 64 * 1024
+
+
+class ArchiveRejected(ValueError):
+    """Raised when an upload is malformed or exceeds the ingestion limits."""
+
+
+@dataclass
+class ArchiveLimits:
+    max_total_bytes: int = settings.UPLOAD_MAX_TOTAL_BYTES
+    max_files: int = settings.UPLOAD_MAX_FILES
+    max_compression_ratio: float = settings.UPLOAD_MAX_COMPRESSION_RATIO
+    # Ratio checks only kick in past this many extracted bytes, so a handful of
+    # tiny, highly compressible files can't trip them.
+    ratio_grace_bytes: int = 16 * 1024 * 1024
+
+
+@dataclass
+class IngestResult:
+    root: str                       # directory containing index.html
+    extracted_dir: str
+    files: int = 0
+    total_bytes: int = 0
+    compressed_bytes: int = 0
+    manifest: Dict[str, Tuple[str, int]] = field(default_factory=dict)  # relpath -> (sha256, size)
+
+
+class _Extractor:
+    """Writes archive entries under `dest`, hashing and enforcing limits as it goes."""
+
+    def __init__(self, dest: str, limits: ArchiveLimits, compressed_bytes, store=None):
+        self.dest = os.path.abspath(dest)
+        self.limits = limits
+        self.store = store  # optional BlobStore the extracted files are linked from
+        self.compressed_bytes = compressed_bytes  # callable -> bytes of archive consumed so far
+        self.result = IngestResult(root="", extracted_dir=self.dest)
+        self._index_depth: Optional[int] = None
+        self.spooled = 0  # bytes of a zip upload spooled to disk
+
+    def _target(self, name: str) -> Tuple[str, str]:
+        rel = os.path.normpath(name.replace("\\", "/")).lstrip("/")
+        if rel in ("", ".") or rel.startswith("..") or os.path.isabs(rel) or ":" in rel.split("/")[0]:
+            raise ArchiveRejected(f"Unsafe path in archive: {name}")
+        target = os.path.join(self.dest, rel)
+        if os.path.commonpath([self.dest, target]) != self.dest:
+            raise ArchiveRejected(f"Unsafe path in archive: {name}")
+        return rel, target
+
+    def add_dir(self, name: str) -> None:
+        _, target = self._target(name)
+        os.makedirs(target, exist_ok=True)
+
+    def add_file(self, name: str, src: BinaryIO) -> None:
+        rel, target = self._target(name)
+        result = self.result
+        result.files += 1
+        if result.files > self.limits.max_files:
+            raise ArchiveRejected(f"Archive has more than {self.limits.max_files} files")
+
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        if self.store is None:
+            with open(target, "wb") as out:
+                digest, size = self._copy(src, out.write)
+        else:
+            digest, size = self._store_file(src, target)
+        result.manifest[rel] = (digest, size)
+
+        # Track the shallowest index.html while extracting, no second walk needed
+        if os.path.basename(rel) == "index.html":
+            depth = rel.count("/")
+            if self._index_depth is None or depth < self._index_depth:
+                self._index_depth = depth
+                result.root = os.path.dirname(target)
+
+    def _copy(self, src: BinaryIO, write) -> Tuple[str, int]:
+        digest = hashlib.sha256()
+        size = 0
+        while True:
+            chunk = src.read(COPY_CHUNK)
+            if not chunk:
+                break
+            size += len(chunk)
+            self.result.total_bytes += len(chunk)
+            self._check_size()
+            digest.update(chunk)
+            write(chunk)
+        return digest.hexdigest(), size
+
+    def _store_file(self, src: BinaryIO, target: str) -> Tuple[str, int]:
+        """
+        Hash the entry into the blob store and hardlink it at `target`.
+        Small entries are buffered in memory, so content the store already has
+        (an unchanged redeploy, a shared vendor bundle) is never written again.
+        """
+        buffered = []
+        spill = None
+        held = 0
+
+        def write(chunk: bytes) -> None:
+            nonlocal spill, held
+            if spill is None:
+                held += len(chunk)
+                if held <= settings.BLOB_INLINE_MAX_BYTES:
+                    buffered.append(chunk)
+                    return
+                spill = self.store.new_temp()
+                spill.writelines(buffered)
+                buffered.clear()
+            spill.write(chunk)
+
+        try:
+            digest, size = self._copy(src, write)
+        except BaseException:
+            if spill is not None:
+                spill.close()
+                os.unlink(spill.name)
+            raise
+
+        if spill is not None:
+            spill.close()
+            self.store.adopt(spill.name, digest)
+        else:
+            self.store.put_bytes(digest, b"".join(buffered))
+        self.store.link(digest, target)
+        return digest, size
+
+    def _check_size(self) -> None:
+        total = self.result.total_bytes
+        if total > self.limits.max_total_bytes:
+            raise ArchiveRejected(f"Archive expands beyond {self.limits.max_total_bytes} bytes")
+        if total > self.limits.ratio_grace_bytes:
+            compressed = max(self.compressed_bytes(), 1)
+            if total / compressed > self.limits.max_compression_ratio:
+                raise ArchiveRejected("Archive compression ratio is suspiciously high")
+
+    def finish(self) -> IngestResult:
+        self.result.compressed_bytes = self.compressed_bytes()
+        if not self.result.root:
+            raise ArchiveRejected("No index.html found in uploaded archive")
+        return self.result
+
+
+# --------------------
+# tar.gz: extracted while the upload is still arriving
+# --------------------
+class _ChunkPipe:
+    """Blocking file-like reader fed with upload chunks from the event loop."""
+
+    def __init__(self, maxsize: int = 8):
+        self._queue: "queue.Queue[Optional[bytes]]" = queue.Queue(maxsize=maxsize)
+        self._current = b""
+        self._pos = 0
+        self._eof = False
+        self.bytes_read = 0
+        self.aborted = False        # set by the reader when it stops consuming
+        self.writer_failed = False  # set by the writer when the upload breaks off
+
+    def feed(self, chunk: Optional[bytes]) -> None:
+        while not self.aborted:
+            try:
+                self._queue.put(chunk, timeout=0.5)
+                return
+            except queue.Full:
+                continue
+
+    def _next_chunk(self) -> Optional[bytes]:
+        while True:
+            try:
+                return self._queue.get(timeout=0.5)
+            except queue.Empty:
+                if self.writer_failed:
+                    raise ArchiveRejected("Upload was interrupted")
+
+    def read(self, n: int = -1) -> bytes:
+        parts = []
+        need = n
+        while need != 0:
+            if self._pos >= len(self._current):
+                if self._eof:
+                    break
+                chunk = self._next_chunk()
+                if chunk is None:
+                    self._eof = True
+                    break
+                self._current, self._pos = chunk, 0
+                continue
+            if need < 0:
+                piece = self._current[self._pos:]
+            else:
+                piece = self._current[self._pos:self._pos + need]
+                need -= len(piece)
+            self._pos += len(piece)
+            parts.append(piece)
+        data = b"".join(parts)
+        self.bytes_read += len(data)
+        return data
+
+
+def _extract_tar_stream(pipe: _ChunkPipe, extractor: _Extractor) -> IngestResult:
+    try:
+        with tarfile.open(fileobj=pipe, mode="r|gz") as archive:
+            for member in archive:
+                if member.isdir():
+                    extractor.add_dir(member.name)
+                elif member.isfile():
+                    src = archive.extractfile(member)
+                    extractor.add_file(member.name, src)
+                # symlinks, hardlinks and device nodes are skipped
+        return extractor.finish()
+    except tarfile.TarError as e:
+        raise ArchiveRejected(f"Invalid tar.gz archive: {e}")
+    finally:
+        pipe.aborted = True
+
+
+async def _ingest_tar_gz(upload, extractor: _Extractor, pipe: _ChunkPipe, chunk_size: int) -> IngestResult:
+    consumer = asyncio.ensure_future(asyncio.to_thread(_extract_tar_stream, pipe, extractor))
+
+    try:
+        while not pipe.aborted:
+            chunk = await upload.read(chunk_size)
+            await asyncio.to_thread(pipe.feed, chunk or None)
+            if not chunk:
+                break
+    except BaseException:
+        pipe.writer_failed = True
+        # let the extraction thread stop before the caller cleans up after it
+        await asyncio.gather(consumer, return_exceptions=True)
+        raise
+    return await consumer
+
+
+# --------------------
+# zip: needs its central directory, so spool to disk first
+# --------------------
+def _extract_zip(archive_path: str, extractor: _Extractor, limits: ArchiveLimits) -> IngestResult:
+    try:
+        with zipfile.ZipFile(archive_path) as archive:
+            infos = archive.infolist()
+            if len(infos) > limits.max_files:
+                raise ArchiveRejected(f"Archive has more than {limits.max_files} files")
+            declared = sum(i.file_size for i in infos)
+            if declared > limits.max_total_bytes:
+                raise ArchiveRejected(f"Archive expands beyond {limits.max_total_bytes} bytes")
+
+            for info in infos:
+                mode = info.external_attr >> 16
+                if info.is_dir():
+                    extractor.add_dir(info.filename)
+                elif stat.S_ISLNK(mode):
+                    continue
+                else:
+                    with archive.open(info) as src:
+                        extractor.add_file(info.filename, src)
+        return extractor.finish()
+    except zipfile.BadZipFile as e:
+        raise ArchiveRejected(f"Invalid zip archive: {e}")
+
+
+async def _ingest_zip(upload, uploads_dir: str, extractor: _Extractor, chunk_size: int) -> IngestResult:
+    archive_path = os.path.join(uploads_dir, os.path.basename(upload.filename))
+    limits = extractor.limits
+    out = await asyncio.to_thread(open, archive_path, "wb")
+    try:
+        while True:
+            chunk = await upload.read(chunk_size)
+            if not chunk:
+                break
+            extractor.spooled += len(chunk)
+            if extractor.spooled > limits.max_total_bytes:
+                raise ArchiveRejected(f"Upload exceeds {limits.max_total_bytes} bytes")
+            await asyncio.to_thread(out.write, chunk)
+    except BaseException:
+        await asyncio.to_thread(out.close)
+        await asyncio.to_thread(os.remove, archive_path)
+        raise
+    await asyncio.to_thread(out.close)
+
+    return await asyncio.to_thread(_extract_zip, archive_path, extractor, limits)
+
+
+async def ingest_archive(
+    upload, task_dir: str, limits: Optional[ArchiveLimits] = None, store=None
+) -> IngestResult:
+    """
+    Ingest an uploaded .zip / .tar.gz into `<task_dir>/extracted`.
+    `upload` is anything with `filename` and `await read(n)`; given a
+    `utils.multipart_stream.StreamedFile`, tar.gz uploads are extracted while
+    the request body is still arriving. Zip uploads are spooled once to
+    `<task_dir>/uploads` first, since zip needs its central directory. Entries are hashed on the way through and
+    the folder holding index.html is found during extraction. With a `store`
+    (BlobStore), files are deduplicated into it and hardlinked into place.
+    All blocking work runs off the event loop.
+    """
+    limits = limits or ArchiveLimits()
+    chunk_size = settings.UPLOAD_CHUNK_BYTES
+    uploads_dir = os.path.join(task_dir, "uploads")
+    extracted_dir = os.path.join(task_dir, "extracted")
+
+    await asyncio.to_thread(os.makedirs, uploads_dir, exist_ok=True)
+    await asyncio.to_thread(os.makedirs, extracted_dir, exist_ok=True)
+
+    name = (upload.filename or "").lower()
+    pipe = _ChunkPipe()
+    if name.endswith(".zip"):
+        extractor = _Extractor(extracted_dir, limits, lambda: extractor.spooled, store)
+        ingest = _ingest_zip(upload, uploads_dir, extractor, chunk_size)
+    elif name.endswith(".tar.gz") or name.endswith(".tgz"):
+        extractor = _Extractor(extracted_dir, limits, lambda: pipe.bytes_read, store)
+        ingest = _ingest_tar_gz(upload, extractor, pipe, chunk_size)
+    else:
+        raise ArchiveRejected("Unsupported file format (only .zip or .tar.gz)")
+
+    try:
+        return await ingest
+    except Exception:
+        # rejected archive or broken-off upload: nothing of it may stay behind
+        await asyncio.to_thread(shutil.rmtree, extracted_dir, ignore_errors=True)
+        if store is not None:
+            digests = [digest for digest, _ in extractor.result.manifest.values()]
+            await asyncio.to_thread(store.release, digests)
+        raise
@@ -0,0 +1,161 @@
+import asyncio
+import threading
+from collections import deque
+from typing import Dict, Iterable, Optional, Set
+
+import docker
+
+from config import settings
+from utils.docker_utils import get_docker_client
+
+
+class LogFollower:
+    """
+    Follows one container's log stream in a single background thread and
+    fans lines out to every subscriber through bounded asyncio queues.
+    Slow subscribers lose their oldest lines rather than stalling the others.
+    """
+
+    def __init__(self, hub: "LogHub", task_id: int, container, replay_lines: int, queue_size: int):
+        self.hub = hub
+        self.task_id = task_id
+        self.container = container
+        self.queue_size = queue_size
+        self.replay = deque(maxlen=replay_lines)
+        self.subscribers: Set[asyncio.Queue] = set()
+        self.finished = False
+        self._stopped = False
+        self._stream = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def start(self, loop: asyncio.AbstractEventLoop) -> None:
+        self._loop = loop
+        threading.Thread(
+            target=self._follow, name=f"log-follower-{self.task_id}", daemon=True
+        ).start()
+
+    def stop(self) -> None:
+        self._stopped = True
+        stream = self._stream
+        if stream is not None:
+            try:
+                stream.close()
+            except Exception:
+                pass
+
+    # --------------------
+    # Follower thread
+    # --------------------
+    def _follow(self) -> None:
+        pending = b""
+        try:
+            self._stream = self.container.logs(
+                stream=True, follow=True, tail=self.replay.maxlen or "all"
+            )
+            if self._stopped:
+                self._stream.close()
+                return
+            for chunk in self._stream:
+                pending += chunk
+                *lines, pending = pending.split(b"\n")
+                for line in lines:
+                    self._loop.call_soon_threadsafe(self._publish, line.decode(errors="ignore").rstrip())
+            if pending:
+                self._loop.call_soon_threadsafe(self._publish, pending.decode(errors="ignore").rstrip())
+        except Exception as e:
+            print(f"Log follower for task {self.task_id} stopped: {e}")
+        finally:
+            self._loop.call_soon_threadsafe(self._finish)
+
+    # --------------------
+    # Event loop side
+    # --------------------
+    def _publish(self, line: str) -> None:
+        self.replay.append(line)
+        for queue in self.subscribers:
+            self._offer(queue, line)
+
+    def _finish(self) -> None:
+        self.finished = True
+        for queue in self.subscribers:
+            self._offer(queue, None)
+        self.hub._discard(self)
+
+    @staticmethod
+    def _offer(queue: asyncio.Queue, item) -> None:
+        if queue.full():
+            try:
+                queue.get_nowait()
+            except asyncio.QueueEmpty:
+                pass
+        queue.put_nowait(item)
+
+    def subscribe(self) -> asyncio.Queue:
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        for line in self.replay:
+            self._offer(queue, line)
+        if self.finished:
+            self._offer(queue, None)
+        self.subscribers.add(queue)
+        return queue
+
+
+class LogHub:
+    """One LogFollower per task, shared by every WebSocket viewing it."""
+
+    def __init__(self, replay_lines: int, queue_size: int):
+        self.replay_lines = replay_lines
+        self.queue_size = queue_size
+        self.followers: Dict[int, LogFollower] = {}
+        self._lock = asyncio.Lock()
+
+    async def subscribe(self, task_id: int, container_names: Iterable[str]) -> Optional[asyncio.Queue]:
+        """
+        Subscribe to a task's live logs. The container is looked up directly by
+        name; returns None when none of `container_names` exists.
+        A `None` item on the returned queue marks the end of the stream.
+        """
+        async with self._lock:
+            follower = self.followers.get(task_id)
+            if follower is None:
+                container = await self._find_container(container_names)
+                if container is None:
+                    return None
+                follower = LogFollower(self, task_id, container, self.replay_lines, self.queue_size)
+                self.followers[task_id] = follower
+                follower.start(asyncio.get_running_loop())
+            return follower.subscribe()
+
+    def unsubscribe(self, task_id: int, queue: asyncio.Queue) -> None:
+        follower = self.followers.get(task_id)
+        if follower is None:
+            return
+        follower.subscribers.discard(queue)
+        if not follower.subscribers:
+            self.followers.pop(task_id, None)
+            follower.stop()
+
+    def _discard(self, follower: LogFollower) -> None:
+        if self.followers.get(follower.task_id) is follower:
+            del self.followers[follower.task_id]
+
+    @staticmethod
+    async def _find_container(container_names: Iterable[str]):
+        for name in container_names:
+            try:
+                return await asyncio.to_thread(lambda: get_docker_client().containers.get(name))
+            except docker.errors.NotFound:
+                continue
+        return None
+
+    def stats(self) -> dict:
+        return {
+            task_id: {"subscribers": len(f.subscribers), "replay": len(f.replay)}
+            for task_id, f in self.followers.items()
+        }
+
+
+log_hub = LogHub(
+    replay_lines=settings.LOG_HUB_REPLAY_LINES,
+    queue_size=settings.LOG_HUB_QUEUE_SIZE,
+)
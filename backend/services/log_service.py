@@ -0,0 +1,138 @@
+import os
+import threading
+from collections import OrderedDict
+from typing import List, Tuple
+
+from config import settings
+
+READ_BLOCK = 1024 * 1024
+
+
+class LineIndex:
+    """
+    Sparse line-offset index for an append-only log file.
+
+    Every `stride`-th line start offset is recorded, so locating line N costs
+    one checkpoint lookup plus a scan of at most `stride` lines. The index is
+    extended incrementally as the file grows and rebuilt if it shrinks.
+    """
+
+    def __init__(self, path: str, stride: int):
+        self.path = path
+        self.stride = stride
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self.checkpoints: List[int] = [0]  # checkpoints[k] = offset of line k * stride
+        self.newlines = 0                  # '\n' count in [0, indexed_to)
+        self.indexed_to = 0
+
+    def refresh(self) -> int:
+        """Index any bytes appended since the last call; returns the file size."""
+        size = os.path.getsize(self.path)
+        if size < self.indexed_to:
+            self._reset()
+        if size == self.indexed_to:
+            return size
+
+        with open(self.path, "rb") as f:
+            f.seek(self.indexed_to)
+            pos = self.indexed_to
+            while pos < size:
+                block = f.read(min(READ_BLOCK, size - pos))
+                if not block:
+                    break
+                next_checkpoint_line = len(self.checkpoints) * self.stride
+                count = block.count(b"\n")
+                if self.newlines + count < next_checkpoint_line:
+                    self.newlines += count
+                else:
+                    idx = block.find(b"\n")
+                    while idx != -1:
+                        self.newlines += 1
+                        if self.newlines % self.stride == 0:
+                            self.checkpoints.append(pos + idx + 1)
+                        idx = block.find(b"\n", idx + 1)
+                pos += len(block)
+            self.indexed_to = pos
+        return size
+
+    def total_lines(self, size: int) -> int:
+        """Number of lines, counting a trailing line without '\\n'."""
+        if size == 0:
+            return 0
+        return self.newlines + (1 if self._ends_without_newline(size) else 0)
+
+    def _ends_without_newline(self, size: int) -> bool:
+        with open(self.path, "rb") as f:
+            f.seek(size - 1)
+            return f.read(1) != b"\n"
+
+    def offset_of_line(self, line: int) -> int:
+        """Byte offset where zero-based `line` starts."""
+        k = min(line // self.stride, len(self.checkpoints) - 1)
+        offset = self.checkpoints[k]
+        to_skip = line - k * self.stride
+        if to_skip <= 0:
+            return offset
+
+        with open(self.path, "rb") as f:
+            f.seek(offset)
+            while to_skip > 0:
+                block = f.read(READ_BLOCK)
+                if not block:
+                    break
+                idx = -1
+                while to_skip > 0:
+                    idx = block.find(b"\n", idx + 1)
+                    if idx == -1:
+                        break
+                    to_skip -= 1
+                if to_skip == 0:
+                    return offset + idx + 1
+                offset += len(block)
+        return offset
+
+
+_indexes: "OrderedDict[str, LineIndex]" = OrderedDict()
+_indexes_lock = threading.Lock()
+
+
+def _index_for(path: str) -> LineIndex:
+    with _indexes_lock:
+        index = _indexes.get(path)
+        if index is None:
+            index = LineIndex(path, settings.TASK_LOG_INDEX_STRIDE)
+            _indexes[path] = index
+            while len(_indexes) > settings.TASK_LOG_INDEX_CACHE_SIZE:
+                _indexes.popitem(last=False)
+        else:
+            _indexes.move_to_end(path)
+        return index
+
+
+def read_byte_window(path: str, offset: int, limit: int) -> Tuple[bytes, int]:
+    """Read up to `limit` bytes starting at `offset`; returns (data, file size)."""
+    size = os.path.getsize(path)
+    if offset >= size:
+        return b"", size
+    with open(path, "rb") as f:
+        f.seek(offset)
+        return f.read(min(limit, size - offset)), size
+
+
+def read_tail_lines(path: str, lines: int, max_bytes: int) -> Tuple[bytes, int, int]:
+    """
+    Return the last `lines` lines of `path`, capped at `max_bytes`.
+    Returns (data, start offset, file size).
+    """
+    index = _index_for(path)
+    with index._lock:
+        size = index.refresh()
+        total = index.total_lines(size)
+        start = index.offset_of_line(max(0, total - lines))
+
+    start = max(start, size - max_bytes)
+    data, _ = read_byte_window(path, start, size - start)
+    return data, start, size
@@ -0,0 +1,171 @@
+import os
+import json
+import uuid
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, Optional, Tuple
+
+from config import settings
+from utils.compress_utils import HASHED_ASSET_PATTERN, is_compressible, available_suffixes, compress_file
+
+REPORT_NAME = "precompress.json"
+NGINX_CONF_NAME = "nginx.conf"
+
+# nginx:alpine ships gzip_static but not the brotli module, so containers
+# serve the .gz siblings; the shared in-process server also serves .br.
+NGINX_STATIC_CONF = r"""server {
+    listen 80;
+    root /usr/share/nginx/html;
+    index index.html;
+
+    gzip_static on;
+    gzip_vary on;
+
+    location ~* "%s" {
+        add_header Cache-Control "public, max-age=31536000, immutable";
+        try_files $uri =404;
+    }
+
+    location / {
+        try_files $uri $uri/ =404;
+    }
+}
+""" % HASHED_ASSET_PATTERN
+
+_pool: Optional[ProcessPoolExecutor] = None
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        # spawn: the API process is threaded, forking it is not safe
+        _pool = ProcessPoolExecutor(
+            max_workers=settings.PRECOMPRESS_WORKERS or os.cpu_count(),
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    return _pool
+
+
+def shutdown_pool() -> None:
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+def precompress_tree(
+    root: str,
+    manifest: Optional[Dict[str, Tuple[str, int]]] = None,
+    store=None,
+) -> dict:
+    """
+    Write .br/.gz siblings for compressible files under `root` that are at
+    least PRECOMPRESS_MIN_BYTES, compressing on a process pool.
+
+    With a `manifest` (relpath -> (sha256, size)) and a BlobStore, the
+    compressed copies are stored as blobs `<sha256><suffix>` and hardlinked
+    into place, so identical files are only compressed once across all
+    deployments. The new siblings are added to `manifest` so they are
+    released with the task. Returns a bytes-saved report.
+    """
+    suffixes = available_suffixes(settings.PRECOMPRESS_BROTLI)
+    if manifest is None:
+        manifest = _scan(root)
+        store = None
+
+    report = {"files": 0, "reused": 0, "original_bytes": 0}
+    for suffix in suffixes:
+        report[suffix[1:]] = {"files": 0, "original_bytes": 0, "compressed_bytes": 0}
+
+    jobs = []
+    for rel, (digest, size) in list(manifest.items()):
+        if size < settings.PRECOMPRESS_MIN_BYTES or not is_compressible(rel):
+            continue
+        target = os.path.join(root, rel)
+        report["files"] += 1
+        report["original_bytes"] += size
+        if store is not None:
+            missing = []
+            for suffix in suffixes:
+                if store.has(digest + suffix):
+                    _link_blob(store, manifest, rel, digest, suffix, target)
+                    _count(report, suffix, size, manifest[rel + suffix][1])
+                else:
+                    missing.append(suffix)
+            if not missing:
+                report["reused"] += 1
+                continue
+            os.makedirs(store.tmp_dir, exist_ok=True)
+            out_base = os.path.join(store.tmp_dir, f"{digest}-{uuid.uuid4().hex}")
+        else:
+            missing, out_base = suffixes, target
+        future = _get_pool().submit(
+            compress_file, target, out_base, missing, settings.PRECOMPRESS_MAX_RATIO
+        )
+        jobs.append((rel, digest, size, target, future))
+
+    for rel, digest, size, target, future in jobs:
+        try:
+            written = future.result()
+        except BrokenProcessPool as e:
+            # A crashed worker poisons the pool; start a fresh one next time
+            print(f"[PRECOMPRESS] Skipping {rel}: {e}")
+            shutdown_pool()
+            continue
+        except Exception as e:
+            print(f"[PRECOMPRESS] Skipping {rel}: {e}")
+            continue
+        for suffix, path, packed_size in written:
+            if store is not None:
+                store.adopt(path, digest + suffix)
+                _link_blob(store, manifest, rel, digest, suffix, target)
+            _count(report, suffix, size, packed_size)
+
+    for suffix in suffixes:
+        stats = report[suffix[1:]]
+        stats["saved_bytes"] = stats["original_bytes"] - stats["compressed_bytes"]
+    return report
+
+
+def _count(report: dict, suffix: str, original: int, compressed: int) -> None:
+    stats = report[suffix[1:]]
+    stats["files"] += 1
+    stats["original_bytes"] += original
+    stats["compressed_bytes"] += compressed
+
+
+def _link_blob(store, manifest, rel, digest, suffix, target) -> None:
+    store.link(digest + suffix, target + suffix)
+    manifest[rel + suffix] = (digest + suffix, os.path.getsize(target + suffix))
+
+
+def _scan(root: str) -> Dict[str, Tuple[str, int]]:
+    """Manifest-less listing for trees outside the blob store (GitHub builds)."""
+    entries = {}
+    for dirpath, _, files in os.walk(root):
+        for name in files:
+            path = os.path.join(dirpath, name)
+            entries[os.path.relpath(path, root)] = ("", os.path.getsize(path))
+    return entries
+
+
+def write_nginx_conf(directory: str) -> str:
+    """Write the precompression-aware nginx site config and return its path."""
+    path = os.path.join(directory, NGINX_CONF_NAME)
+    with open(path, "w") as f:
+        f.write(NGINX_STATIC_CONF)
+    return path
+
+
+def write_report(task_dir: str, report: dict) -> None:
+    with open(os.path.join(task_dir, REPORT_NAME), "w") as f:
+        json.dump(report, f)
+
+
+def read_report(task_dir: str) -> Optional[dict]:
+    try:
+        with open(os.path.join(task_dir, REPORT_NAME)) as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
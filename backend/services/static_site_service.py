@@ -0,0 +1,180 @@
+import os
+import mimetypes
+import threading
+from typing import Dict, Optional, Tuple
+
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse, Response
+from starlette.staticfiles import NotModifiedResponse, StaticFiles
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from config import settings
+from utils.compress_utils import ENCODINGS, is_compressible, is_hashed_asset
+
+SITES_PREFIX = "/sites/"
+
+
+def site_key(user_id: int, task_id: int) -> str:
+    return f"u{user_id}-t{task_id}"
+
+
+def shared_site_url(key: str) -> str:
+    """Public URL of a site served by the shared static server."""
+    if settings.STATIC_SITES_DOMAIN:
+        return f"{settings.STATIC_SITES_SCHEME}://{key}.{settings.STATIC_SITES_DOMAIN}/"
+    return f"{settings.STATIC_SITES_BASE_URL.rstrip('/')}{SITES_PREFIX}{key}/"
+
+
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+
+def _accepted_encodings(headers: Headers) -> set:
+    accepted = set()
+    for part in headers.get("accept-encoding", "").split(","):
+        name, _, params = part.strip().partition(";")
+        params = params.strip().replace(" ", "")
+        try:
+            q = float(params[2:]) if params.startswith("q=") else 1.0
+        except ValueError:
+            q = 1.0
+        if q > 0:
+            accepted.add(name.strip().lower())
+    return accepted
+
+
+class PrecompressedStaticFiles(StaticFiles):
+    """
+    StaticFiles that serves the .br/.gz siblings written at deploy time when
+    the client accepts them, and marks fingerprinted assets as immutable.
+    """
+
+    def file_response(self, full_path, stat_result, scope: Scope, status_code: int = 200) -> Response:
+        path = str(full_path)
+        request_headers = Headers(scope=scope)
+        headers = {}
+        if is_hashed_asset(path):
+            headers["cache-control"] = IMMUTABLE_CACHE_CONTROL
+
+        response = None
+        if is_compressible(path):
+            headers["vary"] = "Accept-Encoding"
+            accepted = _accepted_encodings(request_headers)
+            for encoding, suffix in ENCODINGS:
+                if encoding not in accepted:
+                    continue
+                try:
+                    sibling_stat = os.stat(path + suffix)
+                except OSError:
+                    continue
+                response = FileResponse(
+                    path + suffix,
+                    status_code=status_code,
+                    stat_result=sibling_stat,
+                    media_type=mimetypes.guess_type(path)[0] or "text/plain",
+                    headers={**headers, "content-encoding": encoding},
+                )
+                break
+
+        if response is None:
+            response = FileResponse(path, status_code=status_code, stat_result=stat_result, headers=headers)
+        if self.is_not_modified(response.headers, request_headers):
+            return NotModifiedResponse(response.headers)
+        return response
+
+
+class SiteRegistry:
+    """
+    In-memory routing table of shared static sites (site key -> directory).
+    Registering or removing a site takes effect on the next request; there is
+    no server to restart or config to reload.
+
+    The table lives in the API process, so the API must run as a single
+    worker: with several workers a site is only served by the one that
+    deployed it (every worker re-registers all running sites at startup
+    through `restore_shared_sites`, but later deploys and deletes are not
+    shared between them).
+    """
+
+    def __init__(self):
+        self._sites: Dict[str, Tuple[int, StaticFiles]] = {}
+        self._lock = threading.Lock()
+
+    def register(self, key: str, task_id: int, directory: str) -> None:
+        app = PrecompressedStaticFiles(directory=os.path.abspath(directory), html=True)
+        with self._lock:
+            self._sites[key] = (task_id, app)
+
+    def unregister_task(self, task_id: int) -> None:
+        with self._lock:
+            for key in [k for k, (tid, _) in self._sites.items() if tid == task_id]:
+                del self._sites[key]
+
+    def resolve(self, key: str) -> Optional[StaticFiles]:
+        entry = self._sites.get(key)
+        return entry[1] if entry else None
+
+    def __len__(self) -> int:
+        return len(self._sites)
+
+
+site_registry = SiteRegistry()
+
+
+class SharedStaticSites:
+    """
+    ASGI middleware serving every registered static site from this process.
+    Sites are routed by host (`<key>.<STATIC_SITES_DOMAIN>`) when a domain is
+    configured, and by path prefix (`/sites/<key>/...`) otherwise. Anything
+    else falls through to the API app.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        key, path = self._route(scope)
+        if key is None:
+            await self.app(scope, receive, send)
+            return
+
+        site = site_registry.resolve(key)
+        if site is None:
+            await _not_found(send)
+            return
+
+        child_scope = dict(scope)
+        child_scope["path"] = path or "/"
+        child_scope["raw_path"] = child_scope["path"].encode()
+        child_scope["root_path"] = ""
+        await site(child_scope, receive, send)
+
+    @staticmethod
+    def _route(scope: Scope):
+        domain = settings.STATIC_SITES_DOMAIN
+        if domain:
+            for name, value in scope.get("headers", []):
+                if name == b"host":
+                    host = value.decode("latin-1").split(":")[0]
+                    if host.endswith("." + domain):
+                        return host[: -len(domain) - 1], scope["path"]
+                    break
+
+        path = scope["path"]
+        if path.startswith(SITES_PREFIX):
+            key, _, rest = path[len(SITES_PREFIX):].partition("/")
+            return key, "/" + rest
+        return None, None
+
+
+async def _not_found(send: Send) -> None:
+    body = b"Site not found"
+    await send({
+        "type": "http.response.start",
+        "status": 404,
+        "headers": [(b"content-type", b"text/plain"), (b"content-length", str(len(body)).encode())],
+    })
+    await send({"type": "http.response.body", "body": body})
@@ -1,9 +1,55 @@
+import time
+import shutil
+import asyncio
+from collections import deque
+from typing import List, Optional, Set
+
 import psutil
 import GPUtil
-import subprocess
 
-def get_resource_status():
+from config import settings
+
+
+# --------------------
+# GPU sources
+# --------------------
+class NvidiaGpuSource:
+    """Reads GPU stats through GPUtil (a single nvidia-smi call per sample)."""
+
+    def gpus(self) -> List[dict]:
+        return [
+            {
+                "id": gpu.id,
+                "name": gpu.name,
+                "load": gpu.load * 100,  # %
+                "vram_used": gpu.memoryUsed,  # MB
+                "vram_total": gpu.memoryTotal,  # MB
+                "vram_free": gpu.memoryFree,  # MB
+            }
+            for gpu in GPUtil.getGPUs()
+        ]
+
+
+class NullGpuSource:
+    """GPU source for machines without NVIDIA GPUs (or for tests)."""
+
+    def gpus(self) -> List[dict]:
+        return []
+
+
+def make_gpu_source(kind: str):
+    """Build the GPU source named by TELEMETRY_GPU_SOURCE ("auto", "nvidia" or "none")."""
+    if kind == "nvidia":
+        return NvidiaGpuSource()
+    if kind == "none":
+        return NullGpuSource()
+    return NvidiaGpuSource() if shutil.which("nvidia-smi") else NullGpuSource()
+
+
+def get_resource_status(gpu_source=None):
     """Fetch CPU, memory, and GPU stats."""
+    gpu_source = gpu_source or NvidiaGpuSource()
+
     # CPU usage %
     cpu_percent = psutil.cpu_percent(interval=None)
 
@@ -11,16 +57,7 @@ def get_resource_status():
     memory_percent = psutil.virtual_memory().percent
 
     # GPU info (supports multiple GPUs)
-    gpus = GPUtil.getGPUs()
-    gpu_data = []
-    for gpu in gpus:
-        gpu_data.append({
-            "id": gpu.id,
-            "name": gpu.name,
-            "load": gpu.load * 100,  # %
-            "vram_used": gpu.memoryUsed,  # MB
-            "vram_total": gpu.memoryTotal,  # MB
-        })
+    gpu_data = gpu_source.gpus()
 
     return {
         "cpu": cpu_percent,
@@ -29,24 +66,78 @@ def get_resource_status():
     }
 
 
-def get_gpu_vram():
+# --------------------
+# Shared sampler
+# --------------------
+class ResourceSampler:
     """
-    Returns available VRAM (in MB) for the first GPU.
-    Uses nvidia-smi to query free memory.
+    Samples host resources once per interval for the whole process and
+    publishes each snapshot to every subscriber. The last `history_size`
+    snapshots are kept in a ring buffer for sparkline charts.
     """
-    try:
-        result = subprocess.run(
-            [
-                "nvidia-smi",
-                "--query-gpu=memory.free",
-                "--format=csv,noheader,nounits"
-            ],
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True,
-            check=True
-        )
-        free_mem = int(result.stdout.strip().split("\n")[0])
-        return free_mem
-    except Exception as e:
-        return None
+
+    def __init__(self, interval: float, history_size: int, gpu_source):
+        self.interval = interval
+        self.gpu_source = gpu_source
+        self.history = deque(maxlen=history_size)
+        self.latest: Optional[dict] = None
+        self.subscribers: Set[asyncio.Queue] = set()
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    def sample(self) -> dict:
+        snapshot = get_resource_status(self.gpu_source)
+        gpus = snapshot["gpu"]
+        snapshot["available_vram"] = gpus[0]["vram_free"] if gpus else None
+        snapshot["timestamp"] = time.time()
+        return snapshot
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                snapshot = await asyncio.to_thread(self.sample)
+            except Exception as e:
+                print(f"Resource sampling failed: {e}")
+            else:
+                self.latest = snapshot
+                self.history.append(snapshot)
+                for queue in self.subscribers:
+                    if queue.full():
+                        queue.get_nowait()
+                    queue.put_nowait(snapshot)
+            await asyncio.sleep(self.interval)
+
+    def subscribe(self) -> asyncio.Queue:
+        """Queue that always holds only the newest snapshot."""
+        queue: asyncio.Queue = asyncio.Queue(maxsize=1)
+        if self.latest is not None:
+            queue.put_nowait(self.latest)
+        self.subscribers.add(queue)
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue) -> None:
+        self.subscribers.discard(queue)
+
+    def get_history(self, limit: Optional[int] = None) -> List[dict]:
+        items = list(self.history)
+        return items[-limit:] if limit else items
+
+
+resource_sampler = ResourceSampler(
+    interval=settings.TELEMETRY_INTERVAL_SECONDS,
+    history_size=settings.TELEMETRY_HISTORY_SIZE,
+    gpu_source=make_gpu_source(settings.TELEMETRY_GPU_SOURCE),
+)
@@ -0,0 +1,119 @@
+import asyncio
+from typing import Dict, Optional, Set
+
+import redis.asyncio as aioredis
+
+from config import settings
+from utils.task_events import task_events_channel
+
+
+class TaskEventHub:
+    """
+    Fans task events published on Redis out to WebSocket subscribers.
+
+    One Redis pub/sub connection per API process, subscribed only to the
+    channels of users that currently have a stream open. Each stream gets a
+    bounded queue; a slow client loses its oldest events rather than
+    stalling the others. Nothing touches the database while idle.
+    """
+
+    def __init__(self, queue_size: int, client: Optional[aioredis.Redis] = None):
+        self.queue_size = queue_size
+        self.client = client
+        self.subscribers: Dict[int, Set[asyncio.Queue]] = {}
+        self._pubsub = None
+        self._reader: Optional[asyncio.Task] = None
+        self._lock = asyncio.Lock()
+
+    async def subscribe(self, user_id: int) -> asyncio.Queue:
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        async with self._lock:
+            if self._pubsub is None:
+                if self.client is None:
+                    self.client = aioredis.Redis(host="localhost", port=6379, db=0)
+                self._pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+            if user_id not in self.subscribers:
+                try:
+                    await self._pubsub.subscribe(task_events_channel(user_id))
+                except Exception:
+                    # Register nothing if Redis refused; drop an unused connection
+                    if not self.subscribers:
+                        await self._close()
+                    raise
+                self.subscribers[user_id] = set()
+            self.subscribers[user_id].add(queue)
+            if self._reader is None or self._reader.done():
+                self._reader = asyncio.create_task(self._read())
+        return queue
+
+    async def unsubscribe(self, user_id: int, queue: asyncio.Queue) -> None:
+        async with self._lock:
+            queues = self.subscribers.get(user_id)
+            if queues is None:
+                return
+            queues.discard(queue)
+            if queues:
+                return
+            del self.subscribers[user_id]
+            try:
+                await self._pubsub.unsubscribe(task_events_channel(user_id))
+            except Exception as e:
+                print(f"[EVENTS] Unsubscribe failed for user {user_id}: {e}")
+            if not self.subscribers:
+                await self._close()
+
+    async def _close(self) -> None:
+        reader, self._reader = self._reader, None
+        if reader is not None:
+            reader.cancel()
+        pubsub, self._pubsub = self._pubsub, None
+        if pubsub is not None:
+            try:
+                await pubsub.aclose()
+            except Exception:
+                pass
+
+    # --------------------
+    # Redis reader
+    # --------------------
+    async def _read(self) -> None:
+        pubsub = self._pubsub
+        while pubsub is not None and pubsub is self._pubsub:
+            try:
+                message = await pubsub.get_message(timeout=1.0)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # redis-py resubscribes on reconnect; back off and keep reading
+                print(f"[EVENTS] Redis pub/sub error: {e}")
+                await asyncio.sleep(1.0)
+                continue
+            if message is None or message.get("type") != "message":
+                continue
+            channel = message["channel"]
+            if isinstance(channel, bytes):
+                channel = channel.decode()
+            try:
+                user_id = int(channel.rsplit(":", 1)[1])
+            except ValueError:
+                continue
+            data = message["data"]
+            if isinstance(data, bytes):
+                data = data.decode(errors="replace")
+            for queue in self.subscribers.get(user_id, ()):
+                self._offer(queue, data)
+
+    @staticmethod
+    def _offer(queue: asyncio.Queue, item) -> None:
+        if queue.full():
+            try:
+                queue.get_nowait()
+            except asyncio.QueueEmpty:
+                pass
+        queue.put_nowait(item)
+
+    def stats(self) -> dict:
+        return {user_id: len(queues) for user_id, queues in self.subscribers.items()}
+
+
+task_event_hub = TaskEventHub(queue_size=settings.TASK_EVENTS_QUEUE_SIZE)
@@ -1,17 +1,23 @@
 # upload_service.py
 import os
 import shutil
-import subprocess
 import asyncio
 import glob
 import docker
 from sqlalchemy.ext.asyncio import AsyncSession
 from crud import task_crud
-from schemas.task_schema import TaskStatusEnum
+from db.db_connection import SessionLocal
+from schemas.task_schema import TaskEnum, TaskStatusEnum
 from pyngrok import ngrok
 from config import settings
+from utils import static_container_name
+from utils.docker_utils import get_docker_client, run_blocking, build_slot
+from services.static_site_service import site_registry, site_key, shared_site_url
+from services.ingest_service import ingest_archive, IngestResult
+from services.blob_store import blob_store, write_manifest, remove_task_tree
+from services.precompress_service import precompress_tree, write_nginx_conf, write_report
+from services.build_cache import BuildTimings, clone_from_mirror, install_dependencies
 
-docker_client = docker.from_env()
 BASE_DIR = "workspaces"
 
 ngrok.set_auth_token(settings.NGROK_AUTH_TOKEN)
@@ -19,72 +25,57 @@ ngrok.set_auth_token(settings.NGROK_AUTH_TOKEN)
 # -----------------------------
 # Save & extract uploaded archive
 # -----------------------------
-# -----------------------------
-# Save & extract uploaded archive
-# -----------------------------
-async def save_and_extract_upload(file, user_id: int, task_id: int) -> str:
+async def save_and_extract_upload(file, user_id: int, task_id: int) -> IngestResult:
     """
-    Save uploaded ZIP/TAR inside uploads/ and extract to extracted/.
-    Returns absolute path to folder containing index.html.
+    Stream an uploaded ZIP/TAR.GZ (a StreamedFile straight off the request
+    body) into extracted/ (zips are kept in uploads/).
+    Files are deduplicated into the blob store and hardlinked into place, and
+    compressible assets get precompressed .br/.gz siblings; the task's
+    manifest.json records which blobs it references.
+    Returns the ingest result; `result.root` is the folder containing index.html.
     """
     task_dir = os.path.abspath(os.path.join(BASE_DIR, str(user_id), f"task_{task_id}"))
-    uploads_dir = os.path.join(task_dir, "uploads")
-    extracted_dir = os.path.join(task_dir, "extracted")
-
-    os.makedirs(uploads_dir, exist_ok=True)
-    os.makedirs(extracted_dir, exist_ok=True)
-
-    # Save uploaded file inside uploads
-    file_path = os.path.join(uploads_dir, file.filename)
-    with open(file_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
-
-    # Extract archive in extracted_dir
-    if file.filename.endswith(".zip"):
-        subprocess.run(["unzip", "-q", file_path, "-d", extracted_dir], check=True)
-    elif file.filename.endswith(".tar.gz"):
-        subprocess.run(["tar", "-xzf", file_path, "-C", extracted_dir], check=True)
-    else:
-        raise ValueError("Unsupported file format (only .zip or .tar.gz)")
-
-    # Locate folder containing index.html
-    extracted_path = extracted_dir
-    contents = os.listdir(extracted_dir)
-    if len(contents) == 1 and os.path.isdir(os.path.join(extracted_dir, contents[0])):
-        inner = os.path.join(extracted_dir, contents[0])
-        if os.path.exists(os.path.join(inner, "index.html")):
-            extracted_path = inner
-            
-    if not os.path.exists(os.path.join(extracted_path, "index.html")):
-        for root, dirs, files in os.walk(extracted_dir):
-            if "index.html" in files:
-                extracted_path = root
-                break
-
-    if not os.path.exists(os.path.join(extracted_path, "index.html")):
-        raise ValueError("No index.html found in uploaded archive")
-
-    return os.path.abspath(extracted_path)  
-
+    result = await ingest_archive(file, task_dir, store=blob_store)
+    report = await run_blocking(precompress_tree, result.extracted_dir, result.manifest, blob_store)
+    await run_blocking(write_report, task_dir, report)
+    await run_blocking(write_manifest, task_dir, result.manifest)
+    return result
 
 
 # -----------------------------
 # Serve static content in Docker + ngrok
 # -----------------------------
-def serve_static_docker(extracted_path: str, user_id: int, task_id: int) -> str:
-    container_name = f"user{user_id}-task{task_id}"
+def serve_static_docker(
+    extracted_path: str,
+    user_id: int,
+    task_id: int,
+    task_dir: str | None = None,
+    logs_dir: str | None = None,
+) -> str:
+    container_name = static_container_name(user_id, task_id)
 
     # Find free host port
     from utils import _get_free_port
     host_port = _get_free_port()
 
-    # Run NGINX container
-    docker_client.containers.run(
+    # nginx config that serves the precompressed siblings
+    task_dir = task_dir or os.path.abspath(os.path.join(BASE_DIR, str(user_id), f"task_{task_id}"))
+    conf_path = write_nginx_conf(task_dir)
+
+    volumes = {
+        extracted_path: {"bind": "/usr/share/nginx/html", "mode": "ro"},
+        conf_path: {"bind": "/etc/nginx/conf.d/default.conf", "mode": "ro"},
+    }
+    if logs_dir:
+        volumes[logs_dir] = {"bind": "/var/log/nginx", "mode": "rw"}
+
+    # Run NGINX container straight from the stock image, no build needed
+    get_docker_client().containers.run(
         "nginx:alpine",
         detach=True,
         name=container_name,
         ports={"80/tcp": host_port},
-        volumes={extracted_path: {"bind": "/usr/share/nginx/html", "mode": "ro"}},
+        volumes=volumes,
     )
 
     # Expose public URL with ngrok
@@ -92,6 +83,26 @@ def serve_static_docker(extracted_path: str, user_id: int, task_id: int) -> str:
     return public_url
 
 
+# -----------------------------
+# Serve static content from the shared in-process server
+# -----------------------------
+def serve_static_shared(extracted_path: str, user_id: int, task_id: int) -> str:
+    key = site_key(user_id, task_id)
+    site_registry.register(key, task_id, extracted_path)
+    return shared_site_url(key)
+
+
+async def restore_shared_sites(db: AsyncSession) -> int:
+    """Re-register running shared-mode sites after a restart."""
+    tasks = await task_crud.get_tasks_by_status(db, TaskEnum.staticpage, TaskStatusEnum.running)
+    restored = 0
+    for task in tasks:
+        if task.path and os.path.isdir(task.path):
+            serve_static_shared(task.path, task.user_id, task.id)
+            restored += 1
+    return restored
+
+
 # -----------------------------
 # Deploy GitHub repo
 # -----------------------------
@@ -103,132 +114,199 @@ async def deploy_github_task(
     workspace: str,
     db: AsyncSession,
     subdir: str | None = None,
-    env_vars: dict | None = None
+    env_vars: dict | None = None,
+    portable_image: bool = False,
+    isolated: bool = False,
 ):
+    """
+    Clone, build and serve a GitHub repo. By default the build output is
+    served as-is (shared server, or nginx with a read-only bind mount); a
+    Docker image is only built when `portable_image` is requested.
+    """
+    timings = BuildTimings()
     try:
         # Always use absolute workspace path
         workspace = os.path.abspath(workspace)
 
-        # Clone repo into workspace
-        proc = await asyncio.create_subprocess_exec(
-            "git", "clone", repo_url, workspace,
-            stdout=asyncio.subprocess.PIPE,
-            stderr=asyncio.subprocess.PIPE
-        )
-        out, err = await proc.communicate()
-        if proc.returncode != 0:
-            await task_crud.update_task_status(db, task_id, TaskStatusEnum.failed, logs=err.decode())
-            return
+        # Shallow clone through the local mirror of this repo
+        with timings.phase("clone"):
+            try:
+                mirror_hit = await clone_from_mirror(repo_url, workspace)
+            except RuntimeError as e:
+                await task_crud.update_task_status(db, task_id, TaskStatusEnum.failed, logs=str(e))
+                return
+        timings.cache["mirror"] = "hit" if mirror_hit else "miss"
 
         # Where to run build
         run_dir = os.path.join(workspace, subdir) if subdir else workspace
         run_dir = os.path.abspath(run_dir)
 
-        # Install dependencies
-        install_proc = await asyncio.create_subprocess_exec(
-            "npm", "install",
-            cwd=run_dir,
-            stdout=asyncio.subprocess.PIPE,
-            stderr=asyncio.subprocess.PIPE
-        )
-        await install_proc.communicate()
-
-        # Run build command
-        build_parts = build_command.split()
-        build_proc = await asyncio.create_subprocess_exec(
-            *build_parts,
-            cwd=run_dir,
-            stdout=asyncio.subprocess.PIPE,
-            stderr=asyncio.subprocess.PIPE
-        )
-        out, err = await build_proc.communicate()
-        if build_proc.returncode != 0:
-            await task_crud.update_task_status(db, task_id, TaskStatusEnum.failed, logs=err.decode())
-            return
-
-        # Find build folder
-        candidates = glob.glob(os.path.join(run_dir, "**/dist"), recursive=True)
-        candidates += glob.glob(os.path.join(run_dir, "**/build"), recursive=True)
-        if not candidates:
-            await task_crud.update_task_status(db, task_id, TaskStatusEnum.failed, logs="No dist/build folder found")
-            return
-        static_folder = os.path.abspath(candidates[0])  # make absolute
-
-        # Dockerfile (absolute paths)
-        dockerfile_path = os.path.join(workspace, "Dockerfile")
-        rel_static_folder = os.path.relpath(static_folder, workspace)  # relative inside image
-        with open(dockerfile_path, "w") as f:
-            f.write(f"""
-                FROM nginx:alpine
-                COPY {rel_static_folder} /usr/share/nginx/html
-                EXPOSE 80
-                CMD ["nginx", "-g", "daemon off;"]
-            """)
-
-        # Build Docker image
-        image_tag = f"{user_id}_task_{task_id}"
-        image, _ = docker_client.images.build(path=workspace, tag=image_tag)
-
-        # Run container
-        from utils import _get_free_port
-        host_port = _get_free_port()
-        container_name = f"user{user_id}-task{task_id}"
-        safe_env = {k: str(v) for k, v in (env_vars or {}).items()}
+        # Builds are CPU/IO heavy; only MAX_CONCURRENT_BUILDS run at once
+        async with build_slot():
+            # Install dependencies (node_modules snapshot or shared npm cache)
+            with timings.phase("install"):
+                timings.cache["dependencies"] = await install_dependencies(run_dir)
+
+            # Run build command
+            with timings.phase("build"):
+                build_parts = build_command.split()
+                build_proc = await asyncio.create_subprocess_exec(
+                    *build_parts,
+                    cwd=run_dir,
+                    stdout=asyncio.subprocess.PIPE,
+                    stderr=asyncio.subprocess.PIPE
+                )
+                out, err = await build_proc.communicate()
+            if build_proc.returncode != 0:
+                await task_crud.update_task_status(db, task_id, TaskStatusEnum.failed, logs=err.decode())
+                return
+
+            # Find build folder
+            candidates = glob.glob(os.path.join(run_dir, "**/dist"), recursive=True)
+            candidates += glob.glob(os.path.join(run_dir, "**/build"), recursive=True)
+            if not candidates:
+                await task_crud.update_task_status(db, task_id, TaskStatusEnum.failed, logs="No dist/build folder found")
+                return
+            static_folder = os.path.abspath(candidates[0])  # make absolute
+
+            # Precompress the build output once instead of per request
+            with timings.phase("precompress"):
+                report = await run_blocking(precompress_tree, static_folder)
+            await run_blocking(write_report, workspace, report)
+
+            if portable_image:
+                with timings.phase("image"):
+                    image = await _build_portable_image(workspace, static_folder, user_id, task_id)
 
         logs_dir = os.path.join(workspace, "nginx_logs")
         os.makedirs(logs_dir, exist_ok=True)
 
-        docker_client.containers.run(
-            image.id,
-            detach=True,
-            name=container_name,
-            ports={"80/tcp": host_port},
-            volumes={logs_dir: {"bind": "/var/log/nginx", "mode": "rw"}},
-            environment=safe_env
+        use_container = portable_image or isolated or settings.STATIC_HOSTING_MODE == "container"
+        if portable_image:
+            public_url = await _run_portable_image(image, user_id, task_id, logs_dir, env_vars)
+        elif use_container:
+            public_url = await run_blocking(
+                serve_static_docker, static_folder, user_id, task_id,
+                task_dir=workspace, logs_dir=logs_dir,
+            )
+        else:
+            public_url = serve_static_shared(static_folder, user_id, task_id)
+            # Remember the site root so it can be re-registered after a restart
+            task = await task_crud.get_task(db, task_id)
+            task.path = static_folder
+            db.add(task)
+            await db.commit()
+
+        await task_crud.update_task_status(
+            db, task_id, TaskStatusEnum.running,
+            logs=f"Deployed at {public_url}\n{timings.summary()}"
         )
 
-        public_url = ngrok.connect(host_port, "http").public_url
-        await task_crud.update_task_status(db, task_id, TaskStatusEnum.running, logs=f"Deployed at {public_url}")
-
-        auto_shutdown_ngrok(public_url, task_id, user_id, db, delay_seconds=600)
+        if use_container:
+            asyncio.create_task(auto_shutdown_ngrok(public_url, task_id, user_id, delay_seconds=600))
 
 
     except Exception as e:
-        await task_crud.update_task_status(db, task_id, "failed", logs=str(e))
+        await task_crud.update_task_status(db, task_id, "failed", logs=f"{e}\n{timings.summary()}")
+
+
+
+async def _build_portable_image(workspace: str, static_folder: str, user_id: int, task_id: int):
+    """Bake the build output into an nginx image (only when explicitly requested)."""
+    await run_blocking(write_nginx_conf, workspace)
+
+    # Dockerfile (absolute paths)
+    dockerfile_path = os.path.join(workspace, "Dockerfile")
+    rel_static_folder = os.path.relpath(static_folder, workspace)  # relative inside image
+    with open(dockerfile_path, "w") as f:
+        f.write(f"""
+            FROM nginx:alpine
+            COPY {rel_static_folder} /usr/share/nginx/html
+            COPY nginx.conf /etc/nginx/conf.d/default.conf
+            EXPOSE 80
+            CMD ["nginx", "-g", "daemon off;"]
+        """)
+
+    # Build Docker image
+    image_tag = f"{user_id}_task_{task_id}"
+    # Resolve the client in the executor too: the first call (or a reconnect) pings the daemon
+    image, _ = await run_blocking(lambda: get_docker_client().images.build(path=workspace, tag=image_tag))
+    return image
+
+
+async def _run_portable_image(image, user_id: int, task_id: int, logs_dir: str, env_vars: dict | None) -> str:
+    from utils import _get_free_port
+    host_port = _get_free_port()
+    container_name = static_container_name(user_id, task_id)
+    safe_env = {k: str(v) for k, v in (env_vars or {}).items()}
 
+    await run_blocking(
+        lambda: get_docker_client().containers.run(
+            image.id,
+            detach=True,
+            name=container_name,
+            ports={"80/tcp": host_port},
+            volumes={logs_dir: {"bind": "/var/log/nginx", "mode": "rw"}},
+            environment=safe_env,
+        )
+    )
+    return (await run_blocking(ngrok.connect, host_port, "http")).public_url
 
 
 # -----------------------------
 # Delete task: remove container + workspace + DB
 # -----------------------------
 async def delete_static_task(task_id: int, user_id: int, db: AsyncSession):
-    container_name = f"user{user_id}-task{task_id}"
-
-    # Stop & remove Docker container
-    try:
-        container = docker_client.containers.get(container_name)
-        container.stop()
-        container.remove()
-    except docker.errors.NotFound:
-        pass
-
-    # Remove task workspace (uploads + extracted)
+    container_name = static_container_name(user_id, task_id)
+
+    # Shared-mode deployments record their site root in task.path; they have
+    # no container or image, so Docker is not involved at all
+    task = await task_crud.get_task(db, task_id)
+    shared = bool(task and task.path)
+
+    # Drop the route from the shared static server (no-op for container mode)
+    site_registry.unregister_task(task_id)
+
+    # Stop & remove Docker container (and the portable image, if one was built)
+    def _remove_container():
+        client = get_docker_client()
+        try:
+            container = client.containers.get(container_name)
+            container.stop()
+            container.remove()
+        except docker.errors.NotFound:
+            pass
+        try:
+            client.images.remove(f"{user_id}_task_{task_id}")
+        except docker.errors.NotFound:
+            pass
+
+    if not shared:
+        await run_blocking(_remove_container)
+
+    # Remove task workspace (uploads + extracted) and release its blobs
     task_dir = os.path.join(BASE_DIR, str(user_id), f"task_{task_id}")
     if os.path.exists(task_dir):
-        shutil.rmtree(task_dir)
+        await run_blocking(remove_task_tree, task_dir)
 
     # Delete DB record
     await task_crud.delete_task(db, task_id)
 
 
-async def auto_shutdown_ngrok(url: str, task_id: int, user_id: int, db: AsyncSession, delay_seconds: int = 600, ) -> None:
+async def auto_shutdown_ngrok(url: str, task_id: int, user_id: int, delay_seconds: int = 600, ) -> None:
+    """
+    Background task: close the tunnel and delete the deployment after
+    `delay_seconds`. Opens its own DB session, since the request that
+    scheduled it is long finished by then.
+    """
     await asyncio.sleep(delay_seconds)
     try:
-        tunnels = ngrok.get_tunnels()
+        tunnels = await run_blocking(ngrok.get_tunnels)
         for tunnel in tunnels:
             if tunnel.public_url == url:
-                ngrok.disconnect(url)
-                await delete_static_task(task_id, user_id, db)
+                await run_blocking(ngrok.disconnect, url)
+                async with SessionLocal() as db:
+                    await delete_static_task(task_id, user_id, db)
                 break
     except Exception as e:
         print(f"Error during ngrok autoshutdown: {e}")
\ No newline at end of file
@@ -0,0 +1,56 @@
+"""
+Environment for the tests and benchmarks in this directory.
+
+Imported before any backend module: points both database URLs at a fresh
+SQLite file in a temporary directory, runs from that directory so the
+relative `workspaces/` paths never touch the checkout, puts the
+backend package root on sys.path and keeps pyngrok offline.
+"""
+import os
+import sys
+import tempfile
+import types
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+WORK_DIR = tempfile.mkdtemp(prefix="minicloud-tests-")
+
+os.environ.setdefault("ASYNC_DATABASE_URL", f"sqlite+aiosqlite:///{WORK_DIR}/test.db")
+os.environ.setdefault("SYNC_DATABASE_URL", f"sqlite:///{WORK_DIR}/test.db")
+os.environ.setdefault("DB_ECHO", "false")
+
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+os.chdir(WORK_DIR)
+os.makedirs("workspaces", exist_ok=True)   # server.py mounts it at import time
+
+# services.upload_service configures ngrok at import time, which downloads
+# the agent binary; nothing here opens a tunnel, so keep it offline
+if "pyngrok" not in sys.modules:
+    _pyngrok = types.ModuleType("pyngrok")
+    _pyngrok.ngrok = types.SimpleNamespace(set_auth_token=lambda token: None)
+    sys.modules["pyngrok"] = _pyngrok
+
+
+def percentile(values, pct: float) -> float:
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+async def create_schema_and_user(user_id: int = 1, role: str = "user"):
+    """Create all tables and one user; returns a bearer token for it."""
+    from jose import jwt
+    import crud  # noqa: F401  (registers every model with Base)
+    from config import settings
+    from db.db_connection import Base, engine, SessionLocal
+    from models.user_model import User
+
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    async with SessionLocal() as db:
+        if await db.get(User, user_id) is None:
+            db.add(User(id=user_id, username=f"user{user_id}", email=f"user{user_id}@example.com",
+                        hashed_password="x", role=role))
+            await db.commit()
+    return jwt.encode({"sub": str(user_id)}, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
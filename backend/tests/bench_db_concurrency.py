@@ -0,0 +1,172 @@
+"""
+Benchmark: API reads/writes and a Celery-style worker process writing to the
+same SQLite file at the same time, under three engine setups:
+
+    original  echo=True, default pool, no pragmas (the old db_connection.py)
+    bare      echo off, default pool, no pragmas
+    profile   db.engine_profile (pool settings, WAL, busy_timeout, ...)
+
+    python tests/bench_db_concurrency.py [--seconds 10]
+
+The API side runs 8 readers (query_tasks) and 4 writers (update_task_status)
+on the async engine; the worker process runs 4 threads of
+update_task_status_sync on a sync engine, like compute_worker does. Each
+setup runs in its own process against a fresh database file.
+"""
+import _env
+
+import argparse
+import asyncio
+import multiprocessing
+import os
+import subprocess
+import sys
+import threading
+import time
+
+API_READERS = 8
+API_WRITERS = 4
+WORKER_THREADS = 4
+TASKS = 2000
+
+
+def engines(mode: str, path: str):
+    from sqlalchemy import create_engine
+    from sqlalchemy.ext.asyncio import create_async_engine
+    from db.engine_profile import engine_options, apply_sqlite_pragmas
+
+    async_url, sync_url = f"sqlite+aiosqlite:///{path}", f"sqlite:///{path}"
+    if mode == "original":
+        return create_async_engine(async_url, echo=True), create_engine(sync_url)
+    if mode == "bare":
+        return create_async_engine(async_url), create_engine(sync_url)
+    async_engine = create_async_engine(async_url, **engine_options(async_url))
+    apply_sqlite_pragmas(async_engine.sync_engine)
+    sync_engine = create_engine(sync_url, **engine_options(sync_url))
+    apply_sqlite_pragmas(sync_engine)
+    return async_engine, sync_engine
+
+
+def worker(mode: str, path: str, seconds: float, results) -> None:
+    from sqlalchemy.orm import sessionmaker
+    from crud import update_task_status_sync
+
+    _, sync_engine = engines(mode, path)
+    Session = sessionmaker(bind=sync_engine)
+    latencies, errors = [], []
+
+    def loop(task_id: int) -> None:
+        deadline = time.time() + seconds
+        while time.time() < deadline:
+            started = time.perf_counter()
+            try:
+                with Session() as db:
+                    update_task_status_sync(db, task_id, "running", logs="x" * 4000, log_size=1)
+                latencies.append(time.perf_counter() - started)
+            except Exception:
+                errors.append(1)
+
+    threads = [threading.Thread(target=loop, args=(i + 1,)) for i in range(WORKER_THREADS)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    results.put((len(latencies), len(errors), _env.percentile(latencies, 99)))
+
+
+async def api(mode: str, path: str, seconds: float):
+    from sqlalchemy.ext.asyncio import async_sessionmaker
+    from crud import query_tasks, update_task_status
+
+    async_engine, _ = engines(mode, path)
+    Session = async_sessionmaker(async_engine, expire_on_commit=False)
+    read_latencies, writes, errors = [], [], []
+    deadline = time.time() + seconds
+
+    async def reader():
+        while time.time() < deadline:
+            started = time.perf_counter()
+            try:
+                async with Session() as db:
+                    await query_tasks(db, 1, limit=50)
+                read_latencies.append(time.perf_counter() - started)
+            except Exception:
+                errors.append(1)
+
+    async def writer(task_id: int):
+        while time.time() < deadline:
+            try:
+                async with Session() as db:
+                    await update_task_status(db, task_id, "queued", logs="api")
+                writes.append(1)
+            except Exception:
+                errors.append(1)
+
+    await asyncio.gather(
+        *(reader() for _ in range(API_READERS)),
+        *(writer(WORKER_THREADS + 1 + i) for i in range(API_WRITERS)),
+    )
+    await async_engine.dispose()
+    return len(read_latencies), len(writes), len(errors), _env.percentile(read_latencies, 99)
+
+
+async def setup(mode: str, path: str) -> None:
+    import crud  # noqa: F401  (registers every model with Base)
+    from sqlalchemy.ext.asyncio import async_sessionmaker
+    from db.db_connection import Base
+    from models.task_model import Task
+    from models.user_model import User
+
+    async_engine, _ = engines("bare", path)
+    async with async_engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    async with async_sessionmaker(async_engine)() as db:
+        db.add(User(id=1, username="bench", email="bench@example.com", hashed_password="x"))
+        db.add_all([Task(task_type="compute", status="pending", user_id=1) for _ in range(TASKS)])
+        await db.commit()
+    await async_engine.dispose()
+
+
+def run_mode(mode: str, seconds: float) -> None:
+    path = os.path.join(_env.WORK_DIR, f"bench_{mode}.db")
+    asyncio.run(setup(mode, path))
+
+    # task events go to Redis; keep them local so only the database is measured
+    import fakeredis
+    from utils import task_events
+    task_events.r = fakeredis.FakeRedis()
+
+    results = multiprocessing.Queue()
+    process = multiprocessing.Process(target=worker, args=(mode, path, seconds, results))
+    process.start()
+    reads, writes, api_errors, read_p99 = asyncio.run(api(mode, path, seconds))
+    worker_writes, worker_errors, worker_p99 = results.get()
+    process.join()
+
+    # stdout carries the echo=True statement log; results go to stderr
+    print(
+        f"{mode:>8}: API {reads:6d} reads (p99 {read_p99 * 1000:6.1f} ms) {writes:5d} writes "
+        f"{api_errors:4d} errors | worker {worker_writes:5d} writes (p99 {worker_p99 * 1000:6.1f} ms) "
+        f"{worker_errors:4d} errors",
+        file=sys.stderr,
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--mode", choices=["original", "bare", "profile"])
+    args = parser.parse_args()
+
+    if args.mode:
+        run_mode(args.mode, args.seconds)
+        return
+    for mode in ("original", "bare", "profile"):
+        subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--mode", mode, "--seconds", str(args.seconds)],
+            stdout=subprocess.DEVNULL, check=True,
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""
+Benchmark: extracting a large tar.gz upload while it arrives (MultipartStream)
+vs. spooling the whole body first (request.form() / UploadFile) and then
+extracting.
+
+    python tests/bench_ingest.py [--size-mb 500] [--mbps 200]
+
+The request body is fed to the ASGI receive channel in 1 MB chunks,
+throttled to `--mbps` to stand in for the network. Each mode runs in its
+own process so peak RSS is comparable.
+"""
+import _env
+
+import argparse
+import asyncio
+import os
+import resource
+import subprocess
+import sys
+import tarfile
+import time
+
+from starlette.requests import Request
+
+from services.ingest_service import ArchiveLimits, ingest_archive
+from utils.multipart_stream import MultipartStream
+
+BOUNDARY = "bench-boundary-7d1f"
+CHUNK = 1024 * 1024
+FILE_BYTES = 16 * 1024 * 1024
+
+
+def build_archive(path: str, size_mb: int) -> None:
+    """Incompressible files, so the archive is about `size_mb` on the wire."""
+    src = path + ".src"
+    os.makedirs(src, exist_ok=True)
+    with open(os.path.join(src, "index.html"), "w") as f:
+        f.write("<html></html>")
+    for i in range(max(1, size_mb * 1024 * 1024 // FILE_BYTES)):
+        with open(os.path.join(src, f"asset{i}.bin"), "wb") as f:
+            f.write(os.urandom(FILE_BYTES))
+    with tarfile.open(path, "w:gz", compresslevel=1) as tar:
+        tar.add(src, arcname="site")
+
+
+def request_for(archive: str, mbps: float) -> Request:
+    head = (
+        f"--{BOUNDARY}\r\nContent-Disposition: form-data; name=\"file\"; filename=\"site.tar.gz\"\r\n"
+        f"Content-Type: application/gzip\r\n\r\n"
+    ).encode()
+    tail = f"\r\n--{BOUNDARY}--\r\n".encode()
+    size = len(head) + os.path.getsize(archive) + len(tail)
+    f = open(archive, "rb")
+    state = {"sent_head": False, "sent_tail": False, "started": None, "bytes": 0}
+
+    async def receive():
+        if state["started"] is None:
+            state["started"] = time.perf_counter()
+        if not state["sent_head"]:
+            state["sent_head"] = True
+            body = head
+        else:
+            body = f.read(CHUNK)
+            if not body:
+                state["sent_tail"] = True
+                f.close()
+                return {"type": "http.request", "body": tail, "more_body": False}
+        state["bytes"] += len(body)
+        # throttle to the simulated link speed
+        due = state["started"] + state["bytes"] / (mbps * 1024 * 1024)
+        delay = due - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        return {"type": "http.request", "body": body, "more_body": True}
+
+    scope = {
+        "type": "http", "method": "POST", "path": "/static_pages/static",
+        "headers": [
+            (b"content-type", f"multipart/form-data; boundary={BOUNDARY}".encode()),
+            (b"content-length", str(size).encode()),
+        ],
+    }
+    return Request(scope, receive)
+
+
+async def run_mode(mode: str, archive: str, mbps: float) -> None:
+    request = request_for(archive, mbps)
+    limits = ArchiveLimits(max_total_bytes=4 * os.path.getsize(archive) + CHUNK, max_compression_ratio=1000)
+    task_dir = os.path.join(_env.WORK_DIR, f"task_{mode}")
+
+    started = time.perf_counter()
+    if mode == "streamed":
+        upload = await MultipartStream(request).file("file")
+    else:
+        form = await request.form(max_part_size=1 << 40)
+        upload = form["file"]
+    received = time.perf_counter() - started
+    result = await ingest_archive(upload, task_dir, limits=limits)
+    elapsed = time.perf_counter() - started
+
+    peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"{mode:>9}: {elapsed:6.2f} s total  ({received:5.2f} s before extraction began)  "
+          f"{result.total_bytes / 2**20 / elapsed:6.0f} MB/s  peak RSS {peak_mb:5.0f} MB")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--size-mb", type=int, default=500)
+    parser.add_argument("--mbps", type=float, default=200, help="simulated upload speed, MB/s")
+    parser.add_argument("--mode", choices=["streamed", "spooled"])
+    parser.add_argument("--archive")
+    args = parser.parse_args()
+
+    if args.mode:
+        asyncio.run(run_mode(args.mode, args.archive, args.mbps))
+        return
+
+    archive = os.path.join(_env.WORK_DIR, "site.tar.gz")
+    print(f"Building a {args.size_mb} MB archive...")
+    build_archive(archive, args.size_mb)
+    print(f"Archive: {os.path.getsize(archive) / 2**20:.0f} MB, upload at {args.mbps:.0f} MB/s")
+    for mode in ("spooled", "streamed"):
+        subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--mode", mode, "--archive", archive, "--mbps", str(args.mbps)],
+            check=True,
+        )
+
+
+if __name__ == "__main__":
+    main()
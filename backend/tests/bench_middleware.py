@@ -0,0 +1,102 @@
+"""
+Microbenchmark: JWT auth as BaseHTTPMiddleware (the previous implementation)
+vs. the pure ASGI JWTMiddleware, on a trivial authenticated route.
+
+    python tests/bench_middleware.py [--requests 5000] [--concurrency 50]
+
+Requests go through httpx's in-process ASGI transport, so the numbers are
+middleware + framework overhead only, no sockets.
+"""
+import _env
+
+import argparse
+import asyncio
+import time
+
+import httpx
+from fastapi import FastAPI, Request
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.responses import JSONResponse
+
+from db.db_connection import get_db
+from middleware.auth import JWTMiddleware, get_current_user_from_token
+
+
+class LegacyJWTMiddleware(BaseHTTPMiddleware):
+    """The BaseHTTPMiddleware version this repo used before the ASGI rewrite."""
+
+    async def dispatch(self, request: Request, call_next):
+        if request.url.path in ["/auth/login", "/auth/register", "/auth/whoami"]:
+            return await call_next(request)
+        if request.method == "OPTIONS":
+            return await call_next(request)
+
+        auth_header = request.headers.get("Authorization")
+        if auth_header is None or not auth_header.startswith("Bearer "):
+            return JSONResponse(status_code=401, content={"detail": "Authorization header missing"})
+
+        token = auth_header.split(" ")[1]
+        async for db in get_db():
+            user = await get_current_user_from_token(token, db)
+            if not user:
+                return JSONResponse(status_code=401, content={"detail": "Invalid or expired token"})
+            request.state.user = user
+
+        return await call_next(request)
+
+
+def build_app(middleware) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/ping")
+    async def ping(request: Request):
+        return {"user": request.state.user.id}
+
+    app.add_middleware(middleware)
+    return app
+
+
+async def run(app: FastAPI, token: str, requests: int, concurrency: int) -> dict:
+    headers = {"Authorization": f"Bearer {token}"}
+    latencies = []
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        # warm-up: principal cache, route compilation
+        for _ in range(50):
+            assert (await client.get("/ping", headers=headers)).status_code == 200
+
+        remaining = requests
+
+        async def worker():
+            nonlocal remaining
+            while remaining > 0:
+                remaining -= 1
+                started = time.perf_counter()
+                response = await client.get("/ping", headers=headers)
+                latencies.append(time.perf_counter() - started)
+                assert response.status_code == 200
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    return {
+        "rps": len(latencies) / elapsed,
+        "p50_ms": _env.percentile(latencies, 50) * 1000,
+        "p99_ms": _env.percentile(latencies, 99) * 1000,
+    }
+
+
+async def main(requests: int, concurrency: int) -> None:
+    token = await _env.create_schema_and_user()
+    for name, middleware in (("BaseHTTPMiddleware", LegacyJWTMiddleware), ("pure ASGI", JWTMiddleware)):
+        result = await run(build_app(middleware), token, requests, concurrency)
+        print(f"{name:>18}: {result['rps']:8.0f} req/s  p50 {result['p50_ms']:6.2f} ms  p99 {result['p99_ms']:6.2f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    args = parser.parse_args()
+    asyncio.run(main(args.requests, args.concurrency))
@@ -0,0 +1,87 @@
+"""
+Benchmark: listing a user's tasks by loading every row with its logs (the
+previous /compute/tasks) vs. one keyset page without log bodies
+(query_task_page, behind /status/tasks, /status/tasks/compute and
+/compute/tasks).
+
+    python tests/bench_task_queries.py [--tasks 50000] [--page-size 50]
+
+Also walks every page through next_cursor and checks that each task is
+returned exactly once.
+"""
+import _env
+
+import argparse
+import asyncio
+import random
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert
+
+from crud import get_tasks_for_user, query_task_page
+from db.db_connection import SessionLocal
+from models.task_model import Task
+
+
+async def seed(tasks: int) -> None:
+    await _env.create_schema_and_user()
+    base = datetime(2025, 1, 1)
+    rows = [
+        dict(
+            task_type=random.choice(["compute", "staticpage"]),
+            status=random.choice(["completed", "failed", "running"]),
+            logs="x" * 2000, log_size=2000, user_id=1,
+            # bursts of tasks share a timestamp, so the id tie-break matters
+            created_at=base + timedelta(seconds=i // 3),
+        )
+        for i in range(tasks)
+    ]
+    async with SessionLocal() as db:
+        await db.execute(insert(Task), rows)
+        await db.commit()
+
+
+async def timed(fn):
+    async with SessionLocal() as db:
+        started = time.perf_counter()
+        result = await fn(db)
+        return result, (time.perf_counter() - started) * 1000
+
+
+async def main(tasks: int, page_size: int) -> None:
+    await seed(tasks)
+
+    everything, full_ms = await timed(lambda db: get_tasks_for_user(db, 1))
+    compute_ids = sorted((t.id for t in everything if t.task_type == "compute"), reverse=True)
+
+    (first, cursor), first_ms = await timed(
+        lambda db: query_task_page(db, 1, limit=page_size, task_type="compute")
+    )
+    assert [t.id for t in first] == compute_ids[:page_size]
+
+    seen = [t.id for t in first]
+    pages = 1
+    page_ms = []
+    while cursor is not None:
+        (items, cursor), ms = await timed(
+            lambda db, after=cursor: query_task_page(db, 1, after_id=after, limit=page_size, task_type="compute")
+        )
+        seen.extend(t.id for t in items)
+        page_ms.append(ms)
+        pages += 1
+    assert seen == compute_ids, "pagination skipped or repeated tasks"
+
+    print(f"{tasks} tasks, {len(compute_ids)} compute, pages of {page_size}")
+    print(f"  load all with logs : {full_ms:8.1f} ms")
+    print(f"  first page         : {first_ms:8.1f} ms")
+    print(f"  later pages        : {_env.percentile(page_ms, 50):8.1f} ms p50, "
+          f"{_env.percentile(page_ms, 99):6.1f} ms p99 over {pages - 1} pages")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--tasks", type=int, default=50000)
+    parser.add_argument("--page-size", type=int, default=50)
+    args = parser.parse_args()
+    asyncio.run(main(args.tasks, args.page_size))
@@ -0,0 +1 @@
+import _env  # noqa: F401  (must run before any backend import)
@@ -0,0 +1,127 @@
+"""
+Latency test: `/` must stay responsive while 10 static deployments run.
+
+Docker and ngrok are replaced by fakes that block their calling thread the
+way the real clients do (containers.run ~0.5 s, ngrok.connect ~0.2 s). If
+any of those calls ran on the event loop, requests to `/` would stall for
+at least that long.
+"""
+import asyncio
+import io
+import sys
+import time
+import types
+import zipfile
+
+import fakeredis
+import httpx
+import pytest
+
+import _env
+
+DEPLOYMENTS = 10
+CONTAINER_RUN_SECONDS = 0.5
+TUNNEL_SECONDS = 0.2
+MAX_ROOT_LATENCY = 0.15
+
+
+class FakeTunnel:
+    def __init__(self, port):
+        self.public_url = f"https://fake-{port}.ngrok.example"
+
+
+class FakeNgrok:
+    @staticmethod
+    def set_auth_token(token):
+        pass
+
+    @staticmethod
+    def connect(port, proto):
+        time.sleep(TUNNEL_SECONDS)
+        return FakeTunnel(port)
+
+    @staticmethod
+    def get_tunnels():
+        return []
+
+    @staticmethod
+    def disconnect(url):
+        pass
+
+
+class FakeContainers:
+    def run(self, *args, **kwargs):
+        time.sleep(CONTAINER_RUN_SECONDS)
+
+
+class FakeDockerClient:
+    containers = FakeContainers()
+
+
+# upload_service configures ngrok at import time (which downloads the agent);
+# keep the real package out of the test entirely
+_fake_pyngrok = types.ModuleType("pyngrok")
+_fake_pyngrok.ngrok = FakeNgrok
+sys.modules["pyngrok"] = _fake_pyngrok
+
+
+def _site_zip() -> bytes:
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w") as zf:
+        zf.writestr("site/index.html", "<html><body>hello</body></html>")
+        zf.writestr("site/app.js", "console.log('hello');\n" * 200)
+    return buf.getvalue()
+
+
+@pytest.fixture
+def app(monkeypatch):
+    import server
+    from config import settings
+    from services import upload_service
+    from utils import task_events
+
+    monkeypatch.setattr(settings, "RATE_LIMIT_ENABLED", False)
+    monkeypatch.setattr(task_events, "r", fakeredis.FakeRedis())
+    monkeypatch.setattr(upload_service, "ngrok", FakeNgrok)
+    monkeypatch.setattr(upload_service, "get_docker_client", lambda: FakeDockerClient())
+    return server.app
+
+
+def test_root_stays_responsive_during_deployments(app):
+    async def scenario():
+        token = await _env.create_schema_and_user()
+        headers = {"Authorization": f"Bearer {token}"}
+        archive = _site_zip()
+
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test", timeout=60) as client:
+            assert (await client.get("/", headers=headers)).status_code == 200
+
+            async def deploy(i):
+                return await client.post(
+                    "/static_pages/static",
+                    headers=headers,
+                    files={"file": (f"site{i}.zip", archive, "application/zip")},
+                    data={"isolated": "true"},
+                )
+
+            deployments = asyncio.gather(*(deploy(i) for i in range(DEPLOYMENTS)))
+            latencies = []
+            started = time.perf_counter()
+            while not deployments.done():
+                t0 = time.perf_counter()
+                response = await client.get("/", headers=headers)
+                latencies.append(time.perf_counter() - t0)
+                assert response.status_code == 200
+                await asyncio.sleep(0.01)
+            elapsed = time.perf_counter() - started
+            return await deployments, latencies, elapsed
+
+    responses, latencies, elapsed = asyncio.run(scenario())
+
+    assert [r.status_code for r in responses] == [200] * DEPLOYMENTS, [r.text for r in responses]
+    assert all(r.json()["url"].startswith("https://fake-") for r in responses)
+    # the deployments really overlapped with the probes
+    assert elapsed >= CONTAINER_RUN_SECONDS + TUNNEL_SECONDS
+    assert len(latencies) >= 10
+    assert max(latencies) < MAX_ROOT_LATENCY, f"max / latency {max(latencies) * 1000:.0f} ms"
@@ -0,0 +1,151 @@
+"""
+Concurrency stress test for the Redis GPU allocator in utils.container_utils.
+
+Many threads submit, run and release GPU tasks at once against fakeredis
+(which runs the real Lua scripts). The allocator must never hand out more
+than GPU_TOTAL, must keep `gpu:used` equal to the sum of the allocations,
+and must run every task exactly once.
+"""
+import queue
+import random
+import threading
+import time
+
+import fakeredis
+import pytest
+
+import utils.container_utils as container_utils
+from celery_workers import compute_worker
+
+TASKS = 300
+SUBMITTERS = 16
+RUNNERS = 8
+
+
+@pytest.fixture
+def gpu(monkeypatch):
+    fake = fakeredis.FakeRedis()
+    monkeypatch.setattr(container_utils, "r", fake)
+    monkeypatch.setattr(container_utils, "_acquire_script", fake.register_script(container_utils._ACQUIRE_LUA))
+    monkeypatch.setattr(container_utils, "_release_script", fake.register_script(container_utils._RELEASE_LUA))
+    monkeypatch.setattr(container_utils, "_free_script", fake.register_script(container_utils._FREE_LUA))
+
+    dispatched = queue.Queue()
+    monkeypatch.setattr(compute_worker.run_container_task, "delay", lambda **payload: dispatched.put(payload["task_id"]))
+    return fake, dispatched
+
+
+# read the counter and the allocations in one atomic step
+_SNAPSHOT_LUA = """
+local allocated = 0
+for _, v in ipairs(redis.call('HVALS', KEYS[2])) do
+    allocated = allocated + tonumber(v)
+end
+return {tonumber(redis.call('GET', KEYS[1]) or '0'), allocated}
+"""
+
+
+def _check_invariants(fake, violations):
+    used, allocated = fake.eval(_SNAPSHOT_LUA, 2, container_utils.GPU_KEY, container_utils.GPU_ALLOC_KEY)
+    if used > container_utils.GPU_TOTAL or used != allocated or used < 0:
+        violations.append((used, allocated))
+
+
+def test_concurrent_acquire_release_never_oversubscribes(gpu):
+    fake, dispatched = gpu
+    ran = []
+    ran_lock = threading.Lock()
+    violations = []
+    done = threading.Event()
+
+    def run(task_id):
+        _check_invariants(fake, violations)
+        time.sleep(random.uniform(0, 0.002))
+        with ran_lock:
+            ran.append(task_id)
+        container_utils.release_gpu(task_id)
+
+    def submitter(ids):
+        for task_id in ids:
+            payload = {"task_id": task_id}
+            if container_utils.acquire_or_enqueue_gpu(task_id, payload, priority=random.choice([0, 0, 1])):
+                dispatched.put(task_id)
+
+    def runner():
+        while not done.is_set():
+            try:
+                task_id = dispatched.get(timeout=0.05)
+            except queue.Empty:
+                continue
+            run(task_id)
+
+    runners = [threading.Thread(target=runner) for _ in range(RUNNERS)]
+    submitters = [
+        threading.Thread(target=submitter, args=(range(i, TASKS, SUBMITTERS),)) for i in range(SUBMITTERS)
+    ]
+    for t in runners + submitters:
+        t.start()
+    for t in submitters:
+        t.join()
+
+    deadline = time.monotonic() + 30
+    while len(ran) < TASKS and time.monotonic() < deadline:
+        time.sleep(0.01)
+    done.set()
+    for t in runners:
+        t.join()
+
+    assert violations == []
+    assert sorted(ran) == list(range(TASKS))
+    assert int(fake.get(container_utils.GPU_KEY) or 0) == 0
+    assert fake.hlen(container_utils.GPU_ALLOC_KEY) == 0
+    assert fake.zcard(container_utils.GPU_QUEUE_KEY) == 0
+    assert fake.hlen(container_utils.GPU_PAYLOAD_KEY) == 0
+
+
+def test_failed_dispatch_requeues_at_front(gpu, monkeypatch):
+    fake, _ = gpu
+    slices = container_utils.GPU_TOTAL // container_utils.GPU_SLICE
+    for task_id in range(slices):
+        assert container_utils.acquire_or_enqueue_gpu(task_id, {"task_id": task_id})
+    for task_id in (100, 101):
+        assert not container_utils.acquire_or_enqueue_gpu(task_id, {"task_id": task_id})
+
+    def broker_down(**payload):
+        raise ConnectionError("broker unavailable")
+
+    monkeypatch.setattr(compute_worker.run_container_task, "delay", broker_down)
+    container_utils.release_gpu(0)
+
+    # the slice went back and task 100 is still first in line
+    assert int(fake.get(container_utils.GPU_KEY)) == (slices - 1) * container_utils.GPU_SLICE
+    assert container_utils.gpu_queue_position(100) == 0
+    assert container_utils.gpu_queue_position(101) == 1
+
+
+def test_submission_drains_queue_left_behind_by_failed_dispatch(gpu, monkeypatch):
+    fake, dispatched = gpu
+    slices = container_utils.GPU_TOTAL // container_utils.GPU_SLICE
+    for task_id in range(slices):
+        assert container_utils.acquire_or_enqueue_gpu(task_id, {"task_id": task_id})
+    for task_id in (100, 200):
+        assert not container_utils.acquire_or_enqueue_gpu(task_id, {"task_id": task_id})
+
+    def broker_down(**payload):
+        raise ConnectionError("broker unavailable")
+
+    monkeypatch.setattr(compute_worker.run_container_task, "delay", broker_down)
+    for task_id in range(slices):
+        container_utils.release_gpu(task_id)
+
+    # every dispatch failed: nothing is running, yet tasks are still waiting
+    assert int(fake.get(container_utils.GPU_KEY) or 0) == 0
+    assert fake.zcard(container_utils.GPU_QUEUE_KEY) == 2
+
+    # once the broker is back, the next submission dispatches the waiting
+    # tasks in order and still gets a slice itself
+    monkeypatch.setattr(compute_worker.run_container_task, "delay", lambda **payload: dispatched.put(payload["task_id"]))
+    assert container_utils.acquire_or_enqueue_gpu(300, {"task_id": 300})
+    assert [dispatched.get_nowait() for _ in range(dispatched.qsize())] == [100, 200]
+    assert fake.zcard(container_utils.GPU_QUEUE_KEY) == 0
+    assert int(fake.get(container_utils.GPU_KEY)) == 3 * container_utils.GPU_SLICE
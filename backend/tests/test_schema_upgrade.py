@@ -0,0 +1,64 @@
+"""
+db.schema_upgrade brings a database created by the original schema up to
+the current models, and running it again changes nothing.
+"""
+import sqlalchemy as sa
+
+import _env
+
+import crud  # noqa: F401  (registers every model with Base)
+from db.db_connection import Base
+from db.schema_upgrade import upgrade_schema
+
+# tasks/usage as the first release created them
+ORIGINAL_SCHEMA = [
+    """CREATE TABLE users (
+        id INTEGER PRIMARY KEY, username VARCHAR(50), email VARCHAR(120),
+        hashed_password VARCHAR(255), role VARCHAR(20), created_at DATETIME
+    )""",
+    """CREATE TABLE tasks (
+        id INTEGER PRIMARY KEY, task_type VARCHAR(50) NOT NULL, status VARCHAR(20),
+        logs VARCHAR, path VARCHAR, created_at DATETIME DEFAULT (CURRENT_TIMESTAMP),
+        user_id INTEGER REFERENCES users(id)
+    )""",
+    """CREATE TABLE usage (
+        id INTEGER PRIMARY KEY, cpu_seconds INTEGER, gpu_seconds INTEGER, memory_mb INTEGER,
+        created_at DATETIME DEFAULT (CURRENT_TIMESTAMP),
+        user_id INTEGER REFERENCES users(id), task_id INTEGER REFERENCES tasks(id)
+    )""",
+    "INSERT INTO users (id, username, email, hashed_password, role) VALUES (1, 'old', 'old@example.com', 'x', 'user')",
+    "INSERT INTO tasks (id, task_type, status, logs, user_id) VALUES (1, 'compute', 'completed', 'done', 1)",
+    "INSERT INTO usage (id, cpu_seconds, gpu_seconds, memory_mb, user_id, task_id) VALUES (1, 10, 0, 256, 1, 1)",
+]
+
+
+def _columns(conn, table):
+    return {c["name"] for c in sa.inspect(conn).get_columns(table)}
+
+
+def test_upgrade_adds_columns_and_indexes_idempotently(tmp_path):
+    engine = sa.create_engine(f"sqlite:///{tmp_path}/old.db")
+    with engine.begin() as conn:
+        for statement in ORIGINAL_SCHEMA:
+            conn.exec_driver_sql(statement)
+
+    for _ in range(2):
+        with engine.begin() as conn:
+            Base.metadata.create_all(conn)
+            upgrade_schema(conn)
+
+    with engine.connect() as conn:
+        assert {"log_seq", "log_size"} <= _columns(conn, "tasks")
+        assert {"peak_memory_mb", "period_start", "period_seconds"} <= _columns(conn, "usage")
+        assert {"task_log_chunks", "usage_hourly"} <= set(sa.inspect(conn).get_table_names())
+        indexes = {i["name"] for i in sa.inspect(conn).get_indexes("tasks")}
+        assert "ix_tasks_user_type_status_created" in indexes
+
+        # existing rows got the column defaults, and the models can read them
+        assert conn.exec_driver_sql("SELECT log_seq FROM tasks WHERE id = 1").scalar() == 0
+        from models.task_model import Task
+        from models.usage_model import Usage
+        task = conn.execute(sa.select(Task.id, Task.log_seq, Task.log_size)).one()
+        assert tuple(task) == (1, 0, None)
+        conn.execute(sa.update(Usage).where(Usage.id == 1).values(cpu_seconds=1.5))
+        assert conn.execute(sa.select(Usage.cpu_seconds)).scalar() == 1.5
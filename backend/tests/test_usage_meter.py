@@ -0,0 +1,143 @@
+"""
+UsageMeter and UsageWriter from utils.usage_meter, fed canned Docker stats
+samples on a fake clock, and the hourly rollups log_usage_batch_sync
+builds from their records on SQLite.
+"""
+from datetime import datetime, timezone
+
+import pytest
+import sqlalchemy as sa
+from sqlalchemy.orm import sessionmaker
+
+import _env
+
+import crud  # noqa: F401  (registers every model with Base)
+from crud import log_usage_batch_sync
+from db.db_connection import Base
+from models.usage_model import Usage, UsageHourly
+from schemas.usage_schema import UsageCreate
+from utils.usage_meter import MB, UsageMeter, UsageWriter
+
+
+def stats(cpu_seconds: float, memory_mb: int, cache_mb: int = 0) -> dict:
+    return {
+        "cpu_stats": {"cpu_usage": {"total_usage": int(cpu_seconds * 1e9)}},
+        "memory_stats": {"usage": (memory_mb + cache_mb) * MB, "stats": {"inactive_file": cache_mb * MB}},
+    }
+
+
+class CannedStats:
+    """One sample per fake second; the clock reads the time of the latest sample."""
+
+    def __init__(self, samples):
+        self.samples = samples
+        self.now = 0.0
+
+    def clock(self) -> float:
+        return self.now
+
+    def stream(self, container_id):
+        for now, sample in self.samples:
+            self.now = now
+            yield sample
+
+
+def run_meter(samples, **kwargs):
+    source = CannedStats(samples)
+    records = []
+    meter = UsageMeter(7, 1, "container", source, records.append, clock=source.clock, **kwargs)
+    meter.start()
+    meter._thread.join(5)
+    meter.stop()
+    return records
+
+
+def test_meter_emits_periods_with_cpu_deltas_and_time_weighted_memory():
+    # 0.5 CPU-seconds per second; 100 MB for the first 30 s, then 300 MB.
+    # Page cache (inactive_file) is not counted.
+    samples = [
+        (float(t), stats(0.5 * (t + 1), 100 if t < 30 else 300, cache_mb=50))
+        for t in range(151)
+    ]
+    records = run_meter(samples, gpu=True, record_interval=60)
+
+    assert [r.period_seconds for r in records] == [60, 60, 30]
+    assert [r.gpu_seconds for r in records] == [60, 60, 30]
+    assert [r.cpu_seconds for r in records] == [30.5, 30, 15]
+    assert sum(r.cpu_seconds for r in records) == pytest.approx(0.5 * 151)
+    # trapezoids: 29 s at 100, one second ramping to 300, 30 s at 300
+    assert records[0].memory_mb == int((29 * 100 + 200 + 30 * 300) / 60)
+    assert records[0].peak_memory_mb == 300
+    assert [r.memory_mb for r in records[1:]] == [300, 300]
+    assert {(r.user_id, r.task_id) for r in records} == {(1, 7)}
+
+
+def test_meter_counts_every_sample_and_ignores_a_reset_counter():
+    # the counter reads 0 once the container is gone; that is not negative CPU
+    samples = [(0.0, stats(1, 64)), (0.4, stats(1.2, 64)), (0.8, stats(1.6, 64)), (1.0, stats(0, 64))]
+    (record,) = run_meter(samples, record_interval=60)
+
+    assert record.period_seconds == 1.0
+    assert record.cpu_seconds == 1.6
+    assert record.gpu_seconds == 0
+    assert record.memory_mb == 64
+
+
+def _record(cpu_seconds: float, memory_mb: int = 0, **fields) -> UsageCreate:
+    return UsageCreate(user_id=1, task_id=7, cpu_seconds=cpu_seconds, memory_mb=memory_mb, **fields)
+
+
+def test_writer_keeps_failed_batches_but_never_grows_without_bound():
+    written, failing = [], [True]
+
+    def flush_fn(batch):
+        if failing[0]:
+            raise ConnectionError("database unavailable")
+        written.extend(batch)
+
+    writer = UsageWriter(flush_fn, batch_size=2, flush_interval=3600)
+    for i in range(25):
+        writer.add(_record(i))
+    # every full batch failed; only the newest batch_size * 10 are kept
+    assert [r.cpu_seconds for r in writer._pending] == list(range(5, 25))
+
+    failing[0] = False
+    assert writer.flush() == 20
+    writer.add(_record(99))
+    writer.close()
+    assert [r.cpu_seconds for r in written] == list(range(5, 25)) + [99]
+
+
+def test_batches_roll_up_per_user_and_hour(tmp_path):
+    engine = sa.create_engine(f"sqlite:///{tmp_path}/usage.db")
+    Base.metadata.create_all(engine)
+    Session = sessionmaker(bind=engine)
+
+    ten = datetime(2025, 1, 1, 10, 5, tzinfo=timezone.utc)
+    eleven = datetime(2025, 1, 1, 11, 0, tzinfo=timezone.utc)
+    batch = [
+        _record(10, 100, peak_memory_mb=150, period_start=ten, period_seconds=60),
+        _record(20, 300, peak_memory_mb=400, period_start=ten.replace(minute=50), period_seconds=30),
+        _record(5, 50, peak_memory_mb=60, period_start=eleven, period_seconds=10),
+    ]
+    with Session() as db:
+        assert log_usage_batch_sync(db, batch[:2]) == 2
+        # a later batch for the same hour adds to the existing rollup row
+        assert log_usage_batch_sync(db, batch[2:] + [_record(1, 0, period_start=ten, period_seconds=5)]) == 2
+
+    with Session() as db:
+        assert db.query(Usage).count() == 4
+        rows = {
+            row.hour.replace(tzinfo=None): row
+            for row in db.query(UsageHourly).filter(UsageHourly.user_id == 1)
+        }
+
+    hour_ten = rows[datetime(2025, 1, 1, 10)]
+    assert hour_ten.cpu_seconds == 31
+    assert hour_ten.memory_mb_seconds == 100 * 60 + 300 * 30
+    assert hour_ten.period_seconds == 95
+    assert hour_ten.peak_memory_mb == 400
+    assert hour_ten.records == 3
+
+    hour_eleven = rows[datetime(2025, 1, 1, 11)]
+    assert (hour_eleven.cpu_seconds, hour_eleven.memory_mb_seconds, hour_eleven.records) == (5, 500, 1)
@@ -2,7 +2,11 @@ from .security_utils import verify_password, get_password_hash
 
 from .socket_utils import _get_free_port
 
-from .container_utils import task_workspace_for, ensure_is_subpath, list_dir, try_acquire_gpu, release_gpu, enqueue_gpu_task
+from .cache_utils import Principal, PrincipalCache, principal_cache
+
+from .container_utils import compute_container_name, static_container_name, task_workspace_for, ensure_is_subpath, list_dir, try_acquire_gpu, release_gpu, enqueue_gpu_task, acquire_or_enqueue_gpu, gpu_queue_position
 
 __all__ = [ verify_password, get_password_hash, _get_free_port, task_workspace_for, 
-           ensure_is_subpath, list_dir, enqueue_gpu_task, try_acquire_gpu, release_gpu]
\ No newline at end of file
+           ensure_is_subpath, list_dir, enqueue_gpu_task, try_acquire_gpu, release_gpu,
+           Principal, PrincipalCache, principal_cache, compute_container_name, static_container_name,
+           acquire_or_enqueue_gpu, gpu_queue_position]
\ No newline at end of file
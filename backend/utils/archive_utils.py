@@ -0,0 +1,69 @@
+import os
+import zipfile
+from typing import Iterator
+
+from utils.compress_utils import is_compressible
+
+ZIP_CHUNK = 256 * 1024
+
+
+class _ZipSink:
+    """Unseekable write target; zipfile falls back to data descriptors."""
+
+    def __init__(self):
+        self._parts = []
+        self._offset = 0
+
+    def write(self, data: bytes) -> int:
+        self._parts.append(bytes(data))
+        self._offset += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._offset
+
+    def flush(self) -> None:
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self._parts)
+        self._parts.clear()
+        return data
+
+
+def stream_zip(root: str) -> Iterator[bytes]:
+    """
+    Yield a zip archive of the directory `root` as it is produced.
+    Only one file chunk is held in memory at a time and nothing touches
+    disk. Text-like files are deflated, everything else (checkpoints,
+    images, archives) is stored as-is. Symlinks are skipped.
+    """
+    sink = _ZipSink()
+    with zipfile.ZipFile(sink, mode="w", allowZip64=True) as archive:
+        for dirpath, dirnames, filenames in os.walk(root):
+            dirnames.sort()
+            for name in sorted(filenames):
+                path = os.path.join(dirpath, name)
+                if os.path.islink(path):
+                    continue
+                arcname = os.path.relpath(path, root)
+                try:
+                    info = zipfile.ZipInfo.from_file(path, arcname, strict_timestamps=False)
+                    src = open(path, "rb")
+                except FileNotFoundError:
+                    # removed while the archive was streaming
+                    continue
+                info.compress_type = zipfile.ZIP_DEFLATED if is_compressible(name) else zipfile.ZIP_STORED
+                with src, archive.open(info, mode="w") as dest:
+                    while True:
+                        chunk = src.read(ZIP_CHUNK)
+                        if not chunk:
+                            break
+                        dest.write(chunk)
+                        data = sink.drain()
+                        if data:
+                            yield data
+                data = sink.drain()
+                if data:
+                    yield data
+    yield sink.drain()
@@ -0,0 +1,63 @@
+import os
+import re
+import gzip
+from typing import List, Tuple
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; only .gz siblings are written without it
+    brotli = None
+
+COMPRESSIBLE_EXTENSIONS = {
+    ".html", ".htm", ".css", ".js", ".mjs", ".cjs", ".json", ".map", ".xml",
+    ".svg", ".txt", ".csv", ".md", ".wasm", ".ico", ".ttf", ".otf", ".eot",
+    ".webmanifest", ".glsl",
+}
+
+# Fingerprinted bundler output like `index-4f3a9c1b.js`, `main.3fa9c1d2e4.css` or
+# `2.8e0d62a1.chunk.js`: a separator, then a token of 8+ hex digits with both
+# letters and digits, then the extension. HTML is never immutable, it is what points at the new hashes.
+# Shared with the nginx config (services/precompress_service.py), which matches
+# it case-insensitively with `location ~*`.
+HASHED_ASSET_PATTERN = r"[.-](?=[0-9a-f]*[a-f])(?=[0-9a-f]*[0-9])[0-9a-f]{8,}(?:\.chunk)?\.(?!html?$)[a-z0-9]+$"
+_HASHED_NAME = re.compile(HASHED_ASSET_PATTERN, re.IGNORECASE)
+
+# Content-Encoding -> sibling suffix, in order of preference
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+
+
+def is_compressible(path: str) -> bool:
+    return os.path.splitext(path)[1].lower() in COMPRESSIBLE_EXTENSIONS
+
+
+def is_hashed_asset(path: str) -> bool:
+    """True for fingerprinted filenames that can be cached forever."""
+    return bool(_HASHED_NAME.search(os.path.basename(path)))
+
+
+def available_suffixes(use_brotli: bool = True) -> List[str]:
+    return [suffix for name, suffix in ENCODINGS if name == "gzip" or (use_brotli and brotli)]
+
+
+def compress_file(src: str, out_base: str, suffixes: List[str], max_ratio: float) -> List[Tuple[str, str, int]]:
+    """
+    Write compressed copies of `src` to `<out_base><suffix>`. Encodings that
+    don't get below `max_ratio` of the original size are not kept.
+    Returns (suffix, path, size) for each file written. Runs in a pool process.
+    """
+    with open(src, "rb") as f:
+        data = f.read()
+
+    written = []
+    for suffix in suffixes:
+        if suffix == ".gz":
+            packed = gzip.compress(data, compresslevel=9, mtime=0)
+        else:
+            packed = brotli.compress(data, quality=11)
+        if len(packed) > len(data) * max_ratio:
+            continue
+        path = out_base + suffix
+        with open(path, "wb") as f:
+            f.write(packed)
+        written.append((suffix, path, len(packed)))
+    return written
@@ -8,6 +8,12 @@ import json
 import subprocess
 
 
+def compute_container_name(task_id: int) -> str:
+    return f"task{task_id}-compute"
+
+def static_container_name(user_id: int, task_id: int) -> str:
+    return f"user{user_id}-task{task_id}"
+
 def task_workspace_for(user_name: str, task_id: int) -> str:
     return os.path.abspath(f"./workspaces/{user_name}/task_{task_id}")
 
@@ -47,39 +53,149 @@ GPU_TOTAL = 8192   # total VRAM MB
 GPU_SLICE = 2048   # 2 GB slices
 GPU_KEY = "gpu:used"
 GPU_ALLOC_KEY = "gpu:allocations"
-GPU_QUEUE_KEY = "gpu:queue"
+GPU_QUEUE_KEY = "gpu:waitq"            # ZSET task_id -> priority/FIFO score
+GPU_PAYLOAD_KEY = "gpu:waitq:payloads"  # HASH task_id -> JSON payload
+GPU_SEQ_KEY = "gpu:waitq:seq"
+GPU_PRIORITY_WEIGHT = 1_000_000_000_000  # keeps FIFO order within a priority
+GPU_REQUEUE_PRIORITY = 1000  # tasks that failed to dispatch go back to the front
+
+# All GPU bookkeeping runs as server-side Lua so check-and-allocate,
+# release and dequeue are atomic across API processes and workers.
+# The queue is ordered by (-priority, arrival); dispatch never skips the
+# head of the queue, so a large backlog cannot starve earlier tasks.
+_ENQUEUE_BODY = """
+if not redis.call('ZSCORE', KEYS[3], ARGV[1]) then
+    local seq = redis.call('INCR', KEYS[5])
+    local score = -tonumber(ARGV[4]) * tonumber(ARGV[5]) + seq
+    redis.call('HSET', KEYS[4], ARGV[1], ARGV[3])
+    redis.call('ZADD', KEYS[3], score, ARGV[1])
+end
+"""
+
+_ENQUEUE_LUA = _ENQUEUE_BODY + "return 0\n"
+
+# Pop queue heads into free capacity; expects `used`, `slice` and `total`
+_DRAIN_LUA = """
+local dispatched = {}
+while true do
+    local head = redis.call('ZRANGE', KEYS[3], 0, 0)
+    if #head == 0 or used + slice > total then
+        break
+    end
+    local tid = head[1]
+    local payload = redis.call('HGET', KEYS[4], tid)
+    redis.call('ZREM', KEYS[3], tid)
+    redis.call('HDEL', KEYS[4], tid)
+    if payload then
+        used = used + slice
+        redis.call('INCRBY', KEYS[1], slice)
+        redis.call('HSET', KEYS[2], tid, slice)
+        table.insert(dispatched, payload)
+    end
+end
+return dispatched
+"""
+
+# Returns 1 when the task got a slice right away. Otherwise the task is
+# queued and any free capacity is drained into the queue (a failed dispatch
+# can leave slices free behind a waiting head), returning those payloads.
+_ACQUIRE_LUA = """
+if redis.call('HEXISTS', KEYS[2], ARGV[1]) == 1 then
+    return 1
+end
+local used = tonumber(redis.call('GET', KEYS[1]) or '0')
+local slice = tonumber(ARGV[2])
+local total = tonumber(ARGV[6])
+if redis.call('ZCARD', KEYS[3]) == 0 and used + slice <= total then
+    redis.call('INCRBY', KEYS[1], slice)
+    redis.call('HSET', KEYS[2], ARGV[1], slice)
+    return 1
+end
+if ARGV[3] == '' then
+    return 0
+end
+""" + _ENQUEUE_BODY + _DRAIN_LUA
+
+_FREE_LUA = """
+local freed = tonumber(redis.call('HGET', KEYS[2], ARGV[1]) or '0')
+if freed > 0 then
+    redis.call('DECRBY', KEYS[1], freed)
+    redis.call('HDEL', KEYS[2], ARGV[1])
+end
+"""
+
+_RELEASE_LUA = _FREE_LUA + """
+local used = tonumber(redis.call('GET', KEYS[1]) or '0')
+local slice = tonumber(ARGV[2])
+local total = tonumber(ARGV[3])
+""" + _DRAIN_LUA
+
+_GPU_KEYS = [GPU_KEY, GPU_ALLOC_KEY, GPU_QUEUE_KEY, GPU_PAYLOAD_KEY, GPU_SEQ_KEY]
+_acquire_script = r.register_script(_ACQUIRE_LUA)
+_release_script = r.register_script(_RELEASE_LUA)
+_free_script = r.register_script(_FREE_LUA)
 
 
 def try_acquire_gpu(task_id: int) -> bool:
-    """Try allocating GPU slice immediately."""
-    used = int(r.get(GPU_KEY) or 0)
-    if used + GPU_SLICE <= GPU_TOTAL:
-        r.incrby(GPU_KEY, GPU_SLICE)
-        r.hset(GPU_ALLOC_KEY, task_id, GPU_SLICE)
+    """Try allocating GPU slice immediately (only when nobody is waiting)."""
+    return bool(_acquire_script(keys=_GPU_KEYS, args=[task_id, GPU_SLICE, "", 0, GPU_PRIORITY_WEIGHT, GPU_TOTAL]))
+
+
+def acquire_or_enqueue_gpu(task_id: int, payload: dict, priority: int = 0) -> bool:
+    """
+    Atomically allocate a GPU slice, or queue the task if none is free.
+    Returns True when the slice was allocated and the caller should dispatch.
+    Queued tasks that fit in free capacity are dispatched here as well.
+    """
+    result = _acquire_script(
+        keys=_GPU_KEYS,
+        args=[task_id, GPU_SLICE, json.dumps(payload), priority, GPU_PRIORITY_WEIGHT, GPU_TOTAL],
+    )
+    if result == 1:
         return True
-    return False
+    return _dispatch_queued(result, own_task_id=task_id)
 
 
-def enqueue_gpu_task(task_id: int, payload: dict):
+def enqueue_gpu_task(task_id: int, payload: dict, priority: int = 0):
     """Put task into queue if GPU busy."""
-    r.rpush(GPU_QUEUE_KEY, json.dumps({"task_id": task_id, "payload": payload}))
-
-
-def release_gpu(task_id: int):
-    """Release GPU slice, wake up next queued task if any."""
-    slice_size = int(r.hget(GPU_ALLOC_KEY, task_id) or 0)
-    if slice_size:
-        r.decrby(GPU_KEY, slice_size)
-        r.hdel(GPU_ALLOC_KEY, task_id)
-
-    # Wake up next task in queue
-    next_task_json = r.lpop(GPU_QUEUE_KEY)
-    if next_task_json:
-        next_task = json.loads(next_task_json)
-        tid = next_task["task_id"]
-        payload = next_task["payload"]
-
-        if try_acquire_gpu(tid):
-            # Trigger worker
-            from celery_workers.compute_worker import run_container_task
+    r.eval(_ENQUEUE_LUA, len(_GPU_KEYS), *_GPU_KEYS, task_id, GPU_SLICE, json.dumps(payload), priority, GPU_PRIORITY_WEIGHT)
+
+
+def gpu_queue_position(task_id: int) -> Optional[int]:
+    """Zero-based position of a waiting task, or None if it is not queued."""
+    return r.zrank(GPU_QUEUE_KEY, task_id)
+
+
+def release_gpu(task_id: Optional[int] = None):
+    """
+    Release GPU slice and dispatch queued tasks that now fit, in queue order.
+    Call with no task id to just drain the queue into free capacity.
+    """
+    payloads = _release_script(keys=_GPU_KEYS, args=[task_id if task_id is not None else "", GPU_SLICE, GPU_TOTAL])
+    _dispatch_queued(payloads)
+
+
+def _dispatch_queued(payloads, own_task_id: Optional[int] = None) -> bool:
+    """
+    Send dequeued tasks to the workers. Returns True when `own_task_id` was
+    among them; that one is left for the caller to dispatch.
+    """
+    if not payloads:
+        return False
+
+    from celery_workers.compute_worker import run_container_task
+    own = False
+    for raw in payloads:
+        payload = json.loads(raw)
+        if own_task_id is not None and payload["task_id"] == own_task_id:
+            own = True
+            continue
+        try:
             run_container_task.delay(**payload)
+        except Exception as e:
+            # Broker unavailable: give the slice back and put the task back at
+            # the front; the next release or submission drains it again
+            print(f"[GPU] Failed to dispatch task {payload['task_id']}: {e}")
+            _free_script(keys=_GPU_KEYS, args=[payload["task_id"]])
+            enqueue_gpu_task(payload["task_id"], payload, priority=GPU_REQUEUE_PRIORITY)
+    return own
@@ -0,0 +1,88 @@
+import time
+import asyncio
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import Optional
+
+import docker
+
+from config import settings
+
+_client: Optional[docker.DockerClient] = None
+_last_check = 0.0
+_lock = threading.Lock()
+
+
+def _connect() -> docker.DockerClient:
+    return docker.from_env(
+        max_pool_size=settings.DOCKER_MAX_POOL_SIZE,
+        timeout=settings.DOCKER_TIMEOUT_SECONDS,
+    )
+
+
+def get_docker_client() -> docker.DockerClient:
+    """
+    Process-wide Docker client, created on first use.
+    The connection is pinged at most every DOCKER_HEALTHCHECK_INTERVAL_SECONDS
+    and transparently re-created if the daemon stopped answering.
+    """
+    global _client, _last_check
+    with _lock:
+        now = time.monotonic()
+        if _client is not None and now - _last_check >= settings.DOCKER_HEALTHCHECK_INTERVAL_SECONDS:
+            try:
+                _client.ping()
+            except Exception as e:
+                print(f"[DOCKER] Health check failed, reconnecting: {e}")
+                _close_locked()
+            _last_check = now
+
+        if _client is None:
+            _client = _connect()
+            _last_check = now
+        return _client
+
+
+def close_docker_client() -> None:
+    with _lock:
+        _close_locked()
+
+
+def _close_locked() -> None:
+    global _client
+    if _client is not None:
+        try:
+            _client.close()
+        except Exception:
+            pass
+        _client = None
+
+
+# --------------------
+# Off-loop execution for blocking Docker / tunnel calls
+# --------------------
+_executor = ThreadPoolExecutor(
+    max_workers=settings.DOCKER_EXECUTOR_WORKERS, thread_name_prefix="docker-blocking"
+)
+_build_semaphore: Optional[asyncio.Semaphore] = None
+
+
+async def run_blocking(fn, *args, **kwargs):
+    """
+    Run a blocking Docker/ngrok/filesystem call on the bounded executor so
+    the API event loop keeps serving other requests meanwhile.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, functools.partial(fn, *args, **kwargs))
+
+
+@asynccontextmanager
+async def build_slot():
+    """Limit how many deployments build at the same time (MAX_CONCURRENT_BUILDS)."""
+    global _build_semaphore
+    if _build_semaphore is None:
+        _build_semaphore = asyncio.Semaphore(settings.MAX_CONCURRENT_BUILDS)
+    async with _build_semaphore:
+        yield
@@ -0,0 +1,107 @@
+import os
+from typing import Iterator, Mapping, Optional, Tuple
+from fastapi import HTTPException
+from fastapi.responses import FileResponse, Response, StreamingResponse
+
+FILE_CHUNK = 256 * 1024
+
+
+def parse_range_header(range_header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """
+    Parse a single-range `Range: bytes=...` header against a resource of
+    `size` bytes. Returns an inclusive (start, end) tuple, None when the
+    header is absent or not a byte range, and raises 416 when unsatisfiable.
+    Multi-range requests are served as their first range.
+    """
+    if not range_header or not range_header.startswith("bytes="):
+        return None
+
+    spec = range_header[len("bytes="):].split(",")[0].strip()
+    start_s, sep, end_s = spec.partition("-")
+    try:
+        if not sep:
+            raise ValueError
+        if start_s == "":
+            # Suffix range: last N bytes
+            length = int(end_s)
+            if length <= 0:
+                raise ValueError
+            start, end = max(0, size - length), size - 1
+        else:
+            start = int(start_s)
+            end = int(end_s) if end_s else size - 1
+            end = min(end, size - 1)
+    except ValueError:
+        raise HTTPException(status_code=416, detail="Invalid Range header",
+                            headers={"Content-Range": f"bytes */{size}"})
+
+    if start >= size or start > end:
+        raise HTTPException(status_code=416, detail="Requested range not satisfiable",
+                            headers={"Content-Range": f"bytes */{size}"})
+    return start, end
+
+
+def file_etag(st: os.stat_result) -> str:
+    """Strong validator from file size and mtime; changes whenever either does."""
+    return f'"{st.st_size:x}-{st.st_mtime_ns:x}"'
+
+
+def etag_matches(header: Optional[str], etag: str) -> bool:
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    candidates = [c.strip() for c in header.split(",")]
+    return any(c.removeprefix("W/") == etag for c in candidates)
+
+
+def _iter_file_range(path: str, start: int, end: int) -> Iterator[bytes]:
+    with open(path, "rb") as f:
+        f.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = f.read(min(FILE_CHUNK, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+def file_download_response(
+    path: str,
+    request_headers: Mapping[str, str],
+    filename: Optional[str] = None,
+    media_type: Optional[str] = None,
+) -> Response:
+    """
+    Download response for a single file with conditional and partial GETs:
+    If-None-Match against the size/mtime ETag answers 304, and a `Range`
+    (honouring If-Range) answers 206 so interrupted downloads can resume.
+    """
+    st = os.stat(path)
+    etag = file_etag(st)
+    headers = {"ETag": etag, "Accept-Ranges": "bytes"}
+
+    if etag_matches(request_headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+
+    if_range = request_headers.get("if-range")
+    if if_range is None or if_range.strip() == etag:
+        byte_range = parse_range_header(request_headers.get("range"), st.st_size)
+        if byte_range is not None:
+            start, end = byte_range
+            response = StreamingResponse(
+                _iter_file_range(path, start, end),
+                status_code=206,
+                media_type=media_type or "application/octet-stream",
+                headers={
+                    **headers,
+                    "Content-Range": f"bytes {start}-{end}/{st.st_size}",
+                    "Content-Length": str(end - start + 1),
+                },
+            )
+            if filename:
+                response.headers["Content-Disposition"] = f'attachment; filename="{filename}"'
+            return response
+
+    return FileResponse(path, stat_result=st, filename=filename, media_type=media_type, headers=headers)
@@ -0,0 +1,156 @@
+import json
+import time
+import uuid
+import threading
+from typing import Callable, Dict, List, Optional
+
+import docker
+
+from config import settings
+from utils.container_utils import r
+
+IMAGE_POPULARITY_KEY = "images:popularity"   # ZSET image -> submission count
+IMAGE_STATE_KEY = "images:state"             # HASH image -> JSON cache info
+IMAGE_PULL_LOCK_PREFIX = "images:pulling:"   # STRING lock per image being pulled
+
+# Delete the pull lock only if this puller still owns it; a pull that
+# outlived the lock TTL must not drop the lock another worker now holds
+_RELEASE_LOCK_LUA = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+_release_lock = r.register_script(_RELEASE_LOCK_LUA)
+
+# In-process dedupe: concurrent tasks in one worker share a single pull
+_local_pulls: Dict[str, threading.Event] = {}
+_local_lock = threading.Lock()
+
+
+def record_image_request(image: str) -> None:
+    """Count a submission of `image` towards its pre-pull popularity."""
+    r.zincrby(IMAGE_POPULARITY_KEY, 1, image)
+
+
+def top_images(n: int) -> List[str]:
+    return [m.decode() for m in r.zrevrange(IMAGE_POPULARITY_KEY, 0, n - 1)]
+
+
+def is_image_local(client: docker.DockerClient, image: str) -> bool:
+    try:
+        client.images.get(image)
+        return True
+    except docker.errors.ImageNotFound:
+        return False
+
+
+def _record_state(image: str, **fields) -> None:
+    raw = r.hget(IMAGE_STATE_KEY, image)
+    state = json.loads(raw) if raw else {}
+    state.update(fields)
+    r.hset(IMAGE_STATE_KEY, image, json.dumps(state))
+
+
+def ensure_image(
+    client: docker.DockerClient,
+    image: str,
+    on_pull_start: Optional[Callable[[], None]] = None,
+) -> bool:
+    """
+    Make sure `image` is present locally, pulling it if needed.
+    Concurrent callers for the same image, in this process or in other
+    workers, wait for one shared pull instead of pulling again.
+    Returns True if this call had to wait for a pull.
+    """
+    if is_image_local(client, image):
+        _record_state(image, last_used=time.time())
+        return False
+
+    if on_pull_start:
+        on_pull_start()
+
+    with _local_lock:
+        event = _local_pulls.get(image)
+        owner = event is None
+        if owner:
+            event = threading.Event()
+            _local_pulls[image] = event
+
+    if not owner:
+        event.wait()
+        if not is_image_local(client, image):
+            raise RuntimeError(f"Pull of image {image} failed")
+        return True
+
+    try:
+        _pull_once(client, image)
+    finally:
+        with _local_lock:
+            _local_pulls.pop(image, None)
+        event.set()
+    return True
+
+
+def _pull_once(client: docker.DockerClient, image: str) -> None:
+    lock_key = IMAGE_PULL_LOCK_PREFIX + image
+    token = uuid.uuid4().hex
+    deadline = time.monotonic() + settings.IMAGE_PULL_TIMEOUT_SECONDS
+
+    while not r.set(lock_key, token, nx=True, ex=settings.IMAGE_PULL_TIMEOUT_SECONDS):
+        # Another worker is pulling the same image; wait for it to finish
+        if time.monotonic() > deadline:
+            raise TimeoutError(f"Timed out waiting for pull of image {image}")
+        time.sleep(1)
+
+    try:
+        if is_image_local(client, image):
+            return
+        started = time.time()
+        _record_state(image, pulling=True, pull_started=started)
+        pulled = client.images.pull(image)
+        _record_state(
+            image,
+            pulling=False,
+            pulled_at=time.time(),
+            pull_seconds=round(time.time() - started, 2),
+            size=pulled.attrs.get("Size"),
+            last_used=time.time(),
+            error=None,
+        )
+    except Exception as e:
+        _record_state(image, pulling=False, error=str(e))
+        raise
+    finally:
+        _release_lock(keys=[lock_key], args=[token])
+
+
+def prepull_top_images(client: docker.DockerClient, n: int) -> List[str]:
+    """Pull the `n` most requested images that are not cached yet."""
+    pulled = []
+    for image in top_images(n):
+        try:
+            if ensure_image(client, image):
+                pulled.append(image)
+        except Exception as e:
+            print(f"[IMAGES] Pre-pull of {image} failed: {e}")
+    return pulled
+
+
+def image_cache_state(n: int) -> List[dict]:
+    """Popularity and cache info for the `n` most requested images."""
+    entries = r.zrevrange(IMAGE_POPULARITY_KEY, 0, n - 1, withscores=True)
+    if not entries:
+        return []
+    pipe = r.pipeline(transaction=False)
+    pipe.hmget(IMAGE_STATE_KEY, [m for m, _ in entries])
+    for member, _ in entries:
+        pipe.exists(IMAGE_PULL_LOCK_PREFIX + member.decode())
+    states, *pulling = pipe.execute()
+    result = []
+    for (member, score), raw, locked in zip(entries, states, pulling):
+        image = member.decode()
+        info = json.loads(raw) if raw else {}
+        info["pulling"] = bool(locked)
+        result.append({"image": image, "requests": int(score), **info})
+    return result
@@ -0,0 +1,294 @@
+import os
+import time
+import asyncio
+import threading
+from collections import OrderedDict, defaultdict
+from typing import Callable, Dict, List, Optional, Tuple
+
+from fastapi import HTTPException
+
+from config import settings
+from utils.container_utils import ensure_is_subpath
+
+
+class AccessLogWriter:
+    """
+    Buffered, batched writer for per-deployment access logs.
+
+    Request handlers call `submit()`, which only enqueues the record; a
+    background task drains the queue in batches, groups records by workspace
+    and appends them through long-lived file handles off the event loop.
+    The queue is bounded: when it is full, records are dropped and counted
+    instead of applying back-pressure to the API.
+
+    Workspaces are given relative to `root` and must already exist as task
+    directories under it; records for anything else are dropped, so request
+    paths can never create files or directories.
+    """
+
+    LOG_NAME = "access.log"
+
+    def __init__(
+        self,
+        root: str,
+        max_queue: int,
+        batch_size: int,
+        flush_interval: float,
+        max_bytes: int,
+        backup_count: int,
+        max_open_files: int,
+    ):
+        self.root = root
+        self.max_queue = max_queue
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.max_open_files = max_open_files
+
+        self.dropped = 0
+        self.written = 0
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+        self._handles: "OrderedDict[str, object]" = OrderedDict()
+
+    # --------------------
+    # Producer side
+    # --------------------
+    def submit(self, workspace: str, line: str) -> bool:
+        """Enqueue one log line for `workspace`; never blocks."""
+        if self._queue is None:
+            self.dropped += 1
+            return False
+        try:
+            self._queue.put_nowait((workspace, line))
+            return True
+        except asyncio.QueueFull:
+            self.dropped += 1
+            return False
+
+    # --------------------
+    # Lifecycle
+    # --------------------
+    def start(self) -> None:
+        if self._task is not None:
+            return
+        self._stopping = False
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop the writer, flushing whatever is still queued."""
+        if self._task is None:
+            return
+        self._stopping = True
+        await self._task
+        self._task = None
+
+        batch = self._drain()
+        if batch:
+            await asyncio.to_thread(self._write_batch, batch)
+        await asyncio.to_thread(self._close_all)
+        self._queue = None
+
+    def stats(self) -> dict:
+        return {
+            "queued": self._queue.qsize() if self._queue else 0,
+            "max_queue": self.max_queue,
+            "written": self.written,
+            "dropped": self.dropped,
+            "open_files": len(self._handles),
+        }
+
+    # --------------------
+    # Consumer side
+    # --------------------
+    async def _run(self) -> None:
+        while not self._stopping:
+            try:
+                first = await asyncio.wait_for(self._queue.get(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                continue
+            batch = [first] + self._drain(self.batch_size - 1)
+            try:
+                await asyncio.to_thread(self._write_batch, batch)
+            except Exception as e:
+                print("Failed to write access log batch:", e)
+
+    def _drain(self, limit: Optional[int] = None) -> List[Tuple[str, str]]:
+        items: List[Tuple[str, str]] = []
+        if self._queue is None:
+            return items
+        while limit is None or len(items) < limit:
+            try:
+                items.append(self._queue.get_nowait())
+            except asyncio.QueueEmpty:
+                break
+        return items
+
+    def _write_batch(self, batch: List[Tuple[str, str]]) -> None:
+        grouped: Dict[str, List[str]] = defaultdict(list)
+        for workspace, line in batch:
+            grouped[workspace].append(line)
+
+        for workspace, lines in grouped.items():
+            handle = self._handle_for(workspace)
+            if handle is None:
+                self.dropped += len(lines)
+                continue
+            handle.write("".join(lines))
+            handle.flush()
+            self.written += len(lines)
+            if handle.tell() >= self.max_bytes:
+                self._rotate(workspace)
+
+    def _handle_for(self, workspace: str):
+        handle = self._handles.get(workspace)
+        if handle is not None:
+            self._handles.move_to_end(workspace)
+            return handle
+
+        path = self._resolve(workspace)
+        if path is None:
+            return None
+        handle = open(os.path.join(path, self.LOG_NAME), "a")
+        self._handles[workspace] = handle
+        while len(self._handles) > self.max_open_files:
+            _, oldest = self._handles.popitem(last=False)
+            oldest.close()
+        return handle
+
+    def _resolve(self, workspace: str) -> Optional[str]:
+        """Absolute path of an existing task workspace under `root`, else None."""
+        try:
+            path = ensure_is_subpath(self.root, workspace)
+        except HTTPException:
+            return None
+        if not os.path.isdir(path):
+            return None
+        return path
+
+    def _rotate(self, workspace: str) -> None:
+        handle = self._handles.pop(workspace)
+        handle.close()
+
+        base = handle.name
+        if self.backup_count <= 0:
+            os.remove(base)
+            return
+        for i in range(self.backup_count - 1, 0, -1):
+            src = f"{base}.{i}"
+            if os.path.exists(src):
+                os.replace(src, f"{base}.{i + 1}")
+        os.replace(base, f"{base}.1")
+
+    def _close_all(self) -> None:
+        while self._handles:
+            _, handle = self._handles.popitem()
+            handle.close()
+
+
+access_log_writer = AccessLogWriter(
+    root="workspaces",
+    max_queue=settings.ACCESS_LOG_QUEUE_SIZE,
+    batch_size=settings.ACCESS_LOG_BATCH_SIZE,
+    flush_interval=settings.ACCESS_LOG_FLUSH_INTERVAL_SECONDS,
+    max_bytes=settings.ACCESS_LOG_MAX_BYTES,
+    backup_count=settings.ACCESS_LOG_BACKUP_COUNT,
+    max_open_files=settings.ACCESS_LOG_MAX_OPEN_FILES,
+)
+
+
+class TaskLogSpool:
+    """
+    Append-only sink for a task's container output.
+
+    Chunks are written straight to `container.log` in the task workspace and
+    flushed at most every `flush_interval` seconds; only a bounded tail of the
+    most recent bytes is kept in memory, so memory stays flat regardless of how
+    much the container logs.
+
+    A daemon timer also flushes every `flush_interval` seconds, so output that
+    arrives just before the container goes quiet is not held back until the
+    next chunk or `close()`.
+    """
+
+    LOG_NAME = "container.log"
+
+    def __init__(
+        self,
+        workspace: str,
+        tail_bytes: int,
+        flush_interval: float,
+        on_flush: Optional[Callable[[bytes, int], None]] = None,
+    ):
+        self.path = os.path.join(workspace, self.LOG_NAME)
+        self.tail_bytes = tail_bytes
+        self.flush_interval = flush_interval
+        self.on_flush = on_flush
+        self.size = 0
+        self._tail = bytearray()
+        self._file = open(self.path, "wb")
+        self._last_flush = time.monotonic()
+        self._flushed_size = 0
+        self._lock = threading.Lock()
+        self._closed = threading.Event()
+        self._timer = threading.Thread(target=self._flush_idle, daemon=True)
+        self._timer.start()
+
+    def write(self, chunk: bytes) -> None:
+        with self._lock:
+            self._file.write(chunk)
+            self.size += len(chunk)
+
+            self._tail += chunk
+            overflow = len(self._tail) - self.tail_bytes
+            if overflow > 0:
+                del self._tail[:overflow]
+
+            if time.monotonic() - self._last_flush >= self.flush_interval:
+                self._flush()
+
+    def _flush_idle(self) -> None:
+        while not self._closed.wait(self.flush_interval):
+            with self._lock:
+                if not self._file.closed and self.size > self._flushed_size:
+                    self._flush()
+
+    def _flush(self) -> None:
+        """Caller holds `_lock`."""
+        self._file.flush()
+        if self.on_flush is not None and self.size > self._flushed_size:
+            # new output since the last flush, as far as the tail still holds it
+            new = min(self.size - self._flushed_size, len(self._tail))
+            try:
+                self.on_flush(bytes(self._tail[-new:]), self.size - new)
+            except Exception as e:
+                print(f"[LOG] on_flush callback failed: {e}")
+        self._flushed_size = self.size
+        self._last_flush = time.monotonic()
+
+    def tail(self) -> str:
+        """Most recent output, trimmed to a line boundary when possible."""
+        with self._lock:
+            data = bytes(self._tail)
+            truncated = self.size > len(data)
+        if truncated:
+            newline = data.find(b"\n")
+            if newline != -1:
+                data = data[newline + 1:]
+        return data.decode(errors="ignore").rstrip()
+
+    def close(self) -> None:
+        self._closed.set()
+        with self._lock:
+            if not self._file.closed:
+                self._flush()
+                self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
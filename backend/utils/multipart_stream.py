@@ -0,0 +1,157 @@
+from collections import deque
+from typing import Deque, Dict, List, Optional
+
+from fastapi import HTTPException
+from python_multipart.multipart import MultipartParser, parse_options_header
+from starlette.requests import Request
+
+MAX_FIELD_BYTES = 64 * 1024
+
+
+class _Part:
+    def __init__(self):
+        self.headers: Dict[bytes, bytes] = {}
+        self.name = ""
+        self.filename: Optional[str] = None
+        self.keep = False      # file data is buffered for a reader, otherwise dropped
+        self.done = False
+        self.chunks: Deque[bytes] = deque()
+        self.buffered = 0
+
+
+class StreamedFile:
+    """
+    File part of a multipart body, readable while the request is still
+    arriving. Exposes the `filename` / `await read(n)` subset of UploadFile.
+    """
+
+    def __init__(self, form: "MultipartStream", part: _Part):
+        self._form = form
+        self._part = part
+        self.filename = part.filename
+
+    async def read(self, size: int = -1) -> bytes:
+        part = self._part
+        while not part.done and (size < 0 or part.buffered < size):
+            if not await self._form._pump():
+                raise HTTPException(status_code=400, detail="Upload was interrupted")
+        out = []
+        taken = 0
+        while part.chunks and (size < 0 or taken < size):
+            chunk = part.chunks.popleft()
+            if size >= 0 and taken + len(chunk) > size:
+                keep = size - taken
+                part.chunks.appendleft(chunk[keep:])
+                chunk = chunk[:keep]
+            out.append(chunk)
+            taken += len(chunk)
+        part.buffered -= taken
+        return b"".join(out)
+
+
+class MultipartStream:
+    """
+    Incremental multipart/form-data parser over `request.stream()`.
+
+    Unlike `await request.form()` / `UploadFile`, nothing is spooled first:
+    the body is parsed as it is read, so a file part can be consumed while
+    the client is still sending it. Only the requested file part is
+    buffered (one request chunk at a time); plain fields are collected into
+    `fields`, and any other file parts are discarded.
+    """
+
+    def __init__(self, request: Request, max_field_bytes: int = MAX_FIELD_BYTES):
+        content_type, params = parse_options_header(request.headers.get("content-type", ""))
+        if content_type != b"multipart/form-data" or b"boundary" not in params:
+            raise HTTPException(status_code=400, detail="Expected a multipart/form-data body")
+
+        self.fields: Dict[str, str] = {}
+        self.max_field_bytes = max_field_bytes
+        self._body = request.stream().__aiter__()
+        self._finished = False
+        self._want: Optional[str] = None
+        self._files: Deque[_Part] = deque()
+        self._part: Optional[_Part] = None
+        self._header_field: List[bytes] = []
+        self._header_value: List[bytes] = []
+        self._parser = MultipartParser(params[b"boundary"], callbacks={
+            "on_part_begin": self._on_part_begin,
+            "on_header_field": lambda data, start, end: self._header_field.append(data[start:end]),
+            "on_header_value": lambda data, start, end: self._header_value.append(data[start:end]),
+            "on_header_end": self._on_header_end,
+            "on_headers_finished": self._on_headers_finished,
+            "on_part_data": self._on_part_data,
+            "on_part_end": self._on_part_end,
+        })
+
+    async def file(self, name: str) -> StreamedFile:
+        """Advance to the file field `name`; fields before it land in `fields`."""
+        self._want = name
+        while not self._files:
+            if not await self._pump():
+                raise HTTPException(status_code=400, detail=f"Missing file field '{name}'")
+        return StreamedFile(self, self._files.popleft())
+
+    async def drain(self) -> Dict[str, str]:
+        """Read the rest of the body (fields sent after the file) and return all fields."""
+        self._want = None
+        while await self._pump():
+            pass
+        return self.fields
+
+    async def _pump(self) -> bool:
+        if self._finished:
+            return False
+        try:
+            chunk = await self._body.__anext__()
+        except StopAsyncIteration:
+            self._finished = True
+            self._parser.finalize()
+            return False
+        if chunk:
+            try:
+                self._parser.write(chunk)
+            except HTTPException:
+                raise
+            except Exception as e:
+                raise HTTPException(status_code=400, detail=f"Malformed multipart body: {e}")
+        return True
+
+    # parser callbacks
+    def _on_part_begin(self) -> None:
+        self._part = _Part()
+
+    def _on_header_end(self) -> None:
+        field = b"".join(self._header_field).lower()
+        self._part.headers[field] = b"".join(self._header_value)
+        self._header_field.clear()
+        self._header_value.clear()
+
+    def _on_headers_finished(self) -> None:
+        part = self._part
+        _, options = parse_options_header(part.headers.get(b"content-disposition", b""))
+        part.name = options.get(b"name", b"").decode(errors="replace")
+        if b"filename" in options:
+            part.filename = options[b"filename"].decode(errors="replace")
+            part.keep = part.name == self._want
+            if part.keep:
+                self._want = None
+                self._files.append(part)
+        else:
+            part.keep = True
+
+    def _on_part_data(self, data: bytes, start: int, end: int) -> None:
+        part = self._part
+        if not part.keep:
+            return
+        part.chunks.append(data[start:end])
+        part.buffered += end - start
+        if part.filename is None and part.buffered > self.max_field_bytes:
+            raise HTTPException(status_code=413, detail=f"Form field '{part.name}' is too large")
+
+    def _on_part_end(self) -> None:
+        part = self._part
+        part.done = True
+        if part.filename is None:
+            self.fields[part.name] = b"".join(part.chunks).decode(errors="replace")
+        self._part = None
@@ -0,0 +1,176 @@
+import math
+import uuid
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+import redis.asyncio as aioredis
+
+from config import settings
+from utils.container_utils import r
+
+RATE_KEY = "ratelimit:{kind}:{user_id}"   # ZSET member -> ms timestamp (sliding window log)
+SLOTS_KEY = "ratelimit:slots:{user_id}"   # ZSET reservation/task id -> ms acquired
+
+# Sliding window log. The set never holds more than `limit` members, so a
+# check is a constant amount of work. Redis TIME keeps every API process on
+# one clock. Returns {allowed, remaining, retry_after_ms}.
+_WINDOW_LUA = """
+local limit = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+local t = redis.call('TIME')
+local now = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', now - window)
+local count = redis.call('ZCARD', KEYS[1])
+if count < limit then
+    redis.call('ZADD', KEYS[1], now, ARGV[3])
+    redis.call('PEXPIRE', KEYS[1], window)
+    return {1, limit - count - 1, 0}
+end
+local oldest = redis.call('ZRANGE', KEYS[1], 0, 0, 'WITHSCORES')
+return {0, 0, tonumber(oldest[2]) + window - now}
+"""
+
+# Concurrent task slots. Entries older than ARGV[2] ms are treated as
+# leaked (worker died before reporting a final status) and dropped; the
+# worker refreshes the score of a running task's slot (_TOUCH_SLOT_LUA),
+# so only slots without a live task age out.
+_ACQUIRE_SLOT_LUA = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', now - tonumber(ARGV[2]))
+if redis.call('ZCARD', KEYS[1]) >= tonumber(ARGV[1]) then
+    return 0
+end
+redis.call('ZADD', KEYS[1], now, ARGV[3])
+redis.call('PEXPIRE', KEYS[1], ARGV[2])
+return 1
+"""
+
+# Swap a request's reservation for the task id it created
+_CLAIM_SLOT_LUA = """
+local acquired = redis.call('ZSCORE', KEYS[1], ARGV[1])
+if not acquired then
+    return 0
+end
+redis.call('ZREM', KEYS[1], ARGV[1])
+redis.call('ZADD', KEYS[1], acquired, ARGV[2])
+return 1
+"""
+
+# Re-stamp a task's slot (and the key's TTL) if it is still held
+_TOUCH_SLOT_LUA = """
+if not redis.call('ZSCORE', KEYS[1], ARGV[1]) then
+    return 0
+end
+local t = redis.call('TIME')
+local now = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+redis.call('ZADD', KEYS[1], now, ARGV[1])
+redis.call('PEXPIRE', KEYS[1], ARGV[2])
+return 1
+"""
+
+_async_client = aioredis.Redis(host="localhost", port=6379, db=0)
+_window = _async_client.register_script(_WINDOW_LUA)
+_acquire_slot = _async_client.register_script(_ACQUIRE_SLOT_LUA)
+_claim_slot = _async_client.register_script(_CLAIM_SLOT_LUA)
+_touch_slot = r.register_script(_TOUCH_SLOT_LUA)
+
+
+@dataclass(frozen=True)
+class Limits:
+    requests_per_second: int
+    submissions: int
+    submission_window_seconds: int
+    concurrent_tasks: int
+    max_gpu_priority: int = 0
+
+
+@dataclass(frozen=True)
+class Decision:
+    allowed: bool
+    limit: int
+    remaining: int = 0
+    retry_after: int = 0   # whole seconds, for the Retry-After header
+
+
+def limits_for(user_id: int, role: Optional[str]) -> Limits:
+    """Role defaults from settings, overridden per user by RATE_LIMIT_USER_OVERRIDES."""
+    role_limits: Dict[str, int] = settings.RATE_LIMIT_ROLES.get(role or "user") or settings.RATE_LIMIT_ROLES["user"]
+    merged = {**role_limits, **settings.RATE_LIMIT_USER_OVERRIDES.get(str(user_id), {})}
+    return Limits(
+        requests_per_second=merged["requests_per_second"],
+        submissions=merged["submissions"],
+        submission_window_seconds=merged["submission_window_seconds"],
+        concurrent_tasks=merged["concurrent_tasks"],
+        max_gpu_priority=merged.get("max_gpu_priority", 0),
+    )
+
+
+async def hit(kind: str, user_id: int, limit: int, window_seconds: float) -> Decision:
+    """Count one event against a sliding window; refused events are not counted."""
+    allowed, remaining, retry_ms = await _window(
+        keys=[RATE_KEY.format(kind=kind, user_id=user_id)],
+        args=[limit, int(window_seconds * 1000), uuid.uuid4().hex],
+    )
+    return Decision(bool(allowed), limit, int(remaining), max(1, math.ceil(int(retry_ms) / 1000)) if not allowed else 0)
+
+
+async def acquire_task_slot(user_id: int, limit: int) -> Optional[str]:
+    """Reserve a concurrent-task slot. Returns the reservation id, or None when full."""
+    reservation = f"req:{uuid.uuid4().hex}"
+    acquired = await _acquire_slot(
+        keys=[SLOTS_KEY.format(user_id=user_id)],
+        args=[limit, int(settings.RATE_LIMIT_SLOT_TTL_SECONDS * 1000), reservation],
+    )
+    return reservation if acquired else None
+
+
+async def cancel_task_slot(user_id: int, reservation: str) -> None:
+    """Drop a reservation that never became a task (no-op once claimed)."""
+    await _async_client.zrem(SLOTS_KEY.format(user_id=user_id), reservation)
+
+
+async def claim_task_slot(user_id: int, reservation: Optional[str], task_id: int) -> None:
+    """
+    Bind the request's reservation to the task it created. The slot is held
+    until the task reaches a final status, so a GPU task waiting in the GPU
+    queue counts against the user's concurrent-task limit like a running one.
+    """
+    if not reservation:
+        return
+    try:
+        await _claim_slot(keys=[SLOTS_KEY.format(user_id=user_id)], args=[reservation, task_id])
+    except Exception as e:
+        print(f"[RATE LIMIT] Could not claim slot for task {task_id}: {e}")
+
+
+async def release_task_slot(user_id: Optional[int], task_id: int) -> None:
+    """Free the slot of a task that reached a final status."""
+    if user_id is None:
+        return
+    try:
+        await _async_client.zrem(SLOTS_KEY.format(user_id=user_id), task_id)
+    except Exception as e:
+        print(f"[RATE LIMIT] Could not release slot for task {task_id}: {e}")
+
+
+def touch_task_slot(user_id: Optional[int], task_id: int) -> None:
+    """Keep the slot of a task that is still running from aging out as leaked."""
+    if user_id is None:
+        return
+    try:
+        _touch_slot(
+            keys=[SLOTS_KEY.format(user_id=user_id)],
+            args=[task_id, int(settings.RATE_LIMIT_SLOT_TTL_SECONDS * 1000)],
+        )
+    except Exception as e:
+        print(f"[RATE LIMIT] Could not refresh slot for task {task_id}: {e}")
+
+
+def release_task_slot_sync(user_id: Optional[int], task_id: int) -> None:
+    if user_id is None:
+        return
+    try:
+        r.zrem(SLOTS_KEY.format(user_id=user_id), task_id)
+    except Exception as e:
+        print(f"[RATE LIMIT] Could not release slot for task {task_id}: {e}")
@@ -0,0 +1,35 @@
+import json
+import time
+from typing import Optional
+
+from config import settings
+from utils.container_utils import r
+
+TASK_EVENTS_CHANNEL = "task_events:user:{user_id}"   # PUBLISH JSON events per owner
+TASK_EVENTS_PATTERN = "task_events:user:*"
+
+
+def task_events_channel(user_id: int) -> str:
+    return TASK_EVENTS_CHANNEL.format(user_id=user_id)
+
+
+def publish_task_event(user_id: Optional[int], task_id: int, event: str, **fields) -> None:
+    """
+    Publish a task event to the owner's channel. `event` is "status" (state
+    change, with the log summary) or "log" (a delta of new container output).
+    Fire-and-forget: a Redis outage never fails the status update itself.
+    """
+    if user_id is None:
+        return
+    if event == "log" and "data" in fields:
+        # Only the newest part of a large delta; clients read the rest from /status/logs
+        limit = settings.TASK_EVENTS_MAX_LOG_BYTES
+        data = fields["data"]
+        if len(data) > limit:
+            fields["data"] = data[-limit:]
+            fields["truncated"] = True
+    message = {"event": event, "task_id": task_id, "ts": time.time(), **fields}
+    try:
+        r.publish(task_events_channel(user_id), json.dumps(message, default=str))
+    except Exception as e:
+        print(f"[EVENTS] Could not publish {event} for task {task_id}: {e}")
@@ -0,0 +1,211 @@
+import time
+import threading
+from datetime import datetime, timezone
+from typing import Callable, Iterator, List, Optional
+
+from config import settings
+from schemas.usage_schema import UsageCreate
+
+MB = 1024 * 1024
+
+
+class DockerStatsSource:
+    """Docker's own stats stream: one decoded JSON sample per second per container."""
+
+    def __init__(self, client):
+        self.client = client
+
+    def stream(self, container_id: str) -> Iterator[dict]:
+        return self.client.api.stats(container_id, stream=True, decode=True)
+
+
+def _cpu_ns(stats: dict) -> Optional[int]:
+    try:
+        return int(stats["cpu_stats"]["cpu_usage"]["total_usage"])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def _memory_bytes(stats: dict) -> Optional[int]:
+    memory = stats.get("memory_stats") or {}
+    usage = memory.get("usage")
+    if usage is None:
+        return None
+    # Same as `docker stats`: page cache doesn't count (cgroup v1 "cache", v2 "inactive_file")
+    extra = memory.get("stats") or {}
+    return max(0, usage - extra.get("inactive_file", extra.get("cache", 0)))
+
+
+class UsageMeter:
+    """
+    Meters one task container from a single stats stream, in a background
+    thread. Every sample of the stream is accumulated; CPU time is taken
+    from the cumulative cgroup counter, memory is integrated over time
+    for a time-weighted average, and GPU-seconds are wall time for tasks
+    holding a GPU slice. A UsageCreate record is handed to `sink` every
+    `record_interval` seconds and once more on stop().
+
+    `source` is anything with `stream(container_id) -> Iterator[dict]` in the
+    Docker stats format, so tests can feed canned samples.
+    """
+
+    def __init__(
+        self,
+        task_id: int,
+        user_id: int,
+        container_id: str,
+        source,
+        sink: Callable[[UsageCreate], None],
+        gpu: bool = False,
+        record_interval: float = settings.USAGE_RECORD_INTERVAL_SECONDS,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.task_id = task_id
+        self.user_id = user_id
+        self.container_id = container_id
+        self.source = source
+        self.sink = sink
+        self.gpu = gpu
+        self.record_interval = record_interval
+        self.clock = clock
+
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._last_sample: Optional[float] = None
+        self._last_cpu_ns = 0
+        self._last_memory = 0
+        self._reset_period(clock())
+
+    def _reset_period(self, now: float) -> None:
+        self._period_started = now
+        self._period_wall = datetime.now(timezone.utc)
+        self._cpu_ns = 0
+        self._memory_byte_seconds = 0.0
+        self._peak_memory = 0
+        self._seconds = 0.0
+
+    # --------------------
+    # Sampling
+    # --------------------
+    def start(self) -> "UsageMeter":
+        self._thread = threading.Thread(
+            target=self._run, name=f"usage-meter-{self.task_id}", daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def _run(self) -> None:
+        try:
+            for stats in self.source.stream(self.container_id):
+                if self._stopped.is_set():
+                    break
+                self.sample(stats, self.clock())
+        except Exception as e:
+            print(f"[USAGE] Stats stream for task {self.task_id} ended: {e}")
+
+    def sample(self, stats: dict, now: float) -> None:
+        cpu_ns, memory = _cpu_ns(stats), _memory_bytes(stats)
+        with self._lock:
+            elapsed = 0.0 if self._last_sample is None else now - self._last_sample
+            self._last_sample = now
+            if cpu_ns is not None and cpu_ns > 0:
+                # counter is cumulative; it reads 0 once the container is gone
+                self._cpu_ns += max(0, cpu_ns - self._last_cpu_ns)
+                self._last_cpu_ns = cpu_ns
+            if memory is not None:
+                # trapezoid between samples
+                self._memory_byte_seconds += (self._last_memory + memory) / 2 * elapsed
+                self._last_memory = memory
+                self._peak_memory = max(self._peak_memory, memory)
+            self._seconds += elapsed
+            if now - self._period_started >= self.record_interval:
+                self._emit(now)
+
+    def _emit(self, now: float) -> None:
+        seconds = self._seconds
+        if seconds <= 0 and self._cpu_ns == 0:
+            self._reset_period(now)
+            return
+        record = UsageCreate(
+            user_id=self.user_id,
+            task_id=self.task_id,
+            cpu_seconds=round(self._cpu_ns / 1e9, 3),
+            gpu_seconds=round(seconds, 3) if self.gpu else 0,
+            memory_mb=int(self._memory_byte_seconds / seconds / MB) if seconds else self._last_memory // MB,
+            peak_memory_mb=self._peak_memory // MB,
+            period_start=self._period_wall,
+            period_seconds=round(seconds, 3),
+        )
+        self._reset_period(now)
+        try:
+            self.sink(record)
+        except Exception as e:
+            print(f"[USAGE] Dropping usage record for task {self.task_id}: {e}")
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Stop sampling and emit the final partial period."""
+        self._stopped.set()
+        if self._thread is not None:
+            # the stream ends by itself once the container has exited
+            self._thread.join(timeout)
+        with self._lock:
+            self._emit(self.clock())
+
+
+class UsageWriter:
+    """
+    Buffers usage records from every meter in the process and writes them
+    with `flush_fn` in batches: when `batch_size` records are pending or
+    every `flush_interval` seconds, whichever comes first.
+    """
+
+    def __init__(
+        self,
+        flush_fn: Callable[[List[UsageCreate]], None],
+        batch_size: int = settings.USAGE_BATCH_SIZE,
+        flush_interval: float = settings.USAGE_FLUSH_INTERVAL_SECONDS,
+    ):
+        self.flush_fn = flush_fn
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._pending: List[UsageCreate] = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._timer: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+
+    def add(self, record: UsageCreate) -> None:
+        with self._lock:
+            self._pending.append(record)
+            full = len(self._pending) >= self.batch_size
+            if self._timer is None:
+                self._timer = threading.Thread(target=self._tick, name="usage-writer", daemon=True)
+                self._timer.start()
+        if full:
+            self.flush()
+
+    def _tick(self) -> None:
+        while not self._stopped.wait(self.flush_interval):
+            self.flush()
+
+    def flush(self) -> int:
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending, []
+            if not batch:
+                return 0
+            try:
+                self.flush_fn(batch)
+            except Exception as e:
+                # keep them for the next attempt, but never grow without bound
+                print(f"[USAGE] Batch insert of {len(batch)} records failed: {e}")
+                with self._lock:
+                    self._pending[:0] = batch
+                    del self._pending[:-self.batch_size * 10]
+                return 0
+            return len(batch)
+
+    def close(self) -> None:
+        self._stopped.set()
+        self.flush()
@@ -0,0 +1,289 @@
+import os
+import json
+import time
+import base64
+import sqlite3
+import hashlib
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+from config import settings
+
+SORT_COLUMNS = {"path": "path", "name": "name", "size": "size", "mtime": "mtime"}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    path   TEXT PRIMARY KEY,
+    parent TEXT NOT NULL,
+    name   TEXT NOT NULL,
+    is_dir INTEGER NOT NULL,
+    size   INTEGER NOT NULL,   -- aggregate size of the subtree for directories
+    files  INTEGER NOT NULL,   -- aggregate file count for directories, 1 for files
+    mtime  REAL NOT NULL,
+    depth  INTEGER NOT NULL,
+    ext    TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entries_parent ON entries (parent);
+CREATE INDEX IF NOT EXISTS entries_size ON entries (size, path);
+CREATE INDEX IF NOT EXISTS entries_mtime ON entries (mtime, path);
+CREATE TABLE IF NOT EXISTS dirs (path TEXT PRIMARY KEY, mtime_ns INTEGER NOT NULL);
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+"""
+
+_locks: Dict[str, threading.Lock] = defaultdict(threading.Lock)
+
+
+class WorkspaceIndex:
+    """
+    SQLite metadata index of one task workspace.
+
+    A refresh only re-lists directories whose mtime changed since the last
+    scan (adding, removing or renaming an entry bumps its directory's mtime).
+    Rewriting or growing a file does not, so the files of unchanged
+    directories are re-stat'ed instead. Per-directory aggregate sizes are
+    then recomputed. Queries are served from
+    the index with keyset (cursor) pagination, so listing a workspace with
+    hundreds of thousands of files never walks the tree.
+    """
+
+    def __init__(self, root: str):
+        self.root = os.path.abspath(root)
+        key = hashlib.sha256(self.root.encode()).hexdigest()[:32]
+        self.db_path = os.path.join(os.path.abspath(settings.WORKSPACE_INDEX_DIR), f"{key}.sqlite")
+
+    @contextmanager
+    def _connect(self):
+        os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        db = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            db.executescript(_SCHEMA)
+            with db:  # one transaction, committed on success
+                yield db
+        finally:
+            db.close()
+
+    # --------------------
+    # Building
+    # --------------------
+    def refresh(self, full: bool = False) -> None:
+        """Bring the index up to date. `full` re-lists every directory."""
+        with _locks[self.db_path], self._connect() as db:
+            if full:
+                db.execute("DELETE FROM entries")
+                db.execute("DELETE FROM dirs")
+            known = dict(db.execute("SELECT path, mtime_ns FROM dirs"))
+            seen = set()
+            stack = [""]
+            while stack:
+                rel = stack.pop()
+                try:
+                    st = os.stat(os.path.join(self.root, rel))
+                except (FileNotFoundError, NotADirectoryError):
+                    continue
+                seen.add(rel)
+                if known.get(rel) == st.st_mtime_ns:
+                    self._restat(db, rel)
+                    stack.extend(p for (p,) in db.execute(
+                        "SELECT path FROM entries WHERE parent = ? AND is_dir = 1", (rel,)
+                    ))
+                    continue
+                stack.extend(self._rescan(db, rel))
+                db.execute("INSERT OR REPLACE INTO dirs VALUES (?, ?)", (rel, st.st_mtime_ns))
+
+            for rel in set(known) - seen:
+                db.execute("DELETE FROM dirs WHERE path = ?", (rel,))
+                db.execute("DELETE FROM entries WHERE parent = ?", (rel,))
+                db.execute("DELETE FROM entries WHERE path = ?", (rel,))
+
+            self._aggregate(db)
+            db.execute("INSERT OR REPLACE INTO meta VALUES ('refreshed_at', ?)", (str(time.time()),))
+
+    def _rescan(self, db: sqlite3.Connection, rel: str) -> List[str]:
+        db.execute("DELETE FROM entries WHERE parent = ?", (rel,))
+        depth = rel.count("/") + 2 if rel else 1
+        rows, subdirs = [], []
+        try:
+            with os.scandir(os.path.join(self.root, rel)) as it:
+                for entry in it:
+                    try:
+                        is_dir = entry.is_dir(follow_symlinks=False)
+                        st = entry.stat(follow_symlinks=False)
+                    except FileNotFoundError:
+                        continue
+                    path = f"{rel}/{entry.name}" if rel else entry.name
+                    ext = "" if is_dir else os.path.splitext(entry.name)[1].lower().lstrip(".")
+                    rows.append((
+                        path, rel, entry.name, int(is_dir),
+                        0 if is_dir else st.st_size, 0 if is_dir else 1,
+                        st.st_mtime, depth, ext,
+                    ))
+                    if is_dir:
+                        subdirs.append(path)
+        except (FileNotFoundError, NotADirectoryError):
+            return []
+        db.executemany("INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+        return subdirs
+
+    def _restat(self, db: sqlite3.Connection, rel: str) -> None:
+        """Update size/mtime of the known files of a directory that wasn't re-listed."""
+        changed, gone = [], []
+        for path, size, mtime in db.execute(
+            "SELECT path, size, mtime FROM entries WHERE parent = ? AND is_dir = 0", (rel,)
+        ).fetchall():
+            try:
+                st = os.stat(os.path.join(self.root, path), follow_symlinks=False)
+            except (FileNotFoundError, NotADirectoryError):
+                gone.append((path,))
+                continue
+            if st.st_size != size or st.st_mtime != mtime:
+                changed.append((st.st_size, st.st_mtime, path))
+        db.executemany("UPDATE entries SET size = ?, mtime = ? WHERE path = ?", changed)
+        db.executemany("DELETE FROM entries WHERE path = ?", gone)
+
+    def _aggregate(self, db: sqlite3.Connection) -> None:
+        sizes: Dict[str, int] = defaultdict(int)
+        counts: Dict[str, int] = defaultdict(int)
+        for parent, total, n in db.execute(
+            "SELECT parent, SUM(size), COUNT(*) FROM entries WHERE is_dir = 0 GROUP BY parent"
+        ):
+            while True:
+                sizes[parent] += total
+                counts[parent] += n
+                if not parent:
+                    break
+                parent = os.path.dirname(parent)
+
+        db.execute("UPDATE entries SET size = 0, files = 0 WHERE is_dir = 1")
+        db.executemany(
+            "UPDATE entries SET size = ?, files = ? WHERE path = ? AND is_dir = 1",
+            [(sizes[p], counts[p], p) for p in sizes if p],
+        )
+        db.execute("INSERT OR REPLACE INTO meta VALUES ('total_size', ?)", (str(sizes[""]),))
+        db.execute("INSERT OR REPLACE INTO meta VALUES ('total_files', ?)", (str(counts[""]),))
+
+    def refresh_if_stale(self, max_age: float) -> None:
+        if self.age() > max_age:
+            self.refresh()
+
+    def age(self) -> float:
+        if not os.path.exists(self.db_path):
+            return float("inf")
+        with self._connect() as db:
+            row = db.execute("SELECT value FROM meta WHERE key = 'refreshed_at'").fetchone()
+        return time.time() - float(row[0]) if row else float("inf")
+
+    # --------------------
+    # Querying
+    # --------------------
+    def query(
+        self,
+        prefix: str = "",
+        depth: Optional[int] = None,
+        glob: Optional[str] = None,
+        extensions: Optional[List[str]] = None,
+        kind: Optional[str] = None,
+        sort: str = "path",
+        descending: bool = False,
+        cursor: Optional[str] = None,
+        limit: Optional[int] = 100,
+    ) -> dict:
+        """
+        One page of entries under `prefix`. `depth` counts levels below the
+        prefix (1 = direct children). `glob` matches the relative path, or
+        just the name if it contains no "/". Returns the entries, the cursor
+        for the next page and the aggregate size of `prefix`. `limit=None`
+        returns everything in one page.
+        """
+        prefix = prefix.strip("/")
+        column = SORT_COLUMNS.get(sort)
+        if column is None:
+            raise ValueError(f"Unknown sort field: {sort}")
+
+        where, params = [], []
+        if prefix:
+            # path range instead of LIKE, so the primary key index is used
+            where.append("path > ? AND path < ?")
+            params += [prefix + "/", prefix + "0"]
+        base_depth = prefix.count("/") + 1 if prefix else 0
+        if depth is not None:
+            where.append("depth <= ?")
+            params.append(base_depth + depth)
+        if glob:
+            where.append(("path" if "/" in glob else "name") + " GLOB ?")
+            params.append(glob)
+        if extensions:
+            where.append(f"ext IN ({', '.join('?' * len(extensions))})")
+            params += [e.lower().lstrip(".") for e in extensions]
+        if kind in ("file", "dir"):
+            where.append("is_dir = ?")
+            params.append(int(kind == "dir"))
+        if cursor:
+            last_value, last_path = _decode_cursor(cursor)
+            where.append(f"({column}, path) {'<' if descending else '>'} (?, ?)")
+            params += [last_value, last_path]
+
+        direction = "DESC" if descending else "ASC"
+        sql = (
+            "SELECT path, name, is_dir, size, files, mtime FROM entries"
+            + (" WHERE " + " AND ".join(where) if where else "")
+            + f" ORDER BY {column} {direction}, path {direction} LIMIT ?"
+        )
+        with self._connect() as db:
+            rows = db.execute(sql, params + [-1 if limit is None else limit + 1]).fetchall()
+            summary = self._summary(db, prefix)
+
+        entries = [
+            {
+                "path": path,
+                "name": name,
+                "is_dir": bool(is_dir),
+                "size": size,
+                "files": files if is_dir else None,
+                "mtime": mtime,
+            }
+            for path, name, is_dir, size, files, mtime in rows[:limit]
+        ]
+        next_cursor = None
+        if limit is not None and len(rows) > limit:
+            last = entries[-1]
+            next_cursor = _encode_cursor(last[column], last["path"])
+        return {"entries": entries, "next_cursor": next_cursor, **summary}
+
+    def _summary(self, db: sqlite3.Connection, prefix: str) -> dict:
+        if prefix:
+            row = db.execute("SELECT size, files FROM entries WHERE path = ? AND is_dir = 1", (prefix,)).fetchone()
+            size, files = row if row else (0, 0)
+        else:
+            meta = dict(db.execute("SELECT key, value FROM meta"))
+            size, files = int(meta.get("total_size", 0)), int(meta.get("total_files", 0))
+        return {"path": prefix, "total_size": size, "total_files": files}
+
+    def delete(self) -> None:
+        for suffix in ("", "-wal", "-shm"):
+            try:
+                os.remove(self.db_path + suffix)
+            except FileNotFoundError:
+                pass
+
+
+def _encode_cursor(value, path: str) -> str:
+    return base64.urlsafe_b64encode(json.dumps([value, path]).encode()).decode()
+
+
+def _decode_cursor(cursor: str):
+    try:
+        value, path = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return value, path
+    except (ValueError, TypeError):
+        raise ValueError("Invalid cursor")
+
+
+def build_workspace_index(root: str) -> WorkspaceIndex:
+    """Full (re)build, done when a task finishes writing its workspace."""
+    index = WorkspaceIndex(root)
+    index.refresh(full=True)
+    return index
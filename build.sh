@@ -35,7 +35,7 @@ trap cleanup SIGINT SIGTERM
 
 # Run processes in background
 restart_process "Backend Server" "python server.py" "$BACKEND_DIR" &
-restart_process "Celery Worker" "celery -A celery_workers.compute_worker.celery worker --loglevel=INFO" "$BACKEND_DIR" &
+restart_process "Celery Worker" "celery -A celery_workers.compute_worker.celery worker -B --loglevel=INFO" "$BACKEND_DIR" &
 restart_process "Frontend Dev" "npm run dev" "$FRONTEND_DIR" &
 
 # Wait for all background processes
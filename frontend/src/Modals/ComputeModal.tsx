@@ -15,6 +15,13 @@ type ComputeTask = {
   logs?: string;
 };
 
+// Task states in lifecycle order; a status never moves back from a final one
+const STATUS_RANK: Record<string, number> = {
+  pending: 0, queued: 1, running: 2, completed: 3, failed: 3, deleted: 3,
+};
+const isStatusAdvance = (current: string, next: string) =>
+  (STATUS_RANK[next] ?? 0) >= (STATUS_RANK[current] ?? 0);
+
 type StartComputeForm = {
   image: string;
   command: string;
@@ -28,6 +35,7 @@ export default function ComputeModal({
   setActiveModal: (modal: string) => void;
 }) {
   const [tasks, setTasks] = useState<ComputeTask[]>([]);
+  const [nextCursor, setNextCursor] = useState<number | null>(null);
   const [showArtifactsModal, setShowArtifactsModal] = useState<ComputeTask | null>(null);
 
   const [loading, setLoading] = useState(true);
@@ -54,16 +62,55 @@ export default function ComputeModal({
     },
   });
 
-  // Fetch tasks initially
-  useEffect(() => {
+  // Tasks come in pages, newest first; next_cursor fetches the following page
+  const fetchTasks = (cursor: number | null) =>
     api
-      .get("/status/tasks/compute")
+      .get("/status/tasks/compute", { params: cursor ? { cursor } : {} })
       .then((res) => {
-        if (Array.isArray(res.data)) setTasks(res.data.reverse());
-        else setTasks([]);
+        const items: ComputeTask[] = Array.isArray(res.data?.items) ? res.data.items : [];
+        setTasks((prev) => (cursor ? [...prev, ...items] : items));
+        setNextCursor(res.data?.next_cursor ?? null);
       })
-      .catch(console.error)
-      .finally(() => setLoading(false));
+      .catch(console.error);
+
+  // Fetch tasks initially
+  useEffect(() => {
+    fetchTasks(null).finally(() => setLoading(false));
+  }, []);
+
+  // Task status pushed from the server instead of polling
+  useEffect(() => {
+    const wsProtocol = window.location.protocol === "https:" ? "wss" : "ws";
+    const token = encodeURIComponent(localStorage.getItem("token") || "");
+    const ws = new WebSocket(`${wsProtocol}://localhost:8000/status/ws/tasks?token=${token}`);
+
+    ws.onmessage = (ev) => {
+      try {
+        const msg = JSON.parse(ev.data);
+        // The snapshot and the first events can overlap; only move forward
+        const updates: { task_id: number; task_type: string; status: string }[] =
+          msg.event === "snapshot"
+            ? msg.tasks.map((t: any) => ({ task_id: t.id, task_type: t.task_type, status: t.status }))
+            : msg.event === "status"
+            ? [msg]
+            : [];
+        const compute = updates.filter((u) => u.task_type === "compute");
+        if (compute.length) {
+          setTasks((prev) =>
+            prev.map((t) => {
+              const update = compute.find((u) => u.task_id === t.id);
+              return update && isStatusAdvance(t.status, update.status)
+                ? { ...t, status: update.status as ComputeTask["status"] }
+                : t;
+            })
+          );
+        }
+      } catch (err) {
+        console.error("Invalid task event:", err);
+      }
+    };
+
+    return () => ws.close();
   }, []);
 
   // GPU WS runs globally
@@ -269,6 +316,18 @@ export default function ComputeModal({
                   </tr>
                 ))
               )}
+              {!loading && nextCursor !== null && (
+                <tr>
+                  <td colSpan={4} className="px-4 py-3 text-center">
+                    <button
+                      onClick={() => fetchTasks(nextCursor)}
+                      className="text-sm text-blue-600 hover:text-blue-800"
+                    >
+                      Load more
+                    </button>
+                  </td>
+                </tr>
+              )}
             </tbody>
           </table>
         </div>
@@ -15,6 +15,7 @@ export default function StaticHostingModal({ setActiveModal }: { setActiveModal:
   const [loading, setLoading] = useState(false);
   const [error, setError] = useState<string | null>(null);
   const [tasks, setTasks] = useState<any[]>([]);
+  const [nextCursor, setNextCursor] = useState<number | null>(null);
   const [url, setUrl] = useState<string | null>(null);
 
   const api = axios.create({
@@ -22,19 +23,40 @@ export default function StaticHostingModal({ setActiveModal }: { setActiveModal:
     headers: { Authorization: `Bearer ${localStorage.getItem("token") || ""}` },
   });
 
-  const fetchTasks = async () => {
+  // Sites come in pages, newest first; refreshes reload the first page
+  const fetchTasks = async (cursor: number | null = null) => {
     try {
-      const { data } = await api.get("/status/tasks/static");
-      setTasks(data);
+      const { data } = await api.get("/status/tasks/static", { params: cursor ? { cursor } : {} });
+      const items = Array.isArray(data?.items) ? data.items : [];
+      setTasks((prev) => (cursor ? [...prev, ...items] : items));
+      setNextCursor(data?.next_cursor ?? null);
     } catch (err) {
       console.error("Failed to fetch tasks:", err);
     }
   };
 
+  // Refetch when the server pushes a status change for a static task, with a
+  // slow poll as a fallback in case the event stream is down
   useEffect(() => {
     fetchTasks();
-    const interval = setInterval(fetchTasks, 5000);
-    return () => clearInterval(interval);
+    const poll = setInterval(() => fetchTasks(), 60000);
+    const wsProtocol = window.location.protocol === "https:" ? "wss" : "ws";
+    const token = encodeURIComponent(localStorage.getItem("token") || "");
+    const ws = new WebSocket(`${wsProtocol}://localhost:8000/status/ws/tasks?token=${token}`);
+
+    ws.onmessage = (ev) => {
+      try {
+        const msg = JSON.parse(ev.data);
+        if (msg.event === "status" && msg.task_type === "staticpage") fetchTasks();
+      } catch (err) {
+        console.error("Invalid task event:", err);
+      }
+    };
+
+    return () => {
+      clearInterval(poll);
+      ws.close();
+    };
   }, []);
 
   const handleFileChange = (e: React.ChangeEvent<HTMLInputElement>) => {
@@ -248,16 +270,16 @@ export default function StaticHostingModal({ setActiveModal }: { setActiveModal:
                   <td className="px-3 py-2 border-b">{t.id}</td>
                   <td className="px-3 py-2 border-b">{t.status}</td>
                   <td className="px-3 py-2 border-b break-words">
-                    {t.status === "running" && t.logs ? (
+                    {t.status === "running" && t.summary ? (
                       (() => {
-                        const match = t.logs.match(/https?:\/\/\S+/); 
+                        const match = t.summary.match(/https?:\/\/\S+/); 
                         return match ? (
                           <a href={match[0]} target="_blank" rel="noopener noreferrer" className="text-blue-600 underline">
                             {match[0]}
                           </a>
-                        ) : t.logs
+                        ) : t.summary
                       })()
-                    ) : t.logs}
+                    ) : t.summary}
                   </td>
 
                   <td className="px-3 py-2 border-b">{t.created_at ? format(new Date(t.created_at), "dd/MM/yyyy HH:mm") : "-"}</td>
@@ -272,6 +294,18 @@ export default function StaticHostingModal({ setActiveModal }: { setActiveModal:
                   </td>
                 </tr>
               ))}
+              {nextCursor !== null && (
+                <tr>
+                  <td colSpan={5} className="px-3 py-2 text-center">
+                    <button
+                      onClick={() => fetchTasks(nextCursor)}
+                      className="text-sm text-blue-600 hover:text-blue-800"
+                    >
+                      Load more
+                    </button>
+                  </td>
+                </tr>
+              )}
             </tbody>
           </table>
         </div>